@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark optimize_portfolio: finite-difference SLSQP vs analytic gradients vs the convex QP backend.
+Reports iterations, objective evaluations and wall-clock time per universe size.
+
+Usage: python benchmarks/bench_optimization.py [n_assets ...]
+"""
+
+import sys
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from optimization import optimize_portfolio
+
+
+def make_problem(n, seed=0):
+    """Random factor-structured universe with the two simulated alternatives"""
+    rng = np.random.default_rng(seed)
+    tickers = [f'A{i}' for i in range(n - 2)] + ['Hedge_Fund', 'Private_Equity']
+    loadings = rng.normal(0, 0.15, (n, 3))
+    cov = loadings @ loadings.T + np.diag(rng.uniform(0.01, 0.04, n))
+    exp_rets = pd.Series(rng.uniform(0.03, 0.12, n), index=tickers)
+    esg = dict(zip(tickers, rng.uniform(6.0, 9.5, n)))
+    return exp_rets, pd.DataFrame(cov, index=tickers, columns=tickers), esg
+
+
+def run(n, mode, repeats=3):
+    exp_rets, cov, esg = make_problem(n)
+    max_single = max(0.3, 1.5 / n)
+    times = []
+    for _ in range(repeats):
+        np.random.seed(42)
+        t0 = time.perf_counter()
+        if mode == 'qp':
+            options = {'solver': 'qp'}
+        else:
+            options = {'gradients': mode}
+        result = optimize_portfolio(exp_rets, cov, esg_scores=esg, max_single=max_single,
+                                    max_asset=max_single, **options)
+        times.append(time.perf_counter() - t0)
+    diag = result['diagnostics'] or {}
+    return {
+        'n_assets': n,
+        'mode': mode,
+        'sharpe': result['sharpe_ratio'],
+        'nit': diag.get('nit'),
+        'nfev': diag.get('nfev'),
+        'best_start_time': diag.get('time'),
+        'total_time': min(times),
+    }
+
+
+def main(sizes):
+    rows = []
+    for n in sizes:
+        for mode in ('numeric', 'analytic', 'qp'):
+            rows.append(run(n, mode))
+    table = pd.DataFrame(rows)
+    print(table.to_string(index=False, float_format=lambda x: f'{x:.4f}'))
+    pivot = table.pivot(index='n_assets', columns='mode', values='total_time')
+    speedup = pd.DataFrame({'analytic': pivot['numeric'] / pivot['analytic'], 'qp': pivot['numeric'] / pivot['qp']})
+    print("\nSpeed-up over numeric SLSQP:")
+    print(speedup.to_string(float_format=lambda x: f'{x:.1f}x'))
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10, 50, 100, 200])
@@ -0,0 +1,132 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config import REBALANCING_FREQUENCY, ROLLING_WINDOW, TRANSACTION_COSTS
+from covariance import CovarianceEstimator
+from data_collection import calculate_annualized_metrics
+from frequency import periods_per_year as tagged_periods_per_year
+from optimization import optimize_portfolio
+
+
+def rebalance_dates(index, window=ROLLING_WINDOW, rebalance=REBALANCING_FREQUENCY):
+    """
+    Last observation of each rebalancing period that has at least `window` observations behind it.
+    Args:
+        index (pd.DatetimeIndex): Return dates
+        window (int): Estimation window length in periods
+        rebalance (str): pandas period alias ('M', 'Q', 'Y', ...)
+    Returns:
+        pd.DatetimeIndex: Rebalance dates
+    """
+    ends = pd.Series(index, index=index).groupby(index.to_period(rebalance)).max()
+    return pd.DatetimeIndex(ends.values[ends.values >= index[window - 1]])
+
+
+def walk_forward_backtest(
+    returns,
+    window=ROLLING_WINDOW,
+    rebalance=REBALANCING_FREQUENCY,
+    transaction_costs=TRANSACTION_COSTS,
+    turnover_aware=True,
+    covariance_method='sample',
+    periods_per_year=None,
+    n_jobs=1,
+    **optimizer_kwargs
+):
+    """
+    Out-of-sample walk-forward backtest of optimize_portfolio.
+    At each rebalance date the model is estimated on the trailing `window` periods (up to and including
+    that date) and the new weights are held, drifting with returns, until the next rebalance.
+    Args:
+        returns (pd.DataFrame): Periodic asset returns (dates x assets)
+        window (int): Estimation window length in periods
+        rebalance (str): Rebalancing period alias ('M', 'Q', 'Y', ...)
+        transaction_costs (float): Proportional cost charged on turnover (also passed to the optimizer)
+        turnover_aware (bool): Pass the drifted holdings to optimize_portfolio as prev_weights; windows then
+            depend on each other and run in order. If False every window is solved independently and
+            n_jobs > 1 spreads them over a process pool
+        covariance_method (str): 'sample', 'ewma' or 'ledoit_wolf' (see CovarianceEstimator)
+        periods_per_year (int): Annualization factor (defaults to the factor tagged on the returns)
+        n_jobs (int): Worker processes for independent windows
+        **optimizer_kwargs: Passed to optimize_portfolio (esg_scores, min_alt, gradients, solver, ...)
+    Returns:
+        dict: {'weights': pd.DataFrame of target weights per rebalance date,
+               'turnover': pd.Series, 'costs': pd.Series (per rebalance date),
+               'gross_returns': pd.Series, 'net_returns': pd.Series (per period after the first rebalance),
+               'timings': pd.DataFrame of solve time and status per rebalance date, 'elapsed': seconds}
+    """
+    t0 = time.perf_counter()
+    ppy = periods_per_year or tagged_periods_per_year(returns)
+    values = returns.fillna(0.0).values
+    dates = rebalance_dates(returns.index, window, rebalance)
+    positions = returns.index.get_indexer(dates)
+    n = returns.shape[1]
+    tasks = [(returns.iloc[p - window + 1:p + 1], covariance_method, ppy, transaction_costs, optimizer_kwargs)
+             for p in positions]
+
+    solved = []
+    if not turnover_aware:
+        if n_jobs == 1 or len(tasks) <= 1:
+            solved = [_solve_window(task + (None,)) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks))) as pool:
+                solved = list(pool.map(_solve_window, [task + (None,) for task in tasks]))
+
+    holdings = np.zeros(n)
+    targets = np.zeros((len(dates), n))
+    turnover = np.zeros(len(dates))
+    gross = np.zeros(len(returns))
+    net = np.zeros(len(returns))
+    timings = []
+    for k, pos in enumerate(positions):
+        if turnover_aware:
+            prev = holdings if k > 0 else None
+            solved.append(_solve_window(tasks[k] + (prev,)))
+        weights, elapsed, status = solved[k]
+        targets[k] = weights
+        turnover[k] = np.abs(weights - holdings).sum()
+        timings.append({'solve_time': elapsed, 'status': status})
+
+        # Buy-and-hold until the next rebalance, vectorized over the segment
+        end = positions[k + 1] if k + 1 < len(positions) else len(returns) - 1
+        segment = values[pos + 1:end + 1]
+        if len(segment):
+            growth = weights * np.cumprod(1 + segment, axis=0)
+            wealth = growth.sum(axis=1)
+            gross[pos + 1:end + 1] = wealth / np.r_[1.0, wealth[:-1]] - 1
+            holdings = growth[-1] / wealth[-1]
+        else:
+            holdings = weights
+        net[pos + 1:end + 1] = gross[pos + 1:end + 1]
+        if pos + 1 <= end:
+            # Costs are paid out of the first period's return after the trade
+            net[pos + 1] = (1 + gross[pos + 1]) * (1 - transaction_costs * turnover[k]) - 1
+
+    start = positions[0] + 1 if len(positions) else len(returns)
+    live = returns.index[start:]
+    return {
+        'weights': pd.DataFrame(targets, index=dates, columns=returns.columns),
+        'turnover': pd.Series(turnover, index=dates, name='turnover'),
+        'costs': pd.Series(transaction_costs * turnover, index=dates, name='costs'),
+        'gross_returns': pd.Series(gross[start:], index=live, name='gross_returns'),
+        'net_returns': pd.Series(net[start:], index=live, name='net_returns'),
+        'timings': pd.DataFrame(timings, index=dates),
+        'elapsed': time.perf_counter() - t0
+    }
+
+
+def _solve_window(task):
+    """Estimate one window and optimize (top-level so it can run in a worker process)."""
+    window_returns, covariance_method, ppy, transaction_costs, optimizer_kwargs, prev = task
+    t0 = time.perf_counter()
+    expected_returns = calculate_annualized_metrics(window_returns, ppy)['annualized_return']
+    cov_matrix = CovarianceEstimator.from_returns(window_returns, method=covariance_method,
+                                                  periods_per_year=ppy).covariance()
+    result = optimize_portfolio(expected_returns, cov_matrix, transaction_costs=transaction_costs,
+                                prev_weights=prev, **optimizer_kwargs)
+    diagnostics = result.get('diagnostics') or {}
+    weights = np.array([result['weights'][t] for t in window_returns.columns])
+    return weights, time.perf_counter() - t0, diagnostics.get('status', 'fallback')
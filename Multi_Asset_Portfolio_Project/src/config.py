@@ -15,7 +15,15 @@ ASSET_TICKERS = [
 # Data Configuration
 START_DATE = '2019-01-01'
 END_DATE = '2024-12-31'
-DATA_FREQUENCY = 'M'  # Monthly
+DATA_FREQUENCY = 'M'  # 'D' daily, 'W' weekly or 'M' monthly
+PRICE_STORE_DIR = '../data/price_store/'  # Local Parquet cache of daily prices
+RETURNS_PANEL_DIR = '../data/returns_panel/'  # Memory-mapped returns panel the covariance is estimated from
+OFFLINE_MODE = False  # Serve prices from the local store only, never download
+DATA_PROVIDER = 'yfinance'  # 'yfinance', 'file' or 'synthetic'
+INGEST_WORKERS = 8  # Concurrent per-ticker downloads (with retries) when filling the price store
+DATA_PROVIDER_OPTIONS = {}  # e.g. {'directory': '../data/raw/'} for 'file', {'seed': 42} for 'synthetic'
+RESULT_CACHE_DIR = '../data/result_cache/'  # On-disk tier of the optimization/risk result cache (None = memory only)
+RESULT_CACHE_MAX_BYTES = 256 * 2**20  # Size budget of the on-disk result cache
 
 # Portfolio Constraints
 MAX_ASSET_WEIGHT = 0.40  # 40% max per asset
@@ -27,6 +35,10 @@ MIN_ESG_SCORE = 7.0      # Minimum average ESG score
 RISK_FREE_RATE = 0.02    # 2% annual risk-free rate
 TRANSACTION_COSTS = 0.001 # 10 bps per trade
 VAR_CONFIDENCE_LEVELS = [0.95, 0.99]
+MC_VAR_SCENARIOS = 1000000  # Simulated scenarios for Monte Carlo VaR/ES (streamed in chunks)
+MC_VAR_SEED = 42
+COVARIANCE_METHOD = 'sample'  # 'sample', 'ewma' or 'ledoit_wolf'
+EWMA_DECAY = 0.94             # RiskMetrics decay for COVARIANCE_METHOD = 'ewma'
 
 # ESG Scores (1-10 scale)
 ESG_SCORES = {
@@ -0,0 +1,173 @@
+import itertools
+import time
+
+import numpy as np
+
+from optimization import ESG_SCORES, GRID_PARAMETERS, _PortfolioProblem, _iter_grid, _qp_data, _qp_result
+from qp_solver import QPSolver
+
+# Default grid, covering the dashboard slider ranges (max_single above max_asset=0.4 changes nothing)
+DEFAULT_AXES = {
+    'risk_free_rate': np.round(np.arange(0.0, 0.0501, 0.01), 4),
+    'min_alt': np.round(np.arange(0.0, 0.401, 0.1), 4),
+    'max_single': np.round(np.arange(0.15, 0.401, 0.05), 4),
+    'min_esg': np.round(np.arange(6.0, 8.01, 0.5), 4),
+}
+
+
+class ConstraintSurface:
+    """
+    Optimal portfolios precomputed over a grid of (risk_free_rate, min_alt, max_single, min_esg).
+
+    The QP primal/dual solutions are kept as dense arrays indexed by grid coordinates, so a request
+    is served by a nearest-node lookup followed by a short QP solve warm-started from that node.
+    A surface is tied to the expected returns and covariance it was built from (see matches()).
+    """
+
+    def __init__(self, tickers, expected_returns, cov_matrix, esg, max_asset, objective, axes, primal, dual,
+                 solved, tag=''):
+        """
+        Args:
+            tickers (list): Asset names
+            expected_returns (np.ndarray): Annualized expected returns (N,)
+            cov_matrix (np.ndarray): Annualized covariance (N x N)
+            esg (np.ndarray): ESG score per asset (N,)
+            max_asset (float): Per-asset cap used for every grid point
+            objective (str): 'max_sharpe' or 'min_variance'
+            axes (dict): Sorted grid values for each of GRID_PARAMETERS
+            primal, dual (np.ndarray): QP solutions with shape grid_shape + (variables,) / (constraints,)
+            solved (np.ndarray): Boolean grid_shape mask of successfully solved nodes
+            tag (str): Free-form label of the data snapshot (e.g. price store revision)
+        """
+        self.tickers = list(tickers)
+        self.mu = np.asarray(expected_returns, dtype=float)
+        self.cov = np.asarray(cov_matrix, dtype=float)
+        self.esg = np.asarray(esg, dtype=float)
+        self.max_asset = float(max_asset)
+        self.objective = objective
+        self.axes = {k: np.asarray(axes[k], dtype=float) for k in GRID_PARAMETERS}
+        self.primal = primal
+        self.dual = dual
+        self.solved = solved
+        self.tag = tag
+        esg_scores = dict(zip(self.tickers, self.esg))
+        self._base = _PortfolioProblem(self.mu, self.cov, self.tickers, esg_scores, 0.0, max_asset, max_asset,
+                                       0.0, 0.0, 0.0, None)
+        self._solver = None
+
+    @property
+    def shape(self):
+        """Grid shape in GRID_PARAMETERS order."""
+        return self.solved.shape
+
+    @classmethod
+    def build(cls, expected_returns, cov_matrix, axes=None, esg_scores=ESG_SCORES, max_asset=0.4,
+              objective='max_sharpe', tag=''):
+        """
+        Solve every grid node (warm-started sweep, see optimize_portfolio_grid).
+        Args:
+            expected_returns (pd.Series): Annualized expected returns
+            cov_matrix (pd.DataFrame): Annualized covariance matrix
+            axes (dict): Grid values per parameter; missing parameters use DEFAULT_AXES
+            esg_scores (dict): ESG scores for each asset
+            max_asset (float): Max allocation to any asset
+            objective (str): 'max_sharpe' or 'min_variance'
+            tag (str): Label of the data snapshot
+        Returns:
+            ConstraintSurface
+        """
+        axes = dict(DEFAULT_AXES, **(axes or {}))
+        axes = {k: np.unique(np.asarray(axes[k], dtype=float)) for k in GRID_PARAMETERS}
+        tickers = expected_returns.index.tolist()
+        esg = np.array([esg_scores.get(t, 7.0) for t in tickers])
+        surface = cls(tickers, expected_returns, cov_matrix, esg, max_asset, objective, axes, None, None,
+                      None, tag)
+        shape = tuple(len(axes[k]) for k in GRID_PARAMETERS)
+        points = [dict(zip(GRID_PARAMETERS, values))
+                  for values in itertools.product(*(axes[k] for k in GRID_PARAMETERS))]
+
+        primal, dual, solved = None, None, np.zeros(len(points), dtype=bool)
+        for i, (problem, sol) in enumerate(_iter_grid(surface._base, points, objective)):
+            if sol is None:
+                continue
+            if primal is None:
+                primal = np.full((len(points), len(sol['x'])), np.nan)
+                dual = np.full((len(points), len(sol['y'])), np.nan)
+            primal[i], dual[i] = sol['x'], sol['y']
+            solved[i] = sol['status'] == 'solved'
+        if primal is None:
+            raise ValueError("No grid point could be solved (no asset beats any of the risk-free rates)")
+        surface.primal = primal.reshape(shape + primal.shape[1:])
+        surface.dual = dual.reshape(shape + dual.shape[1:])
+        surface.solved = solved.reshape(shape)
+        return surface
+
+    def matches(self, expected_returns, cov_matrix):
+        """True if the surface was built from these inputs (same tickers, returns and covariance)."""
+        return (list(expected_returns.index) == self.tickers
+                and np.allclose(np.asarray(expected_returns, dtype=float), self.mu, rtol=0, atol=1e-12)
+                and np.allclose(np.asarray(cov_matrix, dtype=float), self.cov, rtol=0, atol=1e-12))
+
+    def nearest(self, risk_free_rate=0.02, min_alt=0.2, max_single=0.3, min_esg=7.0):
+        """
+        Nearest grid node to a parameter setting.
+        Returns:
+            tuple: (grid index, {parameter: node value})
+        """
+        params = dict(zip(GRID_PARAMETERS, (risk_free_rate, min_alt, max_single, min_esg)))
+        idx = tuple(int(np.argmin(np.abs(self.axes[k] - params[k]))) for k in GRID_PARAMETERS)
+        return idx, {k: float(self.axes[k][i]) for k, i in zip(GRID_PARAMETERS, idx)}
+
+    def query(self, risk_free_rate=0.02, min_alt=0.2, max_single=0.3, min_esg=7.0, tolerance=1e-7):
+        """
+        Optimal portfolio for a parameter setting, served from the grid.
+        Args:
+            risk_free_rate, min_alt, max_single, min_esg: Requested setting
+            tolerance (float): Residual tolerance of the warm-started polish solve (smaller = closer to an
+                exact re-solve); None returns the nearest node's portfolio without solving, even if it
+                does not satisfy the requested constraints exactly
+        Returns:
+            dict: Same keys as optimize_portfolio; diagnostics report 'source' ('grid', 'nearest' or
+                  'polished'), the grid node used, iterations and time
+        """
+        t0 = time.perf_counter()
+        idx, node = self.nearest(risk_free_rate, min_alt, max_single, min_esg)
+        on_node = all(np.isclose(node[k], v, rtol=0, atol=1e-12) for k, v in
+                      zip(GRID_PARAMETERS, (risk_free_rate, min_alt, max_single, min_esg)))
+        if (on_node or tolerance is None) and self.solved[idx]:
+            problem = self._base.with_params(**node)
+            sol = {'x': self.primal[idx], 'y': self.dual[idx], 'status': 'solved', 'iterations': 0,
+                   'polished': True, 'time': 0.0}
+            source = 'grid' if on_node else 'nearest'
+        else:
+            problem = self._base.with_params(risk_free_rate=risk_free_rate, min_alt=min_alt,
+                                             max_single=max_single, min_esg=min_esg)
+            if self.objective == 'max_sharpe' and problem.mu.max() <= problem.rf:
+                raise ValueError("No asset beats the risk-free rate; the maximum-Sharpe problem has no solution")
+            P, q, A, l, u = _qp_data(problem, self.objective)
+            self._solver = QPSolver(P, A) if self._solver is None else self._solver.with_constraints(A)
+            warm = self.solved[idx]
+            sol = self._solver.solve(q, l, u, x0=self.primal[idx] if warm else None,
+                                     y0=self.dual[idx] if warm else None,
+                                     eps_abs=tolerance or 1e-7, eps_rel=tolerance or 1e-7)
+            source = 'polished'
+        result = _qp_result(problem, self.tickers, self.objective, sol)
+        result['diagnostics'].update(source=source, grid_point=node, time=time.perf_counter() - t0)
+        return result
+
+    def save(self, path):
+        """Write the surface to a compressed .npz file."""
+        np.savez_compressed(
+            path, tickers=np.array(self.tickers), mu=self.mu, cov=self.cov, esg=self.esg,
+            max_asset=self.max_asset, objective=self.objective, primal=self.primal, dual=self.dual,
+            solved=self.solved, tag=self.tag, **{f'axis_{k}': self.axes[k] for k in GRID_PARAMETERS}
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Read a surface written by save()."""
+        with np.load(path, allow_pickle=False) as data:
+            axes = {k: data[f'axis_{k}'] for k in GRID_PARAMETERS}
+            return cls(data['tickers'].tolist(), data['mu'], data['cov'], data['esg'], float(data['max_asset']),
+                       str(data['objective']), axes, data['primal'], data['dual'], data['solved'],
+                       str(data['tag']))
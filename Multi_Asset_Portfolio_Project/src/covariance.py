@@ -0,0 +1,432 @@
+import copy
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.linalg import cholesky
+
+from frequency import periods_per_year as tagged_periods_per_year
+
+
+def nearest_psd(matrix, min_eigenvalue=0.0):
+    """
+    Repair a symmetric matrix that is not positive semi-definite by clipping its eigenvalues.
+    Args:
+        matrix (np.ndarray): Symmetric N x N matrix
+        min_eigenvalue (float): Floor for the eigenvalues
+    Returns:
+        np.ndarray: Closest (in Frobenius norm) matrix with eigenvalues >= min_eigenvalue
+    """
+    sym = (matrix + matrix.T) / 2
+    vals, vecs = np.linalg.eigh(sym)
+    repaired = (vecs * np.maximum(vals, min_eigenvalue)) @ vecs.T
+    return (repaired + repaired.T) / 2
+
+
+class CovarianceEstimator:
+    """
+    Streaming covariance estimate updated in O(N^2) per new observation.
+
+    Methods:
+        'sample': unbiased sample covariance (Welford co-moments)
+        'ewma': RiskMetrics exponentially weighted covariance (zero mean, decay lambda)
+        'ledoit_wolf': sample covariance shrunk towards a scaled identity (Ledoit-Wolf 2004);
+            the shrinkage intensity is computed from running moments, no history is kept
+
+    The annualized matrix and its Cholesky factor are cached until the next update, so
+    optimization, VaR and risk-contribution code can share one estimate.
+    """
+
+    METHODS = ('sample', 'ewma', 'ledoit_wolf')
+
+    def __init__(self, assets, method='sample', decay=0.94, periods_per_year=12, min_eigenvalue=1e-12):
+        """
+        Args:
+            assets (list): Asset names
+            method (str): 'sample', 'ewma' or 'ledoit_wolf'
+            decay (float): EWMA decay lambda (0.94 is the RiskMetrics daily value)
+            periods_per_year (int): Annualization factor
+            min_eigenvalue (float): Eigenvalue floor used when the estimate needs PSD repair
+        """
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown covariance method '{method}', expected one of {self.METHODS}")
+        self.assets = list(assets)
+        self.method = method
+        self.decay = decay
+        self.periods_per_year = periods_per_year
+        self.min_eigenvalue = min_eigenvalue
+        self.reset()
+
+    def reset(self):
+        """Forget all observations, keeping the assets and settings."""
+        n = len(self.assets)
+        self.count = 0
+        self.mean = np.zeros(n)
+        self.comoment = np.zeros((n, n))
+        # EWMA: decayed sum of outer products and of weights
+        self.ewma_sum = np.zeros((n, n))
+        self.ewma_weight = 0.0
+        # Ledoit-Wolf: running moments of q = ||x||^2 for the shrinkage intensity
+        self.sum_q = 0.0
+        self.sum_q2 = 0.0
+        self.sum_qx = np.zeros(n)
+        self.first_index = None
+        self.last_index = None
+        self.last_row = None
+        self._previous = None
+        self._cache = {}
+
+    @classmethod
+    def from_returns(cls, returns, method='sample', decay=0.94, periods_per_year=None, **kwargs):
+        """
+        Build an estimator from a returns DataFrame.
+        periods_per_year defaults to the factor tagged on the returns (12 if untagged).
+        """
+        est = cls(returns.columns, method=method, decay=decay,
+                  periods_per_year=periods_per_year or tagged_periods_per_year(returns), **kwargs)
+        est.update_many(returns)
+        return est
+
+    @classmethod
+    def from_panel(cls, panel, tickers=None, method='sample', decay=0.94, periods_per_year=12, chunk_rows=4096,
+                   **kwargs):
+        """
+        Build an estimator from a ReturnsPanel, reading the mapped columns chunk_rows periods at a time,
+        so the T x N history is never copied into memory whole. Same result as from_returns on panel.frame().
+        Args:
+            panel (ReturnsPanel): Returns panel
+            tickers (list): Columns to use (all if None); adjacent tickers are read without a gather
+            chunk_rows (int): Periods folded in per block
+        """
+        tickers = panel.tickers if tickers is None else list(tickers)
+        est = cls(tickers, method=method, decay=decay, periods_per_year=periods_per_year, **kwargs)
+        data = panel.columns(tickers)
+        t = len(panel.dates)
+        for start in range(0, t - 1, chunk_rows):
+            stop = min(start + chunk_rows, t - 1)
+            est._update_block(data[start:stop], panel.dates[start:stop])
+        if t:
+            # Last period goes through update() so a later revision of it can be replaced, as in update_many
+            est._snapshot()
+            est.update(data[t - 1], panel.dates[t - 1])
+        return est
+
+    def update(self, x, index=None):
+        """
+        Add one observation (NaNs are treated as zero returns).
+        Args:
+            x (array-like or pd.Series): Returns for every asset, in self.assets order
+            index: Label of the period
+        """
+        if isinstance(x, pd.Series):
+            x = x.reindex(self.assets)
+        x = np.nan_to_num(np.asarray(x, dtype=float))
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.comoment += np.outer(delta, x - self.mean)
+        self.ewma_sum = self.decay * self.ewma_sum + np.outer(x, x)
+        self.ewma_weight = self.decay * self.ewma_weight + 1.0
+        q = x @ x
+        self.sum_q += q
+        self.sum_q2 += q * q
+        self.sum_qx += q * x
+        self.last_index = index.strftime('%Y-%m-%d') if hasattr(index, 'strftime') else index
+        if self.first_index is None:
+            self.first_index = self.last_index
+        self.last_row = x
+        self._cache = {}
+
+    def update_many(self, returns):
+        """
+        Add the rows of a returns DataFrame that come after last_index.
+        A revised last row (e.g. a month-to-date bar that has since closed) replaces the old one,
+        and a window that starts at a different period than the one seen so far restarts the estimate.
+        Returns:
+            int: Number of rows added
+        """
+        if list(returns.columns) != self.assets:
+            raise ValueError("Returns columns do not match the estimator's assets")
+        if self.first_index is not None and len(returns) and pd.Timestamp(self.first_index) != returns.index[0]:
+            self.reset()
+        new = returns
+        if self.last_index is not None:
+            last = pd.Timestamp(self.last_index)
+            if last in returns.index:
+                current = np.nan_to_num(returns.loc[last].values.astype(float))
+                if self._previous is not None and not np.allclose(current, self.last_row):
+                    self.__dict__.update(copy.deepcopy(self._previous))
+                    self.update(current, last)
+            new = returns.loc[returns.index > last]
+        for i, (idx, row) in enumerate(zip(new.index, new.values)):
+            if i == len(new) - 1:
+                self._snapshot()
+            self.update(row, idx)
+        return len(new)
+
+    def _snapshot(self):
+        # State before the latest row, restored if that row is later revised
+        state = {k: v for k, v in self.__dict__.items() if k not in ('_previous', '_cache')}
+        self._previous = copy.deepcopy(state)
+
+    def _update_block(self, x, dates):
+        """Fold in a block of rows at once: the equivalent of update() on each row, as matrix products."""
+        x = np.nan_to_num(np.asarray(x, dtype=float))
+        m = len(x)
+        # Pairwise (Chan et al.) merge of the block's centred co-moments into the running ones
+        block_mean = x.mean(axis=0)
+        centred = x - block_mean
+        delta = block_mean - self.mean
+        total = self.count + m
+        self.comoment += centred.T @ centred + np.outer(delta, delta) * (self.count * m / total)
+        self.mean += delta * (m / total)
+        self.count = total
+        weights = self.decay ** np.arange(m - 1, -1, -1, dtype=float)
+        self.ewma_sum = self.decay ** m * self.ewma_sum + (x * weights[:, None]).T @ x
+        self.ewma_weight = self.decay ** m * self.ewma_weight + weights.sum()
+        q = np.einsum('ij,ij->i', x, x)
+        self.sum_q += q.sum()
+        self.sum_q2 += q @ q
+        self.sum_qx += q @ x
+        labels = [d.strftime('%Y-%m-%d') if hasattr(d, 'strftime') else d for d in (dates[0], dates[-1])]
+        if self.first_index is None:
+            self.first_index = labels[0]
+        self.last_index = labels[1]
+        self.last_row = x[-1]
+        self._cache = {}
+
+    def to_dict(self):
+        params = ('assets', 'method', 'decay', 'periods_per_year', 'min_eigenvalue')
+        state = {key: getattr(self, key) for key in params}
+        state.update(_encode_moments(self.__dict__))
+        state['previous'] = None if self._previous is None else _encode_moments(self._previous)
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        est = cls(state['assets'], state['method'], state['decay'], state['periods_per_year'],
+                  state['min_eigenvalue'])
+        est.__dict__.update(_decode_moments(state))
+        if state['previous'] is not None:
+            est._previous = _decode_moments(state['previous'])
+        return est
+
+    def save(self, path):
+        """Write the state to a JSON file (atomically)."""
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    @property
+    def shrinkage(self):
+        """Ledoit-Wolf shrinkage intensity in [0, 1] for the current data."""
+        n, p = self.count, len(self.assets)
+        if n < 2:
+            return 1.0
+        emp = self.comoment / n
+        mu = np.trace(emp) / p
+        delta = (np.sum(emp ** 2) - 2 * mu * np.trace(emp) + p * mu ** 2) / p
+        if delta <= 0:
+            return 0.0
+        # sum_t ||x_t - mean||^4 expanded in running moments
+        m = self.mean
+        mm = m @ m
+        raw = self.comoment + n * np.outer(m, m)
+        sum_mx = n * mm
+        fourth = (self.sum_q2 - 4 * self.sum_qx @ m + 2 * mm * self.sum_q + 4 * m @ raw @ m
+                  - 4 * mm * sum_mx + n * mm ** 2)
+        beta = (fourth / n - np.sum(emp ** 2)) / (p * n)
+        return min(max(beta, 0.0), delta) / delta
+
+    def covariance(self, annualized=True):
+        """
+        Current covariance estimate, PSD-repaired if necessary.
+        Returns:
+            pd.DataFrame: N x N covariance (annualized unless annualized=False)
+        """
+        key = ('cov', annualized)
+        if key not in self._cache:
+            raw = self._raw_covariance()
+            try:
+                cholesky(raw + self.min_eigenvalue * np.eye(len(raw)), lower=True)
+            except np.linalg.LinAlgError:
+                raw = nearest_psd(raw, self.min_eigenvalue)
+            scale = self.periods_per_year if annualized else 1
+            self._cache[key] = pd.DataFrame(raw * scale, index=self.assets, columns=self.assets)
+        return self._cache[key]
+
+    def cholesky(self, annualized=True):
+        """Lower-triangular Cholesky factor L (cov = L L^T), cached until the next update."""
+        key = ('chol', annualized)
+        if key not in self._cache:
+            cov = self.covariance(annualized).values
+            self._cache[key] = cholesky(cov + self.min_eigenvalue * np.eye(len(cov)), lower=True)
+        return self._cache[key]
+
+    def portfolio_volatility(self, weights, annualized=True):
+        """Volatility of a weight vector (dict, Series or array in self.assets order)."""
+        w = self._weights(weights)
+        return float(np.linalg.norm(self.cholesky(annualized).T @ w))
+
+    def risk_contributions(self, weights, annualized=True):
+        """
+        Contribution of each asset to portfolio volatility (sums to the volatility).
+        Returns:
+            pd.Series: Risk contribution per asset
+        """
+        w = self._weights(weights)
+        cov = self.covariance(annualized).values
+        vol = np.sqrt(w @ cov @ w)
+        return pd.Series(w * (cov @ w) / vol, index=self.assets)
+
+    def _raw_covariance(self):
+        if self.method == 'ewma':
+            return self.ewma_sum / self.ewma_weight
+        if self.method == 'ledoit_wolf':
+            emp = self.comoment / self.count
+            mu = np.trace(emp) / len(self.assets)
+            s = self.shrinkage
+            return (1 - s) * emp + s * mu * np.eye(len(self.assets))
+        return self.comoment / (self.count - 1)
+
+    def _weights(self, weights):
+        if isinstance(weights, dict):
+            weights = pd.Series(weights)
+        if isinstance(weights, pd.Series):
+            weights = weights.reindex(self.assets).fillna(0)
+        return np.asarray(weights, dtype=float)
+
+
+# Running state of CovarianceEstimator written by to_dict(), besides its settings
+_MOMENT_ARRAYS = ('mean', 'comoment', 'ewma_sum', 'sum_qx', 'last_row')
+_MOMENT_SCALARS = ('count', 'ewma_weight', 'sum_q', 'sum_q2', 'first_index', 'last_index')
+
+
+def _encode_moments(state):
+    encoded = {key: state[key] for key in _MOMENT_SCALARS}
+    encoded.update({key: None if state[key] is None else state[key].tolist() for key in _MOMENT_ARRAYS})
+    return encoded
+
+
+def _decode_moments(state):
+    decoded = {key: state.get(key) for key in _MOMENT_SCALARS}
+    decoded.update({key: None if state[key] is None else np.array(state[key], dtype=float)
+                    for key in _MOMENT_ARRAYS})
+    return decoded
+
+
+class FactorCovariance:
+    """
+    Low-rank plus diagonal covariance: Sigma = B F B^T + diag(D).
+
+    B is N x K factor loadings, F the K x K factor covariance and D the specific (residual) variance
+    of each asset. Products with a weight vector cost O(NK) and the full N x N matrix is never formed,
+    so optimize_portfolio, plot_risk_contribution_bar and parametric_var accept it wherever a dense
+    covariance is expected. np.asarray() still gives the dense matrix for code that needs one.
+    """
+
+    # Make NumPy defer `w @ cov` to __rmatmul__ instead of densifying through __array__
+    __array_ufunc__ = None
+
+    def __init__(self, loadings, factor_cov, specific_var, assets=None, factors=None):
+        """
+        Args:
+            loadings (np.ndarray or pd.DataFrame): N x K factor loadings B
+            factor_cov (np.ndarray or pd.DataFrame): K x K factor covariance F
+            specific_var (array-like): Specific variance per asset D (N,)
+            assets (list): Asset names (defaults to the loadings index)
+            factors (list): Factor names (defaults to the loadings columns)
+        """
+        if isinstance(loadings, pd.DataFrame):
+            assets = list(loadings.index) if assets is None else assets
+            factors = list(loadings.columns) if factors is None else factors
+        self.loadings = np.asarray(loadings, dtype=float)
+        self.factor_cov = np.asarray(factor_cov, dtype=float)
+        self.specific_var = np.asarray(specific_var, dtype=float)
+        n, k = self.loadings.shape
+        if self.factor_cov.shape != (k, k) or self.specific_var.shape != (n,):
+            raise ValueError("Loadings, factor covariance and specific variance shapes do not match")
+        if (self.specific_var < 0).any():
+            raise ValueError("Specific variances must be non-negative")
+        self.assets = list(assets) if assets is not None else [f'A{i}' for i in range(n)]
+        self.factors = list(factors) if factors is not None else [f'F{i}' for i in range(k)]
+
+    @classmethod
+    def from_returns(cls, returns, factors=None, n_factors=3, periods_per_year=None, min_specific=1e-12):
+        """
+        Estimate the factor model from a returns panel.
+        With factor returns the loadings come from factor_analysis (time-series regression) and D is the
+        residual variance; without them the first n_factors principal components of the returns are
+        used (thin SVD of the T x N panel, so no N x N matrix is formed).
+        Args:
+            returns (pd.DataFrame): Periodic asset returns (dates x assets)
+            factors (pd.DataFrame): Factor returns on the same dates (optional)
+            n_factors (int): Number of statistical factors when factors is None
+            periods_per_year (int): Annualization factor (defaults to the factor tagged on the returns)
+            min_specific (float): Floor for the specific variances
+        Returns:
+            FactorCovariance: Annualized factor-model covariance
+        """
+        from risk_analytics import factor_analysis
+
+        ppy = periods_per_year or tagged_periods_per_year(returns)
+        x = np.nan_to_num(returns.values.astype(float))
+        if factors is not None:
+            f = np.nan_to_num(factors.reindex(returns.index).values.astype(float))
+            loadings = factor_analysis(pd.DataFrame(x, index=returns.index, columns=returns.columns),
+                                       pd.DataFrame(f, index=returns.index, columns=factors.columns)).values
+            residuals = x - f @ loadings.T
+            specific = residuals.var(axis=0, ddof=1)
+            factor_cov = nearest_psd(np.atleast_2d(np.cov(f, rowvar=False)))
+            names = list(factors.columns)
+        else:
+            k = min(n_factors, *x.shape)
+            centered = x - x.mean(axis=0)
+            _, s, vt = np.linalg.svd(centered, full_matrices=False)
+            loadings = vt[:k].T
+            factor_cov = np.diag(s[:k] ** 2 / (len(x) - 1))
+            specific = centered.var(axis=0, ddof=1) - (loadings ** 2) @ np.diag(factor_cov)
+            names = [f'PC{i + 1}' for i in range(k)]
+        return cls(loadings, factor_cov * ppy, np.maximum(specific, min_specific) * ppy,
+                   assets=returns.columns, factors=names)
+
+    @property
+    def shape(self):
+        return (len(self.assets), len(self.assets))
+
+    def __matmul__(self, x):
+        """Sigma @ x for a vector (N,) or a block of vectors (N x P) in O(NK) per vector."""
+        x = np.asarray(x, dtype=float)
+        d = self.specific_var if x.ndim == 1 else self.specific_var[:, None]
+        return self.loadings @ (self.factor_cov @ (self.loadings.T @ x)) + d * x
+
+    def __rmatmul__(self, x):
+        # Sigma is symmetric: x @ Sigma = (Sigma @ x^T)^T
+        return (self @ np.asarray(x, dtype=float).T).T
+
+    def __array__(self, dtype=None, copy=None):
+        return self.dense().astype(dtype or float, copy=False)
+
+    def variance(self, weights):
+        """Portfolio variance w^T Sigma w (weights in self.assets order)."""
+        w = np.asarray(weights, dtype=float)
+        exposure = self.loadings.T @ w
+        return float(exposure @ self.factor_cov @ exposure + self.specific_var @ w ** 2)
+
+    def diagonal(self):
+        """Asset variances."""
+        return np.einsum('ik,kl,il->i', self.loadings, self.factor_cov, self.loadings) + self.specific_var
+
+    def dense(self):
+        """Full N x N matrix (O(N^2) memory)."""
+        return self.loadings @ self.factor_cov @ self.loadings.T + np.diag(self.specific_var)
+
+    def to_frame(self):
+        """Full matrix as a DataFrame labelled by asset."""
+        return pd.DataFrame(self.dense(), index=self.assets, columns=self.assets)
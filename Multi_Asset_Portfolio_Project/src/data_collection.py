@@ -1,8 +1,17 @@
-import yfinance as yf
+import json
+import os
+import warnings
 import pandas as pd
 import numpy as np
 from datetime import datetime
 
+from data_providers import get_provider
+from frequency import get_frequency, resample_prices, tag_frequency
+from frequency import periods_per_year as tagged_periods_per_year
+from ingestion import ingest_tickers
+from monte_carlo import ALTERNATIVE_ASSUMPTIONS, simulate_alternative_paths
+from panel_store import ReturnsPanel
+
 ASSET_TICKERS = [
     'SPY',  # US Equity
     'EFA',  # International Equity
@@ -18,81 +27,263 @@ START_DATE = (datetime.now() - pd.DateOffset(years=5)).strftime('%Y-%m-%d')
 END_DATE = datetime.now().strftime('%Y-%m-%d')
 
 
-def collect_market_data(tickers=ASSET_TICKERS, start=START_DATE, end=END_DATE, simulate_alternatives=True, seed=42):
+def collect_market_data(tickers=ASSET_TICKERS, start=START_DATE, end=END_DATE, simulate_alternatives=True, seed=42,
+                        store=None, offline=False, provider=None, panel_path=None, panel_dtype='float64',
+                        metrics_state=None, ingest_workers=None, frequency='M'):
     """
-    Download historical price data for given tickers, calculate monthly returns, annualized metrics, and correlation matrix.
-    Optionally add simulated alternative asset data (hedge funds, private equity).
+    Download historical price data for given tickers, calculate periodic (monthly by default) returns, annualized
+    metrics, and correlation matrix.
+    Optionally add simulated alternative asset data (hedge funds, private equity), seeded by seed.
+    When a PriceStore is given, only the bars missing from the store are downloaded and the panel is rebuilt from it;
+    with offline=True nothing is downloaded and the store is served as-is.
+    provider selects the price source: 'yfinance' (default), 'file', 'synthetic' or a MarketDataProvider instance.
+    If panel_path is given, the returns are also written there as a memory-mapped ReturnsPanel.
+    If metrics_state (AnnualizedMetricsAccumulator) is given, only periods it has not seen are folded in
+    and the annualized metrics come from it instead of a full recomputation.
+    With ingest_workers set (and a store), missing tickers are downloaded concurrently with retries.
+    frequency ('D', 'W' or 'M') sets the sampling; the returns carry it and its periods-per-year factor in .attrs.
     Returns:
-        prices (pd.DataFrame): Cleaned monthly price data
-        returns (pd.DataFrame): Monthly returns
+        prices (pd.DataFrame): Cleaned period-end price data
+        returns (pd.DataFrame): Periodic returns
         ann_metrics (dict): Annualized return, volatility, Sharpe
         corr (pd.DataFrame): Correlation matrix
     """
-    np.random.seed(seed)
-    # Download daily adjusted close prices
-    data = yf.download(tickers, start=start, end=end, progress=False)
-    
-    # Handle different yfinance output formats
-    if isinstance(data.columns, pd.MultiIndex):
-        # Multi-level columns (newer yfinance version)
-        if 'Adj Close' in data.columns.get_level_values(0):
-            data = data['Adj Close']
-        else:
-            # Fallback to Close if Adj Close not available
-            data = data['Close']
+    freq = get_frequency(frequency)
+    if store is not None:
+        # Resampled once per frequency and cached by the store until new prices arrive
+        prices = load_prices_from_store(store, tickers, start, end, offline=offline, provider=provider,
+                                        max_workers=ingest_workers, frequency=freq)
+    elif offline:
+        raise ValueError("offline mode requires a price store")
     else:
-        # Single-level columns (older yfinance version)
-        if 'Adj Close' in data.columns:
-            data = data['Adj Close']
-        else:
-            # Fallback to Close
-            data = data['Close']
-    
-    # Forward fill and drop rows with all NaNs
-    data = data.ffill().dropna(how='all')
-    # Resample to month-end prices
-    monthly_prices = data.resample('M').last()
-    # Calculate monthly returns
-    monthly_returns = monthly_prices.pct_change().dropna(how='all')
+        prices = resample_prices(get_provider(provider).fetch(tickers, start, end), freq)
+    # Calculate periodic returns
+    returns = prices.pct_change().dropna(how='all')
     # Handle missing data: drop columns with >10% missing, fill others
-    missing = monthly_returns.isnull().mean()
-    monthly_returns = monthly_returns.loc[:, missing <= 0.1].fillna(0)
+    missing = returns.isnull().mean()
+    returns = returns.loc[:, missing <= 0.1].fillna(0)
     # Simulate alternative assets if needed
     if simulate_alternatives:
-        alt_assets = simulate_alternative_assets(monthly_returns.index)
-        monthly_returns = pd.concat([monthly_returns, alt_assets], axis=1)
-        monthly_prices = pd.concat([monthly_prices, (1+alt_assets).cumprod()], axis=1)
+        alt_assets = simulate_alternative_assets(returns.index, freq.periods_per_year, seed=seed)
+        returns = pd.concat([returns, alt_assets], axis=1)
+        prices = pd.concat([prices, (1+alt_assets).cumprod()], axis=1)
+    tag_frequency(returns, freq)
+    if panel_path is not None:
+        ReturnsPanel.from_frame(panel_path, returns, dtype=panel_dtype)
     # Annualized metrics
-    ann_metrics = calculate_annualized_metrics(monthly_returns)
+    if metrics_state is not None:
+        if metrics_state.periods_per_year != freq.periods_per_year:
+            metrics_state.periods_per_year = freq.periods_per_year
+            metrics_state.reset()
+        metrics_state.update_many(returns)
+        ann_metrics = metrics_state.metrics()
+    else:
+        ann_metrics = calculate_annualized_metrics(returns)
     # Correlation matrix
-    corr = monthly_returns.corr()
-    return monthly_prices, monthly_returns, ann_metrics, corr
+    corr = returns.corr()
+    return prices, returns, ann_metrics, corr
+
+def load_prices_from_store(store, tickers, start, end, offline=False, provider=None, max_workers=None, frequency=None):
+    """
+    Fill the gaps of a PriceStore for [start, end) and return the stored daily prices.
+    Args:
+        store (PriceStore): Local price store
+        tickers (list): Tickers to load
+        start, end (str): Requested window, end exclusive
+        offline (bool): If True, never download and serve only what the store holds
+        provider (str or MarketDataProvider): Source used to fill the gaps
+        max_workers (int): If set, fill the gaps per ticker with ingest_tickers (concurrent, with retries)
+        frequency (str or Frequency): If set, return the store's cached resampled panel instead of raw daily prices
+    Returns:
+        pd.DataFrame: Prices (dates x tickers)
+    """
+    if not offline:
+        provider = get_provider(provider)
+        for (gap_start, gap_end), gap_tickers in store.missing_ranges(tickers, start, end).items():
+            gap_start, gap_end = gap_start.strftime('%Y-%m-%d'), gap_end.strftime('%Y-%m-%d')
+            if max_workers:
+                ingest_tickers(gap_tickers, gap_start, gap_end, provider=provider, store=store, max_workers=max_workers)
+            else:
+                fetched = provider.fetch(gap_tickers, gap_start, gap_end)
+                store.write(fetched.reindex(columns=gap_tickers), gap_start, gap_end)
+    if frequency is not None:
+        data = store.resampled(tickers, start, end, frequency)
+    else:
+        data = store.read(tickers, start, end)
+    missing = [t for t in tickers if t not in data.columns]
+    if missing and (offline or len(missing) == len(tickers)):
+        raise ValueError(f"No stored prices for {missing}; run once with offline=False to populate the store")
+    if missing:
+        warnings.warn(f"Could not download {missing}; continuing without them")
+    return data
 
-def simulate_alternative_assets(index):
+def simulate_alternative_assets(index, periods_per_year=12, seed=42):
     """
-    Simulate monthly returns for two alternative assets: hedge funds and private equity.
-    Returns DataFrame with realistic mean/volatility.
+    Simulate periodic (monthly by default) returns for two alternative assets: hedge funds and private equity.
+    Draws one path from the seeded Monte Carlo engine with the ALTERNATIVE_ASSUMPTIONS mean/volatility and
+    PE appraisal smoothing, so the series is reproducible and does not touch NumPy's global random state.
+    Args:
+        index (pd.Index): Period index of the returns
+        periods_per_year (int): Periods per year of the index
+        seed (int): Seed for the path (non-reproducible if None)
+    Returns:
+        pd.DataFrame: Hedge_Fund and Private_Equity returns on index
     """
-    n = len(index)
-    # Hedge Funds: 10% annual return, 15% vol
-    hf_mean = 0.10 / 12
-    hf_vol = 0.15 / np.sqrt(12)
-    # Private Equity: 12% annual return, 18% vol
-    pe_mean = 0.12 / 12
-    pe_vol = 0.18 / np.sqrt(12)
-    hf = np.random.normal(hf_mean, hf_vol, n)
-    pe = np.random.normal(pe_mean, pe_vol, n)
-    return pd.DataFrame({'Hedge_Fund': hf, 'Private_Equity': pe}, index=index)
-
-def calculate_annualized_metrics(returns):
+    # Draws are laid out period by period and the smoothing is causal, so earlier periods are unchanged
+    # when the history grows
+    paths = simulate_alternative_paths(1, len(index), periods_per_year, rng=np.random.default_rng(seed))
+    return pd.DataFrame(paths[0], index=index, columns=list(ALTERNATIVE_ASSUMPTIONS))
+
+def calculate_annualized_metrics(returns, periods_per_year=None):
     """
     Calculate annualized return, volatility, and Sharpe ratio for each asset.
+    periods_per_year defaults to the factor tagged on the returns by collect_market_data (12 if untagged).
     """
-    ann_return = (1 + returns).prod() ** (12 / len(returns)) - 1
-    ann_vol = returns.std() * np.sqrt(12)
+    ppy = periods_per_year or tagged_periods_per_year(returns)
+    ann_return = (1 + returns).prod() ** (ppy / len(returns)) - 1
+    ann_vol = returns.std() * np.sqrt(ppy)
     sharpe = ann_return / ann_vol.replace(0, np.nan)
     return {'annualized_return': ann_return, 'annualized_volatility': ann_vol, 'sharpe_ratio': sharpe}
 
+class AnnualizedMetricsAccumulator:
+    """
+    Running version of calculate_annualized_metrics.
+    Keeps a log-sum of gross returns and Welford mean/variance per asset, so appending a
+    period costs O(N) and the metrics never require rescanning the history. The state is
+    JSON-serializable so a long-running process can resume after a restart; it covers the
+    window starting at first_index and is rebuilt when a caller's window starts elsewhere.
+    """
+
+    def __init__(self, assets=None, periods_per_year=12):
+        """
+        Args:
+            assets (list): Asset names; if None they are taken from the first update_many() call
+            periods_per_year (int): Annualization factor (12 for monthly data)
+        """
+        self.periods_per_year = periods_per_year
+        self.reset(assets)
+
+    def reset(self, assets=None):
+        """Forget all history, optionally switching to a new asset list."""
+        self.assets = list(assets) if assets is not None else None
+        n = len(self.assets) if self.assets is not None else 0
+        self.count = np.zeros(n)
+        self.log_sum = np.zeros(n)
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+        self.first_index = None
+        self.last_index = None
+        self.last_row = None
+
+    def update(self, row, index=None):
+        """
+        Fold in one period of returns (NaNs are skipped per asset).
+        Args:
+            row (array-like or pd.Series): Returns for every asset, in self.assets order
+            index: Label of the period (e.g. month-end date)
+        """
+        x = self._as_array(row)
+        valid = ~np.isnan(x)
+        self.count[valid] += 1
+        self.log_sum[valid] += np.log1p(x[valid])
+        delta = x[valid] - self.mean[valid]
+        self.mean[valid] += delta / self.count[valid]
+        self.m2[valid] += delta * (x[valid] - self.mean[valid])
+        self.last_index = index.strftime('%Y-%m-%d') if hasattr(index, 'strftime') else index
+        if self.first_index is None:
+            self.first_index = self.last_index
+        self.last_row = x
+
+    def update_many(self, returns):
+        """
+        Fold in the rows of a returns DataFrame that come after last_index.
+        If the last row already seen was revised (e.g. a month-to-date bar that has since
+        closed), it is removed and re-added. Switching to a different asset list, or a window that
+        starts at a different period (e.g. a trailing window after a restart), resets the state.
+        Args:
+            returns (pd.DataFrame): Returns (periods x assets), sorted by index
+        Returns:
+            int: Number of rows folded in
+        """
+        moved = self.first_index is not None and len(returns) and pd.Timestamp(self.first_index) != returns.index[0]
+        if self.assets != list(returns.columns) or moved:
+            self.reset(returns.columns)
+        new = returns
+        if self.last_index is not None:
+            last = pd.Timestamp(self.last_index)
+            if last in returns.index:
+                current = returns.loc[last].values.astype(float)
+                if not np.allclose(current, self.last_row, equal_nan=True):
+                    self._remove(self.last_row)
+                    self.update(current, self.last_index)
+            new = returns.loc[returns.index > last]
+        for idx, row in zip(new.index, new.values):
+            self.update(row, idx)
+        return len(new)
+
+    def metrics(self):
+        """
+        Returns:
+            dict: Same keys as calculate_annualized_metrics (pd.Series per metric)
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ann_return = np.exp(self.log_sum * self.periods_per_year / self.count) - 1
+            ann_vol = np.sqrt(np.maximum(self.m2, 0) / (self.count - 1)) * np.sqrt(self.periods_per_year)
+        ann_return = pd.Series(ann_return, index=self.assets)
+        ann_vol = pd.Series(ann_vol, index=self.assets)
+        sharpe = ann_return / ann_vol.replace(0, np.nan)
+        return {'annualized_return': ann_return, 'annualized_volatility': ann_vol, 'sharpe_ratio': sharpe}
+
+    def to_dict(self):
+        return {
+            'assets': self.assets,
+            'periods_per_year': self.periods_per_year,
+            'count': self.count.tolist(),
+            'log_sum': self.log_sum.tolist(),
+            'mean': self.mean.tolist(),
+            'm2': self.m2.tolist(),
+            'first_index': self.first_index,
+            'last_index': self.last_index,
+            'last_row': None if self.last_row is None else [None if np.isnan(v) else v for v in self.last_row],
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        acc = cls(state['assets'], state['periods_per_year'])
+        for key in ('count', 'log_sum', 'mean', 'm2'):
+            setattr(acc, key, np.array(state[key], dtype=float))
+        acc.first_index = state.get('first_index')
+        acc.last_index = state['last_index']
+        if state['last_row'] is not None:
+            acc.last_row = np.array([np.nan if v is None else v for v in state['last_row']], dtype=float)
+        return acc
+
+    def save(self, path):
+        """Write the state to a JSON file (atomically)."""
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def _as_array(self, row):
+        if isinstance(row, pd.Series):
+            row = row.reindex(self.assets)
+        return np.asarray(row, dtype=float)
+
+    def _remove(self, x):
+        """Reverse Welford step for a row previously passed to update()."""
+        valid = ~np.isnan(x)
+        n = self.count[valid]
+        self.log_sum[valid] -= np.log1p(x[valid])
+        mean_old = np.where(n > 1, (n * self.mean[valid] - x[valid]) / np.maximum(n - 1, 1), 0.0)
+        self.m2[valid] -= (x[valid] - mean_old) * (x[valid] - self.mean[valid])
+        self.mean[valid] = mean_old
+        self.count[valid] -= 1
+
 if __name__ == "__main__":
     # Example usage and test
     prices, rets, metrics, corr = collect_market_data()
@@ -0,0 +1,217 @@
+import glob
+import io
+import os
+import threading
+import zlib
+
+import numpy as np
+import pandas as pd
+
+
+class TickerNotFound(KeyError):
+    """Raised by per-ticker providers when the source has no data for a ticker (not worth retrying)."""
+
+
+class MarketDataProvider:
+    """
+    Source of daily prices. Subclasses implement fetch(), which returns a wide
+    DataFrame of daily close prices (dates x tickers) for the window [start, end).
+    Tickers the source does not know about are simply left out of the result.
+    """
+
+    name = None
+
+    def fetch(self, tickers, start, end):
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Yahoo Finance adjusted close prices (yfinance is imported on first use)."""
+
+    name = 'yfinance'
+
+    def fetch(self, tickers, start, end):
+        import yfinance as yf
+        data = yf.download(list(tickers), start=start, end=end, progress=False)
+
+        # Handle different yfinance output formats
+        if isinstance(data.columns, pd.MultiIndex):
+            # Multi-level columns (newer yfinance version)
+            if 'Adj Close' in data.columns.get_level_values(0):
+                data = data['Adj Close']
+            else:
+                # Fallback to Close if Adj Close not available
+                data = data['Close']
+        else:
+            # Single-level columns (older yfinance version)
+            if 'Adj Close' in data.columns:
+                data = data['Adj Close']
+            else:
+                # Fallback to Close
+                data = data['Close']
+        if isinstance(data, pd.Series):
+            data = data.to_frame(list(tickers)[0])
+        return data
+
+
+class FileProvider(MarketDataProvider):
+    """
+    Prices read from a directory of wide CSV/Parquet files.
+
+    Every file holds a date column plus one column per ticker. A fetch makes one
+    pass over the directory and reads only the requested ticker columns from each
+    file (column projection), so thousands of tickers load without a per-ticker loop.
+    """
+
+    name = 'file'
+
+    def __init__(self, directory, date_column='date'):
+        """
+        Args:
+            directory (str): Directory containing *.csv and/or *.parquet files
+            date_column (str): Name of the date column in every file
+        """
+        self.directory = directory
+        self.date_column = date_column
+
+    def fetch(self, tickers, start, end):
+        wanted = set(tickers)
+        frames = []
+        for path in sorted(glob.glob(os.path.join(self.directory, '*'))):
+            if path.endswith('.parquet'):
+                frame = self._read_parquet(path, wanted)
+            elif path.endswith('.csv'):
+                frame = pd.read_csv(path, usecols=lambda c: c == self.date_column or c in wanted,
+                                    parse_dates=[self.date_column])
+            else:
+                continue
+            if frame is None or len(frame.columns) < 2:
+                continue
+            frames.append(frame.set_index(self.date_column))
+        if not frames:
+            return pd.DataFrame()
+        data = pd.concat(frames, axis=1).sort_index()
+        if data.columns.duplicated().any():
+            # A ticker split across files (e.g. one file per year) is stitched back into one column
+            data = data.T.groupby(level=0).first().T
+        data.index = pd.DatetimeIndex(data.index)
+        data = data.loc[(data.index >= pd.Timestamp(start)) & (data.index < pd.Timestamp(end))]
+        return data[[t for t in tickers if t in data.columns]]
+
+    def _read_parquet(self, path, wanted):
+        import pyarrow.parquet as pq
+        available = pq.read_schema(path).names
+        columns = [c for c in available if c in wanted]
+        if not columns:
+            return None
+        return pd.read_parquet(path, columns=[self.date_column] + columns)
+
+
+class HTTPCSVProvider(MarketDataProvider):
+    """
+    Per-ticker CSV downloads over HTTP (a vendor endpoint or an internal mirror).
+
+    The URL template is formatted with ticker, start and end, and must return a CSV with a
+    date column and a close column. Each thread keeps its own requests.Session, so
+    concurrent ingestion reuses keep-alive connections instead of reconnecting per ticker.
+    """
+
+    name = 'http'
+
+    def __init__(self, url_template, timeout=10.0, date_column='date', price_column='close'):
+        """
+        Args:
+            url_template (str): e.g. 'http://mirror:8000/{ticker}.csv?start={start}&end={end}'
+            timeout (float): Per-request timeout in seconds
+            date_column, price_column (str): CSV column names
+        """
+        self.url_template = url_template
+        self.timeout = timeout
+        self.date_column = date_column
+        self.price_column = price_column
+        self._local = threading.local()
+
+    def fetch(self, tickers, start, end):
+        series = {t: self.fetch_one(t, start, end) for t in tickers}
+        return pd.DataFrame(series)
+
+    def fetch_one(self, ticker, start, end):
+        """Download one ticker as a price Series; raises TickerNotFound on 404."""
+        url = self.url_template.format(ticker=ticker, start=start, end=end)
+        response = self._session().get(url, timeout=self.timeout)
+        if response.status_code == 404:
+            raise TickerNotFound(ticker)
+        response.raise_for_status()
+        frame = pd.read_csv(io.StringIO(response.text), parse_dates=[self.date_column])
+        return pd.Series(frame[self.price_column].values, index=pd.DatetimeIndex(frame[self.date_column]), name=ticker)
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+            session = self._local.session = requests.Session()
+        return session
+
+
+class SyntheticProvider(MarketDataProvider):
+    """
+    Seeded geometric Brownian motion prices on business days.
+
+    Each ticker gets its own random stream derived from (seed, ticker), and paths
+    always start at a fixed anchor date, so a given (ticker, date) has the same
+    price whatever window or ticker list is requested.
+    """
+
+    name = 'synthetic'
+
+    def __init__(self, seed=42, mu=0.07, sigma=0.18, start_price=100.0, anchor='2000-01-03'):
+        """
+        Args:
+            seed (int): Base seed
+            mu (float or dict): Annual drift, optionally per ticker
+            sigma (float or dict): Annual volatility, optionally per ticker
+            start_price (float): Price on the anchor date
+            anchor (str): First date of every path
+        """
+        self.seed = seed
+        self.mu = mu
+        self.sigma = sigma
+        self.start_price = start_price
+        self.anchor = pd.Timestamp(anchor)
+
+    def fetch(self, tickers, start, end):
+        dates = pd.bdate_range(self.anchor, pd.Timestamp(end) - pd.Timedelta(days=1))
+        if len(dates) == 0:
+            return pd.DataFrame(columns=list(tickers))
+        dt = 1 / 252
+        paths = {}
+        for ticker in tickers:
+            mu = self.mu.get(ticker, 0.07) if isinstance(self.mu, dict) else self.mu
+            sigma = self.sigma.get(ticker, 0.18) if isinstance(self.sigma, dict) else self.sigma
+            rng = np.random.default_rng([self.seed, zlib.crc32(ticker.encode())])
+            log_ret = rng.normal((mu - 0.5 * sigma ** 2) * dt, sigma * np.sqrt(dt), len(dates))
+            log_ret[0] = 0.0
+            paths[ticker] = self.start_price * np.exp(np.cumsum(log_ret))
+        data = pd.DataFrame(paths, index=dates)
+        return data.loc[data.index >= pd.Timestamp(start)]
+
+
+PROVIDERS = {cls.name: cls for cls in (YFinanceProvider, FileProvider, HTTPCSVProvider, SyntheticProvider)}
+
+
+def get_provider(provider=None, **options):
+    """
+    Resolve a provider name or instance.
+    Args:
+        provider (str or MarketDataProvider): 'yfinance', 'file', 'http', 'synthetic', an instance, or None for yfinance
+        **options: Constructor arguments when a name is given (e.g. directory='data/raw')
+    Returns:
+        MarketDataProvider: Provider instance
+    """
+    if provider is None:
+        provider = 'yfinance'
+    if isinstance(provider, MarketDataProvider):
+        return provider
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown data provider '{provider}', expected one of {sorted(PROVIDERS)}")
+    return PROVIDERS[provider](**options)
@@ -0,0 +1,81 @@
+from collections import namedtuple
+
+import pandas as pd
+
+
+def _month_end_rule():
+    # pandas >= 2.2 renamed the month-end alias from 'M' to 'ME'
+    try:
+        pd.tseries.frequencies.to_offset('ME')
+        return 'ME'
+    except ValueError:
+        return 'M'
+
+
+Frequency = namedtuple('Frequency', ['code', 'rule', 'periods_per_year', 'label'])
+Frequency.__doc__ = """
+Sampling frequency of a returns panel.
+    code (str): 'D', 'W' or 'M'
+    rule (str): pandas resample rule, None for daily (trading days are kept as-is)
+    periods_per_year (int): Annualization factor
+    label (str): Human-readable name
+"""
+
+FREQUENCIES = {
+    'D': Frequency('D', None, 252, 'daily'),
+    'W': Frequency('W', 'W-FRI', 52, 'weekly'),
+    'M': Frequency('M', _month_end_rule(), 12, 'monthly'),
+}
+
+_ALIASES = {'B': 'D', 'DAILY': 'D', 'W-FRI': 'W', 'WEEKLY': 'W', 'ME': 'M', 'MONTHLY': 'M'}
+
+
+def get_frequency(freq):
+    """
+    Resolve a frequency code, alias or Frequency.
+    Args:
+        freq (str or Frequency): 'D', 'W', 'M' (or 'daily', 'ME', ...)
+    Returns:
+        Frequency
+    """
+    if isinstance(freq, Frequency):
+        return freq
+    code = _ALIASES.get(str(freq).upper(), str(freq).upper())
+    if code not in FREQUENCIES:
+        raise ValueError(f"Unsupported frequency '{freq}', expected one of {list(FREQUENCIES)}")
+    return FREQUENCIES[code]
+
+
+def resample_prices(prices, freq):
+    """
+    Clean daily prices and resample them to the given frequency (period-end prices).
+    Args:
+        prices (pd.DataFrame): Daily prices (dates x tickers)
+        freq (str or Frequency): Target frequency
+    Returns:
+        pd.DataFrame: Period-end prices
+    """
+    freq = get_frequency(freq)
+    # Forward fill and drop rows with all NaNs
+    prices = prices.ffill().dropna(how='all')
+    if freq.rule is None:
+        return prices
+    return prices.resample(freq.rule).last()
+
+
+def tag_frequency(frame, freq):
+    """Record the frequency and its annualization factor on a DataFrame/Series (in .attrs)."""
+    freq = get_frequency(freq)
+    frame.attrs['frequency'] = freq.code
+    frame.attrs['periods_per_year'] = freq.periods_per_year
+    return frame
+
+
+def periods_per_year(returns, default=12):
+    """
+    Annualization factor carried by a returns panel (see tag_frequency).
+    Args:
+        returns (pd.DataFrame or pd.Series): Returns, possibly tagged by collect_market_data
+        default (int): Fallback for untagged data (monthly)
+    """
+    return getattr(returns, 'attrs', {}).get('periods_per_year', default)
@@ -0,0 +1,77 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from data_providers import TickerNotFound, get_provider
+
+
+def ingest_tickers(tickers, start, end, provider=None, store=None, max_workers=8, retries=3, backoff=0.5):
+    """
+    Download many tickers concurrently with per-ticker retry and exponential backoff.
+    Each ticker is fetched on its own from a bounded thread pool; finished tickers are written
+    to the price store as they arrive, so a failure late in the run does not lose earlier work.
+    Args:
+        tickers (list): Tickers to download
+        start, end (str): Window to fetch, end exclusive
+        provider (str or MarketDataProvider): Price source (yfinance if None)
+        store (PriceStore): If given, each ticker is written to it as soon as it is fetched
+        max_workers (int): Size of the worker pool
+        retries (int): Extra attempts after the first failure or empty result (TickerNotFound is never retried)
+        backoff (float): Base delay in seconds; attempt k waits backoff * 2**(k-1)
+    Returns:
+        dict: {'prices': pd.DataFrame of fetched tickers, 'report': pd.DataFrame per ticker
+               (status, attempts, latency, rows, error), 'elapsed': seconds,
+               'tickers_per_sec': float, 'rows_per_sec': float}
+    """
+    provider = get_provider(provider)
+    t0 = time.perf_counter()
+    prices, report = {}, []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(_fetch_with_retry, provider, t, start, end, retries, backoff) for t in tickers]
+        for future in as_completed(futures):
+            result = future.result()
+            series = result.pop('series')
+            if series is not None:
+                prices[result['ticker']] = series
+                if store is not None:
+                    store.write(series.to_frame(result['ticker']), start, end)
+            report.append(result)
+    elapsed = time.perf_counter() - t0
+    report = pd.DataFrame(report).set_index('ticker').reindex(tickers)
+    ok = report['status'] == 'ok'
+    return {
+        'prices': pd.DataFrame(prices).reindex(columns=[t for t in tickers if t in prices]).sort_index(),
+        'report': report,
+        'elapsed': elapsed,
+        'tickers_per_sec': ok.sum() / elapsed if elapsed > 0 else float('nan'),
+        'rows_per_sec': report.loc[ok, 'rows'].sum() / elapsed if elapsed > 0 else float('nan'),
+    }
+
+
+def _fetch_with_retry(provider, ticker, start, end, retries, backoff):
+    """Fetch one ticker, retrying transient errors. Never raises; failures are reported."""
+    t0 = time.perf_counter()
+    error = None
+    for attempt in range(1, retries + 2):
+        try:
+            if hasattr(provider, 'fetch_one'):
+                series = provider.fetch_one(ticker, start, end)
+            else:
+                frame = provider.fetch([ticker], start, end)
+                series = frame[ticker] if ticker in frame.columns else pd.Series(dtype=float, name=ticker)
+            series = series.dropna()
+            if not len(series):
+                # yfinance reports network errors as an empty result rather than raising
+                raise ValueError(f"no prices returned for {start} to {end}")
+            return {'ticker': ticker, 'status': 'ok', 'attempts': attempt, 'latency': time.perf_counter() - t0,
+                    'rows': len(series), 'error': None, 'series': series}
+        except TickerNotFound as e:
+            error = f"not found: {e}"
+            break
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempt <= retries:
+                time.sleep(backoff * 2 ** (attempt - 1))
+    return {'ticker': ticker, 'status': 'failed', 'attempts': attempt, 'latency': time.perf_counter() - t0,
+            'rows': 0, 'error': error, 'series': None}
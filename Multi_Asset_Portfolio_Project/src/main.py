@@ -15,8 +15,18 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from config import *
 from data_collection import collect_market_data, calculate_annualized_metrics
-from optimization import optimize_portfolio
-from risk_analytics import calculate_var, stress_test_portfolio, factor_analysis, dynamic_correlation
+from data_providers import get_provider
+from covariance import CovarianceEstimator
+from panel_store import ReturnsPanel
+from price_store import PriceStore
+from memoize import ResultCache
+from optimization import optimize_portfolio, efficient_frontier
+from backtest import walk_forward_backtest
+from frequency import periods_per_year
+from risk_analytics import (
+    calculate_var, parametric_var, monte_carlo_var, stress_test_portfolio, factor_analysis, dynamic_correlation,
+    CorrelationMonitor
+)
 from performance import evaluate_managers, performance_attribution, dynamic_rebalancing
 from visualization import (
     plot_efficient_frontier, plot_asset_allocation_pie, plot_correlation_heatmap,
@@ -33,20 +43,33 @@ def main():
     try:
         # Step 1: Data Collection
         print("📊 Collecting market data...")
+        store = PriceStore(PRICE_STORE_DIR)
         prices, returns, metrics, corr_matrix = collect_market_data(
             tickers=ASSET_TICKERS,
             start=START_DATE,
             end=END_DATE,
-            simulate_alternatives=True
+            simulate_alternatives=True,
+            store=store,
+            offline=OFFLINE_MODE,
+            provider=get_provider(DATA_PROVIDER, **DATA_PROVIDER_OPTIONS),
+            ingest_workers=INGEST_WORKERS,
+            frequency=DATA_FREQUENCY,
+            panel_path=RETURNS_PANEL_DIR
         )
         print(f"✅ Collected data for {len(returns.columns)} assets over {len(returns)} periods")
+        # Results of unchanged inputs are reused across runs until the price store is next written to
+        cache = ResultCache(directory=RESULT_CACHE_DIR, max_disk_bytes=RESULT_CACHE_MAX_BYTES, store=store)
         
         # Step 2: Portfolio Optimization
         print("⚡ Running portfolio optimization...")
         expected_returns = pd.Series(metrics['annualized_return'])
-        annualized_cov = returns.cov() * 12
+        # One covariance estimate shared by optimization and risk contribution, read from the mapped panel in blocks
+        cov_engine = CovarianceEstimator.from_panel(ReturnsPanel.open(RETURNS_PANEL_DIR), method=COVARIANCE_METHOD,
+                                                    decay=EWMA_DECAY, periods_per_year=periods_per_year(returns))
+        annualized_cov = cov_engine.covariance()
         
-        optimal_portfolio = optimize_portfolio(
+        optimal_portfolio = cache.call(
+            optimize_portfolio,
             expected_returns=expected_returns,
             cov_matrix=annualized_cov,
             esg_scores=ESG_SCORES,
@@ -55,22 +78,62 @@ def main():
             max_asset=MAX_ASSET_WEIGHT,
             min_esg=MIN_ESG_SCORE,
             risk_free_rate=RISK_FREE_RATE,
-            transaction_costs=TRANSACTION_COSTS
+            transaction_costs=TRANSACTION_COSTS,
+            gradients='analytic'
         )
         print(f"✅ Optimal portfolio Sharpe ratio: {optimal_portfolio['sharpe_ratio']:.3f}")
         
+        # Out-of-sample check: re-estimate on a rolling window and rebalance with costs
+        print("🔁 Running walk-forward backtest...")
+        backtest = walk_forward_backtest(
+            returns,
+            window=ROLLING_WINDOW * periods_per_year(returns) // 12,
+            rebalance=REBALANCING_FREQUENCY,
+            transaction_costs=TRANSACTION_COSTS,
+            esg_scores=ESG_SCORES,
+            min_alt=MIN_ALTERNATIVES,
+            max_single=MAX_SINGLE_ASSET,
+            max_asset=MAX_ASSET_WEIGHT,
+            min_esg=MIN_ESG_SCORE,
+            risk_free_rate=RISK_FREE_RATE,
+            gradients='analytic'
+        )
+        net_returns = backtest['net_returns']
+        oos_return = (1 + net_returns).prod() ** (periods_per_year(returns) / max(len(net_returns), 1)) - 1
+        print(f"✅ Out-of-sample net return: {oos_return:.2%} p.a. over {len(backtest['weights'])} rebalances "
+              f"(avg turnover {backtest['turnover'].mean():.1%})")
+        
         # Step 3: Risk Analytics
         print("🛡️ Running risk analytics...")
         portfolio_returns = returns.dot(pd.Series(optimal_portfolio['weights']))
         
         # VaR calculation
-        var_results = calculate_var(portfolio_returns, VAR_CONFIDENCE_LEVELS)
+        var_results = cache.call(calculate_var, portfolio_returns, VAR_CONFIDENCE_LEVELS)
         print(f"✅ 95% VaR: {var_results['VaR_95']:.3f}")
         
+        # Model-based VaR/ES from the same covariance estimate
+        ppy = periods_per_year(returns)
+        model_var = {
+            'Gaussian': parametric_var(optimal_portfolio['weights'], cov_engine, VAR_CONFIDENCE_LEVELS,
+                                       periods_per_year=ppy),
+            'Cornish_Fisher': parametric_var(optimal_portfolio['weights'], cov_engine, VAR_CONFIDENCE_LEVELS,
+                                             periods_per_year=ppy, method='cornish_fisher', returns=returns),
+            'Monte_Carlo': monte_carlo_var(optimal_portfolio['weights'], cov_engine, VAR_CONFIDENCE_LEVELS,
+                                           periods_per_year=ppy, n_scenarios=MC_VAR_SCENARIOS, seed=MC_VAR_SEED)
+        }
+        print(f"✅ 95% VaR (Monte Carlo): {model_var['Monte_Carlo']['VaR_95']:.3f}, "
+              f"ES: {model_var['Monte_Carlo']['ES_95']:.3f}")
+        
         # Stress testing
-        stress_results = stress_test_portfolio(returns, STRESS_SCENARIOS)
+        stress_results = cache.call(stress_test_portfolio, returns, STRESS_SCENARIOS,
+                                    weights=optimal_portfolio['weights'])
         print(f"✅ Stress testing completed for {len(stress_results)} scenarios")
         
+        # Correlation regime: streaming DCC estimate, flagging periods where diversification breaks down
+        correlation_regime = CorrelationMonitor(returns.columns).update_many(returns)
+        print(f"✅ Average correlation {correlation_regime['avg_corr'].iloc[-1]:.2f} "
+              f"({int(correlation_regime['alert'].sum())} spike alerts)")
+        
         # Step 4: Performance Attribution
         print("📈 Running performance attribution...")
         attribution = performance_attribution(
@@ -83,13 +146,22 @@ def main():
         print("📊 Generating visualizations...")
         os.makedirs(CHARTS_DIR, exist_ok=True)
         
-        # Efficient frontier (simplified)
-        vol_range = np.linspace(0.05, 0.25, 50)
-        ret_range = [optimal_portfolio['expected_return']] * 50
+        # Efficient frontier under the same constraints as the optimal portfolio
+        frontier = efficient_frontier(
+            expected_returns=expected_returns,
+            cov_matrix=annualized_cov,
+            esg_scores=ESG_SCORES,
+            min_alt=MIN_ALTERNATIVES,
+            max_single=MAX_SINGLE_ASSET,
+            max_asset=MAX_ASSET_WEIGHT,
+            min_esg=MIN_ESG_SCORE,
+            n_points=50
+        )
+        solved = frontier['success']
         plot_efficient_frontier(
-            weights_list=[optimal_portfolio['weights']],
-            returns_list=ret_range,
-            vol_list=vol_range,
+            weights_list=frontier['weights'][solved],
+            returns_list=frontier['returns'][solved],
+            vol_list=frontier['vols'][solved],
             optimal_point=(optimal_portfolio['volatility'], optimal_portfolio['expected_return']),
             save_path=f"{CHARTS_DIR}efficient_frontier.png"
         )
@@ -129,12 +201,14 @@ def main():
                 'Volatility': optimal_portfolio['volatility'],
                 'ESG_Score': optimal_portfolio['avg_esg'],
                 'VaR_95': var_results['VaR_95'],
-                'VaR_99': var_results['VaR_99']
+                'VaR_99': var_results['VaR_99'],
+                'OOS_Net_Return': oos_return
             },
             'Asset_Allocation': pd.DataFrame(list(optimal_portfolio['weights'].items()), 
                                            columns=['Asset', 'Weight']),
-            'Risk_Metrics': pd.DataFrame([var_results]),
+            'Risk_Metrics': pd.DataFrame({'Historical': var_results, **model_var}).T,
             'Stress_Test_Results': pd.DataFrame(stress_results).T,
+            'Correlation_Regime': correlation_regime,
             'Performance_Attribution': pd.DataFrame(list(attribution['by_asset'].items()),
                                                   columns=['Asset', 'Contribution'])
         }
@@ -148,12 +222,17 @@ def main():
         print(f"📁 Results saved to: {OUTPUT_DIR}")
         print(f"📊 Charts saved to: {CHARTS_DIR}")
         print(f"📋 Excel dashboard: {OUTPUT_DIR}{EXCEL_FILENAME}")
+        stats = cache.stats()
+        print(f"🗄️ Result cache: {stats['hits']} hits, {stats['misses']} misses")
         
         return {
             'optimal_portfolio': optimal_portfolio,
             'risk_metrics': var_results,
+            'model_var': model_var,
             'stress_results': stress_results,
-            'attribution': attribution
+            'correlation_regime': correlation_regime,
+            'attribution': attribution,
+            'backtest': backtest
         }
         
     except Exception as e:
@@ -0,0 +1,298 @@
+import datetime
+import functools
+import hashlib
+import os
+import pickle
+import threading
+import types
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def content_hash(*args, **kwargs):
+    """
+    Stable digest of arrays, pandas objects, containers and scalars, keyed on their contents.
+    Args:
+        *args, **kwargs: Values to hash (keyword order does not matter)
+    Returns:
+        str: Hex digest
+    """
+    h = hashlib.blake2b(digest_size=20)
+    _feed(h, args)
+    _feed(h, dict(kwargs))
+    return h.hexdigest()
+
+
+def _feed(h, obj):
+    if obj is None or isinstance(obj, (bool, int, float, str, bytes, complex)):
+        h.update(f'{type(obj).__name__}:{obj!r};'.encode())
+    elif isinstance(obj, (datetime.date, datetime.time, datetime.timedelta)):
+        h.update(f'{type(obj).__name__}:{obj.isoformat() if hasattr(obj, "isoformat") else obj!r};'.encode())
+    elif isinstance(obj, np.generic):
+        _feed(h, obj.item())
+    elif isinstance(obj, pd.DataFrame):
+        h.update(b'frame;')
+        _feed(h, [str(t) for t in obj.dtypes])
+        _feed(h, list(obj.columns))
+        h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+    elif isinstance(obj, pd.Series):
+        h.update(b'series;')
+        _feed(h, (obj.name, str(obj.dtype)))
+        h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+    elif isinstance(obj, pd.Index):
+        h.update(b'index;')
+        h.update(pd.util.hash_pandas_object(obj).values.tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(f'array:{obj.dtype.str}:{obj.shape};'.encode())
+        if obj.dtype.hasobject:
+            _feed(h, obj.tolist())
+        else:
+            h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        h.update(f'dict:{len(obj)};'.encode())
+        for key in sorted(obj, key=repr):
+            _feed(h, key)
+            _feed(h, obj[key])
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        h.update(f'{type(obj).__name__}:{len(obj)};'.encode())
+        for item in (sorted(obj, key=repr) if isinstance(obj, (set, frozenset)) else obj):
+            _feed(h, item)
+    elif callable(obj) and hasattr(obj, '__qualname__'):
+        # Functions hash by name, code (bytecode, constants and referenced names), defaults and closure
+        # contents, so an edited function, even one with only a changed constant, misses old disk entries
+        h.update(f'callable:{getattr(obj, "__module__", "")}.{obj.__qualname__};'.encode())
+        code = getattr(obj, '__code__', None)
+        if code is not None:
+            _feed_code(h, code)
+            _feed(h, getattr(obj, '__defaults__', None))
+            _feed(h, getattr(obj, '__kwdefaults__', None))
+            closure = getattr(obj, '__closure__', None) or ()
+            _feed(h, [_cell_contents(cell) for cell in closure])
+    elif hasattr(obj, '__dict__'):
+        # Plain value objects (e.g. FactorCovariance) hash by type and attributes
+        h.update(f'object:{type(obj).__module__}.{type(obj).__qualname__};'.encode())
+        _feed(h, vars(obj))
+    else:
+        raise TypeError(f"Cannot hash {type(obj).__name__} for the result cache")
+
+
+def _feed_code(h, code):
+    h.update(b'code;')
+    h.update(code.co_code)
+    _feed(h, code.co_names)
+    h.update(f'consts:{len(code.co_consts)};'.encode())
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _feed_code(h, const)  # nested functions, lambdas and comprehensions
+        else:
+            _feed(h, const)
+
+
+def _cell_contents(cell):
+    try:
+        return cell.cell_contents
+    except ValueError:
+        return None  # cell not assigned yet
+
+
+class ResultCache:
+    """
+    Content-addressed cache of function results with an in-process LRU tier and an optional on-disk tier.
+
+    Keys are a hash of the function and its arguments, so identical inputs hit regardless of which
+    DataFrame object carries them. Values are stored pickled: every hit returns a fresh copy that the
+    caller may modify. When a price store is attached, both tiers are dropped as soon as its revision
+    changes; disk files are tagged with the revision they were computed at, and files left behind by
+    an older revision are deleted when a cache is opened on the directory. All methods are thread-safe; the cached function itself runs outside the lock, so two
+    threads missing on the same key at once both compute it.
+    """
+
+    SUFFIX = '.pkl'
+
+    def __init__(self, max_entries=256, directory=None, max_disk_bytes=256 * 2**20, store=None):
+        """
+        Args:
+            max_entries (int): Results kept in memory (least recently used evicted first)
+            directory (str): Directory of the disk tier (created if missing); None keeps results in memory only
+            max_disk_bytes (int): Size budget of the disk tier; oldest-used files are deleted beyond it
+            store (PriceStore): Optional store whose revision invalidates the cache
+        """
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.store = store
+        self._lock = threading.RLock()
+        self._memory = OrderedDict()
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        self._revision = store.revision if store is not None else None
+        self._stats = dict.fromkeys(['hits', 'memory_hits', 'disk_hits', 'misses', 'evictions', 'disk_evictions',
+                                     'invalidations'], 0)
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._scan_disk()
+
+    def key(self, func, *args, **kwargs):
+        """Cache key of a call (includes the store revision, if any)."""
+        return content_hash(func, self._revision, *args, **kwargs)
+
+    def call(self, func, *args, **kwargs):
+        """
+        Return func(*args, **kwargs), computing it only if the same call is not cached.
+        Args:
+            func (callable): Deterministic function of its arguments
+            *args, **kwargs: Passed to func and hashed into the key
+        Returns:
+            Result of func (a private copy on every hit)
+        """
+        with self._lock:
+            self._check_revision()
+            key = self.key(func, *args, **kwargs)
+            found, value = self._lookup(key)
+            if found:
+                return value
+            self._stats['misses'] += 1
+        value = func(*args, **kwargs)
+        self.put(key, value)
+        return value
+
+    def wrap(self, func):
+        """Decorator form of call()."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.call(func, *args, **kwargs)
+        wrapper.cache = self
+        return wrapper
+
+    def get(self, key, default=None):
+        """Cached value for a key (see key()), or default."""
+        with self._lock:
+            self._check_revision()
+            found, value = self._lookup(key)
+            if not found:
+                self._stats['misses'] += 1
+            return value if found else default
+
+    def put(self, key, value):
+        """Store a value under a key in both tiers."""
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._remember(key, blob)
+            if self.directory is not None:
+                self._write_disk(key, blob)
+
+    def clear(self, disk=True):
+        """Drop the memory tier and, if disk=True, delete the disk tier's files."""
+        with self._lock:
+            self._memory.clear()
+            if disk and self.directory is not None:
+                for key in list(self._disk):
+                    self._delete_disk(key)
+
+    def stats(self):
+        """
+        Hit/miss counters and tier sizes.
+        Returns:
+            dict: hits, memory_hits, disk_hits, misses, hit_rate, evictions, disk_evictions,
+                  invalidations, entries, disk_entries, disk_bytes
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats['hits'] + stats['misses']
+            stats.update(hit_rate=stats['hits'] / lookups if lookups else 0.0, entries=len(self._memory),
+                         disk_entries=len(self._disk), disk_bytes=self._disk_bytes)
+            return stats
+
+    def _check_revision(self):
+        if self.store is None or self.store.revision == self._revision:
+            return
+        self._stats['invalidations'] += 1
+        self.clear()
+        self._revision = self.store.revision
+
+    def _lookup(self, key):
+        blob = self._memory.get(key)
+        if blob is not None:
+            self._memory.move_to_end(key)
+            self._stats['memory_hits'] += 1
+        elif key in self._disk:
+            blob = self._read_disk(key)
+            if blob is not None:
+                self._remember(key, blob)
+                self._stats['disk_hits'] += 1
+        if blob is None:
+            return False, None
+        self._stats['hits'] += 1
+        return True, pickle.loads(blob)
+
+    def _remember(self, key, blob):
+        self._memory[key] = blob
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self._tag() + self.SUFFIX)
+
+    def _tag(self):
+        return '' if self.store is None else f'.r{self._revision}'
+
+    def _scan_disk(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            key, _, tag = name[:-len(self.SUFFIX)].partition('.')
+            if ('.' + tag if tag else '') != self._tag():
+                if self.store is not None:
+                    # Written at another store revision (or before files were tagged): can never be hit again
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, key, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+
+    def _read_disk(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                blob = f.read()
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            # Removed by another process sharing the directory
+            self._disk_bytes -= self._disk.pop(key)
+            return None
+        self._disk.move_to_end(key)
+        return blob
+
+    def _write_disk(self, key, blob):
+        if key in self._disk:
+            self._disk_bytes -= self._disk.pop(key)
+        tmp = self._path(key) + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(blob)
+        os.replace(tmp, self._path(key))
+        self._disk[key] = len(blob)
+        self._disk_bytes += len(blob)
+        self._evict_disk()
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            self._delete_disk(next(iter(self._disk)))
+            self._stats['disk_evictions'] += 1
+
+    def _delete_disk(self, key):
+        self._disk_bytes -= self._disk.pop(key)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
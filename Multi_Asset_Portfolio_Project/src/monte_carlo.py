@@ -0,0 +1,126 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.signal import lfilter
+
+# Annual assumptions for the simulated alternatives (smoothing = appraisal AR(1) coefficient)
+ALTERNATIVE_ASSUMPTIONS = {
+    'Hedge_Fund': {'mean': 0.10, 'vol': 0.15, 'smoothing': 0.0},
+    'Private_Equity': {'mean': 0.12, 'vol': 0.18, 'smoothing': 0.5},
+}
+
+
+def simulate_paths(n_paths, n_periods, means, vols, corr=None, dist='normal', df=5, smoothing=None, rng=None):
+    """
+    Simulate K x T x M correlated return paths in one vectorized draw.
+    Args:
+        n_paths (int): Number of paths K
+        n_periods (int): Periods per path T
+        means (array-like): Per-period mean return for each of the M assets
+        vols (array-like): Per-period volatility for each asset
+        corr (array-like): M x M correlation matrix (identity if None)
+        dist (str): 'normal' or 't' (Student-t scaled to unit variance, for fat tails)
+        df (float): Degrees of freedom for dist='t' (must be > 2)
+        smoothing (array-like): Appraisal smoothing coefficient per asset in [0, 1); reported returns follow
+            r_obs[t] = (1 - a) * r[t] + a * r_obs[t-1] (Geltner), which lags and dampens the true returns
+        rng (np.random.Generator): Random generator (fresh default_rng() if None)
+    Returns:
+        np.ndarray: Returns of shape (n_paths, n_periods, M)
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    means = np.asarray(means, dtype=float)
+    vols = np.asarray(vols, dtype=float)
+    m = len(means)
+    if dist == 'normal':
+        z = rng.standard_normal((n_paths, n_periods, m))
+    elif dist == 't':
+        if df <= 2:
+            raise ValueError("Student-t degrees of freedom must be > 2 for a finite variance")
+        z = rng.standard_t(df, (n_paths, n_periods, m)) * np.sqrt((df - 2) / df)
+    else:
+        raise ValueError(f"Unknown distribution '{dist}', expected 'normal' or 't'")
+    if corr is not None:
+        z = z @ np.linalg.cholesky(np.asarray(corr, dtype=float)).T
+    paths = means + vols * z
+    if smoothing is not None:
+        for j, a in enumerate(np.broadcast_to(np.asarray(smoothing, dtype=float), (m,))):
+            if a > 0:
+                paths[:, :, j] = lfilter([1 - a], [1, -a], paths[:, :, j], axis=1)
+    return paths
+
+
+def simulate_alternative_paths(n_paths, n_periods, periods_per_year=12, corr=None, dist='normal', df=5,
+                               smoothing=True, rng=None):
+    """
+    Simulate Hedge_Fund / Private_Equity paths from ALTERNATIVE_ASSUMPTIONS.
+    Args:
+        smoothing (bool): Apply the PE appraisal smoothing from ALTERNATIVE_ASSUMPTIONS
+        Other args as in simulate_paths
+    Returns:
+        np.ndarray: Returns of shape (n_paths, n_periods, 2), assets in ALTERNATIVE_ASSUMPTIONS order
+    """
+    spec = list(ALTERNATIVE_ASSUMPTIONS.values())
+    means = [s['mean'] / periods_per_year for s in spec]
+    vols = [s['vol'] / np.sqrt(periods_per_year) for s in spec]
+    alphas = [s['smoothing'] for s in spec] if smoothing else None
+    return simulate_paths(n_paths, n_periods, means, vols, corr=corr, dist=dist, df=df, smoothing=alphas, rng=rng)
+
+
+def map_chunks(func, n_items, chunk_size, seed=None, n_jobs=1, args=(), reduce=None, initial=None):
+    """
+    Split n_items into fixed-size chunks, run func on each with its own random stream, and fold the results.
+    Chunk i always gets the i-th child of SeedSequence(seed), so the output does not depend on n_jobs.
+    Only one chunk per worker is alive at a time, which keeps memory bounded for very large studies.
+    Args:
+        func (callable): Top-level (picklable) function func(rng, size, *args) returning a small result
+        n_items (int): Total number of items (paths, scenarios, ...)
+        chunk_size (int): Items per chunk
+        seed (int): Seed for the SeedSequence (non-reproducible if None)
+        n_jobs (int): Worker processes (1 runs in-process, None uses all cores)
+        args (tuple): Extra arguments passed to func
+        reduce (callable): reduce(acc, result) folding results in chunk order; if None a list is returned
+        initial: Starting accumulator for reduce
+    Returns:
+        Folded result, or list of per-chunk results
+    """
+    n_chunks = -(-n_items // chunk_size)
+    seqs = np.random.SeedSequence(seed).spawn(n_chunks)
+    sizes = [min(chunk_size, n_items - i * chunk_size) for i in range(n_chunks)]
+    tasks = [(func, seq, size, args) for seq, size in zip(seqs, sizes)]
+    n_jobs = os.cpu_count() if n_jobs is None else n_jobs
+
+    acc = [] if reduce is None else initial
+    if n_jobs == 1 or n_chunks == 1:
+        results = map(_run_chunk, tasks)
+        for result in results:
+            acc = _fold(acc, result, reduce)
+        return acc
+    with ProcessPoolExecutor(max_workers=min(n_jobs, n_chunks)) as pool:
+        for result in pool.map(_run_chunk, tasks):
+            acc = _fold(acc, result, reduce)
+    return acc
+
+
+def iter_path_chunks(n_paths, n_periods, means, vols, chunk_size=10000, seed=None, **kwargs):
+    """
+    Generate paths chunk by chunk (same streams as map_chunks), for in-process consumers.
+    Yields:
+        np.ndarray: Chunk of shape (<= chunk_size, n_periods, M)
+    """
+    n_chunks = -(-n_paths // chunk_size)
+    for i, seq in enumerate(np.random.SeedSequence(seed).spawn(n_chunks)):
+        size = min(chunk_size, n_paths - i * chunk_size)
+        yield simulate_paths(size, n_periods, means, vols, rng=np.random.default_rng(seq), **kwargs)
+
+
+def _run_chunk(task):
+    func, seq, size, args = task
+    return func(np.random.default_rng(seq), size, *args)
+
+
+def _fold(acc, result, reduce):
+    if reduce is None:
+        acc.append(result)
+        return acc
+    return reduce(acc, result)
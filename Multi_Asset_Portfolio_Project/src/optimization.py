@@ -1,6 +1,15 @@
+import copy
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
-from scipy.optimize import minimize
+import scipy.sparse as sp
+from scipy.optimize import linprog, minimize
+
+from covariance import FactorCovariance
+from qp_solver import QPSolver
 
 # Example ESG scores for all assets (simulate for alternatives)
 ESG_SCORES = {
@@ -29,104 +38,777 @@ def optimize_portfolio(
     min_esg=7.0,
     risk_free_rate=0.02,
     transaction_costs=TRANSACTION_COSTS,
-    prev_weights=None
+    prev_weights=None,
+    gradients='numeric',
+    solver='slsqp',
+    objective='max_sharpe',
+    n_starts=None,
+    seed=None,
+    n_jobs=1
 ):
     """
     Mean-variance optimization with institutional constraints and ESG scoring.
     Args:
         expected_returns (pd.Series): Annualized expected returns
-        cov_matrix (pd.DataFrame): Annualized covariance matrix
+        cov_matrix (pd.DataFrame or FactorCovariance): Annualized covariance matrix; a factor model keeps
+            every objective/gradient evaluation at O(NK) and solver='qp' then works on a sparse lifted
+            problem, which is the way to optimize universes of thousands of assets
         esg_scores (dict): ESG scores for each asset
         min_alt (float): Minimum allocation to alternatives (Hedge_Fund + Private_Equity)
         max_single (float): Max concentration in any single asset class
         max_asset (float): Max allocation to any asset
         min_esg (float): Minimum average ESG score
         risk_free_rate (float): Risk-free rate for Sharpe ratio
-        transaction_costs (float): Per-trade cost
-        prev_weights (np.array): Previous weights for transaction cost modeling
+        transaction_costs (float, dict or pd.Series): Per-trade cost, optionally per asset
+        prev_weights (np.array): Previous weights for transaction cost modeling; the problem is then solved
+            as a smooth rebalancing from these holdings (see rebalance_portfolio), a single SLSQP solve
+            started at the holdings, so n_starts, seed and n_jobs must be left unset
+        gradients (str): 'numeric' lets SLSQP finite-difference every function; 'analytic' supplies the
+            closed-form Sharpe gradient and expresses all constraints as linear matrices with constant
+            Jacobians (the concentration limit becomes part of the bounds). With prev_weights the same
+            choice applies to the trade objective
+        solver (str): 'slsqp' runs SLSQP from several starting points; 'qp' solves the equivalent convex
+            QP once with the ADMM solver in qp_solver (deterministic and globally optimal, no prev_weights)
+        objective (str): 'max_sharpe' or 'min_variance'
+        n_starts (int): SLSQP starting points, equal weight plus n_starts - 1 seeded Dirichlet draws (default 3)
+        seed (int): Seed for the starting points (default 42); the best start is chosen deterministically
+            (ties go to the lowest start index), so results do not depend on n_jobs
+        n_jobs (int): Worker processes for the starts (1 runs them in-process)
     Returns:
-        dict: Optimal weights, Sharpe ratio, expected return, volatility, ESG score
+        dict: Optimal weights, Sharpe ratio, expected return, volatility, ESG score, 'success' (False when
+              no solve succeeded and the equal-weight fallback is returned) and solver diagnostics
+              (for SLSQP also 'best_start' and per-start 'starts': iterations, status, time, score, error)
     """
+    if gradients not in ('numeric', 'analytic'):
+        raise ValueError(f"Unknown gradients mode '{gradients}', expected 'numeric' or 'analytic'")
+    if solver not in ('slsqp', 'qp'):
+        raise ValueError(f"Unknown solver '{solver}', expected 'slsqp' or 'qp'")
+    if objective not in ('max_sharpe', 'min_variance'):
+        raise ValueError(f"Unknown objective '{objective}', expected 'max_sharpe' or 'min_variance'")
+    if prev_weights is not None and (solver == 'qp' or objective == 'min_variance'):
+        raise ValueError("prev_weights (transaction costs) is only supported by solver='slsqp' with max_sharpe")
+    if prev_weights is not None and (n_starts is not None or seed is not None or n_jobs != 1):
+        raise ValueError("prev_weights rebalances with one solve started at the holdings; "
+                         "n_starts, seed and n_jobs do not apply")
+    n_starts = 3 if n_starts is None else n_starts
+    seed = 42 if seed is None else seed
     n = len(expected_returns)
-    bounds = [(0, max_asset)] * n
     tickers = expected_returns.index.tolist()
-    alt_idx = [i for i, t in enumerate(tickers) if t in ['Hedge_Fund', 'Private_Equity']]
-    esg_arr = np.array([esg_scores.get(t, 7.0) for t in tickers])
+    problem = _PortfolioProblem(expected_returns, cov_matrix, tickers, esg_scores, min_alt, max_single,
+                                max_asset, min_esg, risk_free_rate, transaction_costs, prev_weights)
 
-    def portfolio_stats(weights):
-        port_return = np.dot(weights, expected_returns)
-        port_vol = np.sqrt(np.dot(weights, np.dot(cov_matrix, weights)))
-        sharpe = (port_return - risk_free_rate) / port_vol if port_vol > 0 else 0
-        return port_return, port_vol, sharpe
+    if solver == 'qp':
+        return _solve_qp(problem, tickers, objective)
+    if prev_weights is not None:
+        return _rebalance(problem, tickers, gradients=gradients)
 
-    def objective(weights):
-        # Negative Sharpe (since we minimize)
-        port_return, port_vol, sharpe = portfolio_stats(weights)
-        tc = 0
-        if prev_weights is not None:
-            tc = transaction_costs * np.sum(np.abs(weights - prev_weights))
-        return -sharpe + tc
-
-    constraints = [
-        {'type': 'eq', 'fun': lambda w: np.sum(w) - 1},  # Fully invested
-    ]
-    
-    # Add alternatives constraint if alternatives exist
-    if alt_idx:
-        constraints.append({'type': 'ineq', 'fun': lambda w: np.sum(w[alt_idx]) - min_alt})
-    
-    # Add ESG constraint
-    constraints.append({'type': 'ineq', 'fun': lambda w: np.dot(w, esg_arr) / np.sum(w) - min_esg})
-    
-    # Add max single asset constraint
-    constraints.append({'type': 'ineq', 'fun': lambda w: max_single - np.max(w)})
-
-    # Try different starting points
-    starting_points = [
-        np.ones(n) / n,  # Equal weight
-        np.random.dirichlet(np.ones(n)),  # Random weights
-        np.array([0.3, 0.3, 0.2, 0.2])[:n] if n >= 4 else np.ones(n) / n  # Custom weights
-    ]
-    
-    best_result = None
-    best_sharpe = -np.inf
-    
-    for x0 in starting_points:
-        try:
-            result = minimize(objective, x0, bounds=bounds, constraints=constraints, 
-                            method='SLSQP', options={'maxiter': 1000})
-            if result.success:
-                port_return, port_vol, sharpe = portfolio_stats(result.x)
-                if sharpe > best_sharpe:
-                    best_sharpe = sharpe
-                    best_result = result
-        except:
-            continue
-    
-    if best_result is None:
+    # Starting points: equal weight plus Dirichlet draws, each from its own seeded stream so the
+    # set of starts (and therefore the answer) does not depend on global NumPy state or n_jobs
+    streams = np.random.SeedSequence(seed).spawn(max(n_starts - 1, 0))
+    starting_points = [np.ones(n) / n] + [np.random.default_rng(seq).dirichlet(np.ones(n)) for seq in streams]
+    tasks = [(problem, x0, objective, gradients, max_asset) for x0 in starting_points[:max(n_starts, 1)]]
+    if n_jobs == 1 or len(tasks) == 1:
+        runs = [_run_start(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks))) as pool:
+            runs = list(pool.map(_run_start, tasks))
+
+    # Best successful start; ties go to the lowest start index
+    best = None
+    for i, run in enumerate(runs):
+        run['start'] = i
+        if run['success'] and (best is None or run['score'] > best['score']):
+            best = run
+    starts = [{k: v for k, v in run.items() if k != 'x'} for run in runs]
+
+    if best is None:
         # Fallback: equal weight portfolio
         weights = np.ones(n) / n
-        port_return, port_vol, sharpe = portfolio_stats(weights)
-        avg_esg = np.dot(weights, esg_arr)
+        port_return, port_vol, sharpe = problem.stats(weights)
+        avg_esg = np.dot(weights, problem.esg)
         return {
             'weights': dict(zip(tickers, weights)),
             'sharpe_ratio': sharpe,
             'expected_return': port_return,
             'volatility': port_vol,
-            'avg_esg': avg_esg
+            'avg_esg': avg_esg,
+            'success': False,
+            'diagnostics': None
         }
     
-    opt_weights = best_result.x
-    port_return, port_vol, sharpe = portfolio_stats(opt_weights)
-    avg_esg = np.dot(opt_weights, esg_arr)
+    opt_weights = best['x']
+    port_return, port_vol, sharpe = problem.stats(opt_weights)
+    avg_esg = np.dot(opt_weights, problem.esg)
     return {
         'weights': dict(zip(tickers, opt_weights)),
         'sharpe_ratio': sharpe,
         'expected_return': port_return,
         'volatility': port_vol,
-        'avg_esg': avg_esg
+        'avg_esg': avg_esg,
+        'success': True,
+        'diagnostics': {
+            'solver': 'slsqp',
+            'nit': best['nit'],
+            'nfev': best['nfev'],
+            'njev': best['njev'],
+            'status': best['status'],
+            'message': best['message'],
+            'time': best['time'],
+            'best_start': best['start'],
+            'starts': starts
+        }
+    }
+
+
+def _run_start(task):
+    """
+    One SLSQP run from one starting point (top-level so it can run in a worker process).
+    Solver errors are recorded in the returned diagnostics instead of being raised.
+    """
+    problem, x0, objective, gradients, max_asset = task
+    if objective == 'min_variance':
+        fun, jac = problem.variance, problem.variance_gradient
+    else:
+        fun, jac = problem.objective, problem.gradient
+    if gradients == 'analytic':
+        bounds = problem.bounds
+        constraints = problem.linear_constraints()
+    else:
+        jac = None
+        bounds = [(0, max_asset)] * len(x0)
+        constraints = problem.legacy_constraints()
+
+    run = {'success': False, 'score': -np.inf, 'x': None, 'nit': 0, 'nfev': 0, 'njev': 0, 'status': None,
+           'message': None, 'time': 0.0, 'error': None}
+    t0 = time.perf_counter()
+    try:
+        result = minimize(fun, x0, jac=jac, bounds=bounds, constraints=constraints,
+                          method='SLSQP', options={'maxiter': 1000})
+    except (ValueError, ArithmeticError, np.linalg.LinAlgError) as e:
+        run['error'] = f"{type(e).__name__}: {e}"
+        run['time'] = time.perf_counter() - t0
+        return run
+    run['time'] = time.perf_counter() - t0
+    run.update(success=bool(result.success), x=result.x, nit=result.nit, nfev=result.nfev, njev=result.njev,
+               status=result.status, message=result.message)
+    if result.success:
+        port_return, port_vol, sharpe = problem.stats(result.x)
+        run['score'] = sharpe if objective == 'max_sharpe' else -port_vol
+    return run
+
+
+def rebalance_portfolio(
+    expected_returns,
+    cov_matrix,
+    prev_weights,
+    esg_scores=ESG_SCORES,
+    min_alt=0.2,
+    max_single=0.3,
+    max_asset=0.4,
+    min_esg=7.0,
+    risk_free_rate=0.02,
+    transaction_costs=TRANSACTION_COSTS,
+    no_trade_band=0.0
+):
+    """
+    Turnover-aware rebalancing from current holdings.
+    Trades are split into buys and sells (w = prev + buys - sells, both >= 0), so the proportional
+    costs are linear and the problem stays smooth; SLSQP starts at the current holdings with analytic
+    gradients. Trades smaller than the no-trade band are frozen at the holding and the rest re-solved,
+    as long as the constraints can still be met without trading the frozen assets.
+    Args:
+        expected_returns (pd.Series): Annualized expected returns
+        cov_matrix (pd.DataFrame): Annualized covariance matrix
+        prev_weights (array-like, dict or pd.Series): Current holdings
+        esg_scores, min_alt, max_single, max_asset, min_esg, risk_free_rate: As in optimize_portfolio
+        transaction_costs (float, dict or pd.Series): Proportional cost, optionally per asset
+        no_trade_band (float, dict or pd.Series): Minimum absolute weight change worth trading, optionally per asset
+    Returns:
+        dict: As optimize_portfolio, plus 'trades' (weight change per asset), 'turnover' and 'transaction_cost'
+    """
+    tickers = expected_returns.index.tolist()
+    problem = _PortfolioProblem(expected_returns, cov_matrix, tickers, esg_scores, min_alt, max_single,
+                                max_asset, min_esg, risk_free_rate, transaction_costs,
+                                _align(prev_weights, tickers))
+    return _rebalance(problem, tickers, _align(no_trade_band, tickers))
+
+
+def rebalance_accounts(
+    expected_returns,
+    cov_matrix,
+    holdings,
+    esg_scores=ESG_SCORES,
+    min_alt=0.2,
+    max_single=0.3,
+    max_asset=0.4,
+    min_esg=7.0,
+    risk_free_rate=0.02,
+    transaction_costs=TRANSACTION_COSTS,
+    no_trade_band=0.0,
+    n_jobs=1
+):
+    """
+    Rebalance many accounts against the same model (shared return, covariance and constraint arrays).
+    Args:
+        holdings (pd.DataFrame): Current weights, one row per account, one column per asset
+        n_jobs (int): Worker processes (1 runs in-process)
+        Other args as in rebalance_portfolio
+    Returns:
+        dict: {'weights': pd.DataFrame of new weights per account, 'summary': pd.DataFrame per account
+               (sharpe_ratio, expected_return, volatility, turnover, transaction_cost, nit, status, time)}
+    """
+    tickers = expected_returns.index.tolist()
+    base = _PortfolioProblem(expected_returns, cov_matrix, tickers, esg_scores, min_alt, max_single,
+                             max_asset, min_esg, risk_free_rate, transaction_costs, None)
+    band = _align(no_trade_band, tickers)
+    tasks = []
+    for prev in holdings.reindex(columns=tickers).fillna(0.0).values:
+        problem = copy.copy(base)
+        problem.prev = prev
+        tasks.append((problem, tickers, band))
+    if n_jobs == 1 or len(tasks) <= 1:
+        results = [_rebalance_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks))) as pool:
+            results = list(pool.map(_rebalance_task, tasks, chunksize=max(1, len(tasks) // (4 * n_jobs))))
+
+    weights = pd.DataFrame([r['weights'] for r in results], index=holdings.index, columns=tickers)
+    summary = pd.DataFrame([{
+        'sharpe_ratio': r['sharpe_ratio'],
+        'expected_return': r['expected_return'],
+        'volatility': r['volatility'],
+        'turnover': r['turnover'],
+        'transaction_cost': r['transaction_cost'],
+        'nit': r['diagnostics']['nit'],
+        'status': r['diagnostics']['status'],
+        'time': r['diagnostics']['time']
+    } for r in results], index=holdings.index)
+    return {'weights': weights, 'summary': summary}
+
+
+def _rebalance_task(task):
+    problem, tickers, band = task
+    return _rebalance(problem, tickers, band)
+
+
+def _rebalance(problem, tickers, no_trade_band=0.0, max_rounds=5, gradients='analytic'):
+    """Smooth buy/sell rebalancing from problem.prev, re-solving with small trades frozen."""
+    n = len(tickers)
+    band = np.broadcast_to(np.asarray(no_trade_band, dtype=float), (n,))
+    constraints = problem.trade_constraints()
+    # The Sharpe ratio's curvature grows like 1/variance; scaling the objective by the holdings' variance
+    # matches SLSQP's identity initial Hessian (ftol is scaled too, so the accuracy is unchanged)
+    scale = problem.variance(problem.prev)
+    scale = scale if scale > 0 else 1.0
+    fun = lambda v: scale * problem.trade_objective(v)
+    jac = (lambda v: scale * problem.trade_gradient(v)) if gradients == 'analytic' else None
+    # Only holdings that are admissible on their own (within [0, cap]) can be left untouched
+    admissible = (problem.prev >= 0) & (problem.prev <= problem.bounds[0][1])
+    frozen = np.zeros(n, dtype=bool)
+    trades = np.zeros(2 * n)
+    solved, nit, nfev, rounds = None, 0, 0, 0
+    t0 = time.perf_counter()
+    for rounds in range(1, max_rounds + 1):
+        x0 = np.where(np.r_[frozen, frozen], 0.0, trades)
+        result = minimize(fun, x0, jac=jac, bounds=problem.trade_bounds(frozen), constraints=constraints,
+                          method='SLSQP', options={'maxiter': 1000, 'ftol': 1e-6 * scale})
+        # SLSQP skips iterating (and omits nit) when every asset is frozen
+        nit += result.get('nit', 0)
+        nfev += result.get('nfev', 0)
+        if not result.success:
+            # Freezing made the problem infeasible or harder: keep the last successful round
+            break
+        # Round-off sized buys/sells are not trades
+        trades = np.where(result.x < 1e-10, 0.0, result.x)
+        solved = (result, trades, frozen.copy())
+        delta = trades[:n] - trades[n:]
+        newly_frozen = ~frozen & admissible & (np.abs(delta) < band) & (np.abs(delta) > 0)
+        if not newly_frozen.any() or not _trades_feasible(problem, frozen | newly_frozen):
+            break
+        frozen = frozen | newly_frozen
+    elapsed = time.perf_counter() - t0
+
+    if solved is not None:
+        result, trades, frozen = solved
+        weights = problem.trade_weights(trades)
+    else:
+        # Fallback: keep the current holdings
+        trades = np.zeros(2 * n)
+        weights = problem.prev.copy()
+    delta = trades[:n] - trades[n:]
+    port_return, port_vol, sharpe = problem.stats(weights)
+    return {
+        'weights': dict(zip(tickers, weights)),
+        'sharpe_ratio': sharpe,
+        'expected_return': port_return,
+        'volatility': port_vol,
+        'avg_esg': np.dot(weights, problem.esg),
+        'trades': dict(zip(tickers, delta)),
+        'turnover': float(np.abs(delta).sum()),
+        'transaction_cost': float(problem.tc @ (trades[:n] + trades[n:])),
+        'success': solved is not None,
+        'diagnostics': {
+            'solver': 'slsqp',
+            'nit': nit,
+            'nfev': nfev,
+            'status': result.get('status') if result is not None else None,
+            'message': result.get('message') if result is not None else None,
+            'time': elapsed,
+            'rounds': rounds,
+            'frozen': [t for t, f in zip(tickers, frozen) if f]
+        }
+    }
+
+
+def _trades_feasible(problem, frozen):
+    """LP check that the constraints can still be met with the frozen assets left untraded."""
+    A_eq, b_eq, A_ineq, b_ineq = problem.trade_matrices()
+    check = linprog(np.zeros(A_eq.shape[1]), A_ub=-A_ineq, b_ub=-b_ineq, A_eq=A_eq, b_eq=b_eq,
+                    bounds=problem.trade_bounds(frozen), method='highs')
+    return check.status == 0
+
+
+def _align(values, tickers):
+    """Scalar, array, dict or Series -> float array in ticker order (dict/Series gaps are 0)."""
+    if isinstance(values, (dict, pd.Series)):
+        return pd.Series(values, dtype=float).reindex(tickers).fillna(0.0).values
+    return np.broadcast_to(np.asarray(values, dtype=float), (len(tickers),)).copy()
+
+
+def _solve_qp(problem, tickers, objective):
+    """Single convex QP solve for optimize_portfolio(solver='qp')."""
+    if objective == 'max_sharpe' and problem.mu.max() <= problem.rf:
+        raise ValueError("No asset beats the risk-free rate; the maximum-Sharpe problem has no solution")
+    P, q, A, l, u = _qp_data(problem, objective)
+    sol = QPSolver(P, A).solve(q, l, u, method=_qp_method(problem))
+    return _qp_result(problem, tickers, objective, sol)
+
+
+def _qp_data(problem, objective):
+    return problem.qp_min_variance() if objective == 'min_variance' else problem.qp_max_sharpe()
+
+
+def _qp_method(problem):
+    # Lifted factor-model QPs are large and sparse: a few interior point steps beat thousands of ADMM iterations
+    return 'interior_point' if isinstance(problem.cov, FactorCovariance) else 'admm'
+
+
+def _qp_result(problem, tickers, objective, sol):
+    """optimize_portfolio-style result from a QP solution (equal weight and success=False if the solve failed)."""
+    n = len(tickers)
+    diagnostics = {
+        'solver': 'qp',
+        'nit': sol['iterations'],
+        'status': sol['status'],
+        'polished': sol['polished'],
+        'time': sol['time']
+    }
+    if sol['status'] != 'solved':
+        # Fallback: equal weight portfolio
+        weights = np.ones(n) / n
+    else:
+        weights = sol['x'][:n] if objective == 'min_variance' else sol['x'][:n] / sol['x'][n]
+        weights = np.clip(weights, 0, None)
+        weights = weights / weights.sum()
+    port_return, port_vol, sharpe = problem.stats(weights)
+    return {
+        'weights': dict(zip(tickers, weights)),
+        'sharpe_ratio': sharpe,
+        'expected_return': port_return,
+        'volatility': port_vol,
+        'avg_esg': np.dot(weights, problem.esg),
+        'success': sol['status'] == 'solved',
+        'diagnostics': diagnostics
     }
 
+
+GRID_PARAMETERS = ('risk_free_rate', 'min_alt', 'max_single', 'min_esg')
+
+
+def optimize_portfolio_grid(
+    expected_returns,
+    cov_matrix,
+    grid,
+    esg_scores=ESG_SCORES,
+    min_alt=0.2,
+    max_single=0.3,
+    max_asset=0.4,
+    min_esg=7.0,
+    risk_free_rate=0.02,
+    objective='max_sharpe'
+):
+    """
+    Solve optimize_portfolio(solver='qp') for every point of a grid of constraint settings in one call.
+    Return, covariance and ESG arrays are built once and shared, the QP factorization is reused whenever
+    the constraint matrix does not change (always for min_variance), and each point is warm-started
+    from the previous one, so order the grid with neighbouring settings next to each other.
+    Args:
+        expected_returns (pd.Series): Annualized expected returns
+        cov_matrix (pd.DataFrame): Annualized covariance matrix
+        grid (dict or pd.DataFrame): {parameter: values} expanded as a cartesian product (last key varies
+            fastest), or a DataFrame with one row per setting; parameters are GRID_PARAMETERS
+        esg_scores, min_alt, max_single, max_asset, min_esg, risk_free_rate: Defaults for parameters
+            the grid does not vary, as in optimize_portfolio
+        objective (str): 'max_sharpe' or 'min_variance'
+    Returns:
+        pd.DataFrame: One row per grid point: the parameters, sharpe_ratio, expected_return, volatility,
+                      avg_esg, status, nit, then one weight column per asset
+    """
+    if objective not in ('max_sharpe', 'min_variance'):
+        raise ValueError(f"Unknown objective '{objective}', expected 'max_sharpe' or 'min_variance'")
+    if isinstance(grid, pd.DataFrame):
+        points = grid.to_dict('records')
+    else:
+        keys = list(grid)
+        points = [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+    unknown = {k for point in points for k in point} - set(GRID_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown grid parameters {sorted(unknown)}, expected a subset of {GRID_PARAMETERS}")
+
+    tickers = expected_returns.index.tolist()
+    base = _PortfolioProblem(expected_returns, cov_matrix, tickers, esg_scores, min_alt, max_single,
+                             max_asset, min_esg, risk_free_rate, 0.0, None)
+    rows = []
+    for problem, sol in _iter_grid(base, points, objective):
+        row = {'risk_free_rate': problem.rf, 'min_alt': problem.min_alt, 'max_single': problem.max_single,
+               'min_esg': problem.min_esg}
+        if sol is None:
+            row.update(status='no_excess_return', nit=0)
+            rows.append(row)
+            continue
+        result = _qp_result(problem, tickers, objective, sol)
+        row.update(sharpe_ratio=result['sharpe_ratio'], expected_return=result['expected_return'],
+                   volatility=result['volatility'], avg_esg=result['avg_esg'], status=sol['status'],
+                   nit=sol['iterations'])
+        row.update(result['weights'])
+        rows.append(row)
+    columns = list(GRID_PARAMETERS) + ['sharpe_ratio', 'expected_return', 'volatility', 'avg_esg',
+                                       'status', 'nit'] + tickers
+    return pd.DataFrame(rows).reindex(columns=columns)
+
+
+def _iter_grid(base, points, objective):
+    """
+    Solve the QP for each parameter setting in turn, reusing factorizations and warm-starting from the
+    previous solution. Yields (problem, solution); solution is None when no asset beats the risk-free rate.
+    """
+    solver, x0, y0 = None, None, None
+    for point in points:
+        problem = base.with_params(**point)
+        if objective == 'max_sharpe' and problem.mu.max() <= problem.rf:
+            yield problem, None
+            continue
+        P, q, A, l, u = _qp_data(problem, objective)
+        solver = QPSolver(P, A) if solver is None else solver.with_constraints(A)
+        sol = solver.solve(q, l, u, x0=x0, y0=y0, method=_qp_method(problem))
+        if sol['status'] == 'solved':
+            x0, y0 = sol['x'], sol['y']
+        yield problem, sol
+
+
+def efficient_frontier(
+    expected_returns,
+    cov_matrix,
+    esg_scores=ESG_SCORES,
+    min_alt=0.2,
+    max_single=0.3,
+    max_asset=0.4,
+    min_esg=7.0,
+    n_points=50,
+    target_returns=None,
+    n_jobs=1
+):
+    """
+    Constrained efficient frontier: minimum variance for a grid of target returns.
+    Every point honours the same budget, alternatives, ESG and concentration constraints as
+    optimize_portfolio, and is warm-started from its neighbour's solution.
+    Args:
+        expected_returns (pd.Series): Annualized expected returns
+        cov_matrix (pd.DataFrame): Annualized covariance matrix
+        esg_scores, min_alt, max_single, max_asset, min_esg: Constraints as in optimize_portfolio
+        n_points (int): Grid size when target_returns is not given
+        target_returns (array-like): Explicit grid; defaults to n_points from the minimum-variance
+            portfolio's return up to the highest return attainable under the constraints
+        n_jobs (int): Split the grid into this many contiguous segments solved in parallel processes
+    Returns:
+        dict: 'target_returns' (P,), 'returns' (P,), 'vols' (P,), 'weights' (P x N), 'success' (P,) arrays
+              and 'tickers'
+    """
+    tickers = expected_returns.index.tolist()
+    problem = _PortfolioProblem(expected_returns, cov_matrix, tickers, esg_scores, min_alt, max_single,
+                                max_asset, min_esg, 0.0, 0.0, None)
+    n = len(tickers)
+    x0 = np.ones(n) / n
+
+    # Anchor the grid: minimum-variance portfolio and maximum attainable return
+    min_var = minimize(problem.variance, x0, jac=problem.variance_gradient, bounds=problem.bounds,
+                       constraints=problem.linear_constraints(), method='SLSQP', options={'maxiter': 1000})
+    if target_returns is None:
+        max_ret = linprog(-problem.mu, A_ub=-problem.A_ineq, b_ub=-problem.b_ineq, A_eq=problem.A_eq,
+                          b_eq=problem.b_eq, bounds=problem.bounds, method='highs')
+        if not (min_var.success and max_ret.success):
+            raise ValueError("Constraints are infeasible; cannot build the efficient frontier")
+        target_returns = np.linspace(problem.mu @ min_var.x, -max_ret.fun, n_points)
+    target_returns = np.asarray(target_returns, dtype=float)
+    start = min_var.x if min_var.success else x0
+
+    segments = [seg for seg in np.array_split(target_returns, max(1, min(n_jobs, len(target_returns)))) if len(seg)]
+    if len(segments) == 1:
+        results = [_frontier_segment(problem, segments[0], start)]
+    else:
+        with ProcessPoolExecutor(max_workers=len(segments)) as pool:
+            results = list(pool.map(_frontier_segment, [problem] * len(segments), segments,
+                                    [start] * len(segments)))
+    weights = np.vstack([r[0] for r in results])
+    success = np.concatenate([r[1] for r in results])
+    port_returns = weights @ problem.mu
+    vols = np.sqrt(np.sum(weights * (problem.cov @ weights.T).T, axis=1))
+    return {
+        'target_returns': target_returns,
+        'returns': port_returns,
+        'vols': vols,
+        'weights': weights,
+        'success': success,
+        'tickers': tickers
+    }
+
+
+def _frontier_segment(problem, targets, x0):
+    """Solve consecutive frontier points, each warm-started from the previous solution."""
+    weights = np.empty((len(targets), len(x0)))
+    success = np.zeros(len(targets), dtype=bool)
+    base = problem.linear_constraints()
+    mu = problem.mu
+    x = x0
+    for i, target in enumerate(targets):
+        constraints = base + [{'type': 'eq', 'fun': lambda w, t=target: np.array([mu @ w - t]),
+                               'jac': lambda w: mu[None, :]}]
+        result = minimize(problem.variance, x, jac=problem.variance_gradient, bounds=problem.bounds,
+                          constraints=constraints, method='SLSQP', options={'maxiter': 1000})
+        weights[i] = result.x
+        success[i] = result.success
+        if result.success:
+            x = result.x
+    return weights, success
+
+
+class _PortfolioProblem:
+    """
+    Arrays describing one optimize_portfolio call: objective, gradient and constraints.
+    Linear constraints are kept as matrices (A_eq w = b_eq, A_ineq w >= b_ineq) so they can be
+    handed to SLSQP with constant Jacobians or reused by other solvers.
+    The covariance is only used through `cov @ w`, so a FactorCovariance is kept as is.
+    """
+
+    def __init__(self, expected_returns, cov_matrix, tickers, esg_scores, min_alt, max_single, max_asset,
+                 min_esg, risk_free_rate, transaction_costs, prev_weights):
+        n = len(tickers)
+        self.mu = np.asarray(expected_returns, dtype=float)
+        self.cov = cov_matrix if isinstance(cov_matrix, FactorCovariance) else np.asarray(cov_matrix, dtype=float)
+        self.rf = risk_free_rate
+        # Per-asset proportional costs; assets missing from a dict/Series pay TRANSACTION_COSTS
+        if isinstance(transaction_costs, (dict, pd.Series)):
+            transaction_costs = pd.Series(transaction_costs).reindex(tickers).fillna(TRANSACTION_COSTS)
+        self.tc = np.broadcast_to(np.asarray(transaction_costs, dtype=float), (n,))
+        self.prev = None if prev_weights is None else np.asarray(prev_weights, dtype=float)
+        self.alt_idx = [i for i, t in enumerate(tickers) if t in ['Hedge_Fund', 'Private_Equity']]
+        self.esg = np.array([esg_scores.get(t, 7.0) for t in tickers])
+        self.A_eq = np.ones((1, n))
+        self.b_eq = np.ones(1)
+        self._set_constraints(min_alt, max_single, max_asset, min_esg)
+
+    def with_params(self, risk_free_rate=None, min_alt=None, max_single=None, min_esg=None):
+        """Copy with new constraint settings; the return, covariance and ESG arrays are shared, not copied."""
+        other = copy.copy(self)
+        if risk_free_rate is not None:
+            other.rf = risk_free_rate
+        other._set_constraints(self.min_alt if min_alt is None else min_alt,
+                               self.max_single if max_single is None else max_single,
+                               self.max_asset,
+                               self.min_esg if min_esg is None else min_esg)
+        return other
+
+    def _set_constraints(self, min_alt, max_single, max_asset, min_esg):
+        n = len(self.mu)
+        self.min_alt = min_alt
+        self.max_single = max_single
+        self.max_asset = max_asset
+        self.min_esg = min_esg
+        # max_single is a per-asset cap as well, so it tightens the bounds instead of using max(w)
+        self.bounds = [(0, min(max_asset, max_single))] * n
+
+        rows, rhs = [], []
+        if self.alt_idx:
+            alt_row = np.zeros(n)
+            alt_row[self.alt_idx] = 1
+            rows.append(alt_row)
+            rhs.append(min_alt)
+        # dot(w, esg) / sum(w) >= min_esg  <=>  dot(w, esg - min_esg) >= 0 for sum(w) > 0
+        rows.append(self.esg - min_esg)
+        rhs.append(0.0)
+        self.A_ineq = np.array(rows)
+        self.b_ineq = np.array(rhs)
+
+    def stats(self, weights):
+        port_return = np.dot(weights, self.mu)
+        port_vol = np.sqrt(np.dot(weights, self.cov @ weights))
+        sharpe = (port_return - self.rf) / port_vol if port_vol > 0 else 0
+        return port_return, port_vol, sharpe
+
+    def objective(self, weights):
+        # Negative Sharpe (since we minimize); costs against holdings are handled by trade_objective()
+        port_return, port_vol, sharpe = self.stats(weights)
+        return -sharpe
+
+    def gradient(self, weights):
+        """Closed-form gradient of objective(): -d(Sharpe)/dw."""
+        cov_w = self.cov @ weights
+        port_vol = np.sqrt(np.dot(weights, cov_w))
+        excess = np.dot(weights, self.mu) - self.rf
+        return -(self.mu / port_vol - excess * cov_w / port_vol ** 3)
+
+    def trade_weights(self, trades):
+        """Weights after trades v = (buys, sells): w = prev + buys - sells."""
+        n = len(self.mu)
+        return self.prev + trades[:n] - trades[n:]
+
+    def trade_objective(self, trades):
+        """-Sharpe of the post-trade portfolio plus linear costs on buys and sells (smooth in v)."""
+        n = len(self.mu)
+        port_return, port_vol, sharpe = self.stats(self.trade_weights(trades))
+        return -sharpe + self.tc @ (trades[:n] + trades[n:])
+
+    def trade_gradient(self, trades):
+        n = len(self.mu)
+        weights = self.trade_weights(trades)
+        cov_w = self.cov @ weights
+        port_vol = np.sqrt(np.dot(weights, cov_w))
+        excess = np.dot(weights, self.mu) - self.rf
+        grad_w = -(self.mu / port_vol - excess * cov_w / port_vol ** 3)
+        return np.r_[grad_w + self.tc, -grad_w + self.tc]
+
+    def trade_matrices(self):
+        """
+        Budget, alternatives, ESG and upper-bound constraints on w = prev + D v as linear rows in v:
+        A_eq v = b_eq, A_ineq v >= b_ineq.
+        """
+        n = len(self.mu)
+        D = np.hstack([np.eye(n), -np.eye(n)])
+        ub = self.bounds[0][1]
+        A_eq = self.A_eq @ D
+        b_eq = self.b_eq - self.A_eq @ self.prev
+        A_ineq = np.vstack([self.A_ineq @ D, -D])
+        b_ineq = np.r_[self.b_ineq - self.A_ineq @ self.prev, self.prev - ub]
+        return A_eq, b_eq, A_ineq, b_ineq
+
+    def trade_constraints(self):
+        """SLSQP constraint dicts for trade_matrices()."""
+        A_eq, b_eq, A_ineq, b_ineq = self.trade_matrices()
+        return [
+            {'type': 'eq', 'fun': lambda v: A_eq @ v - b_eq, 'jac': lambda v: A_eq},
+            {'type': 'ineq', 'fun': lambda v: A_ineq @ v - b_ineq, 'jac': lambda v: A_ineq},
+        ]
+
+    def trade_bounds(self, frozen=None):
+        """Buys in [0, cap], sells in [0, holding] (so w >= 0); frozen assets cannot trade."""
+        ub = self.bounds[0][1]
+        buy = [(0, ub) for _ in self.prev]
+        sell = [(0, max(p, 0.0)) for p in self.prev]
+        if frozen is not None:
+            for i in np.flatnonzero(frozen):
+                buy[i] = sell[i] = (0, 0)
+        return buy + sell
+
+    def variance(self, weights):
+        return np.dot(weights, self.cov @ weights)
+
+    def variance_gradient(self, weights):
+        return 2 * (self.cov @ weights)
+
+    def linear_constraints(self):
+        """SLSQP constraint dicts with constant Jacobians."""
+        A_eq, b_eq, A_ineq, b_ineq = self.A_eq, self.b_eq, self.A_ineq, self.b_ineq
+        return [
+            {'type': 'eq', 'fun': lambda w: A_eq @ w - b_eq, 'jac': lambda w: A_eq},
+            {'type': 'ineq', 'fun': lambda w: A_ineq @ w - b_ineq, 'jac': lambda w: A_ineq},
+        ]
+
+    def qp_min_variance(self):
+        """
+        QP data (P, q, A, l, u) for min w'Σw over the constraint set (variables: w).
+        With the budget row in place the ESG limit is written as esg'w >= min_esg, so A does not depend
+        on any constraint setting and one factorization serves a whole parameter grid.
+        """
+        n = len(self.mu)
+        ub = self.bounds[0][1]
+        A_ineq = np.vstack([self.A_ineq[:-1], self.esg])
+        b_ineq = np.r_[self.b_ineq[:-1], self.min_esg]
+        A = sp.vstack([self.A_eq, A_ineq, sp.identity(n)])
+        l = np.r_[self.b_eq, b_ineq, np.zeros(n)]
+        u = np.r_[self.b_eq, np.full(len(b_ineq), np.inf), np.full(n, ub)]
+        return self._qp_quadratic(A, l, u)
+
+    def qp_max_sharpe(self):
+        """
+        QP data (P, q, A, l, u) for maximum Sharpe via the homogenized problem over v = (y, kappa):
+        min y'Σy  s.t.  (mu - rf)'y = 1, sum(y) = kappa and every constraint on w scaled by kappa;
+        the optimal weights are w = y / kappa.
+        """
+        n = len(self.mu)
+        ub = self.bounds[0][1]
+        eye = sp.identity(n)
+        A = sp.vstack([
+            np.r_[self.mu - self.rf, 0.0],
+            np.c_[self.A_eq, -self.b_eq[:, None]],
+            np.c_[self.A_ineq, -self.b_ineq[:, None]],
+            sp.hstack([eye, sp.csr_matrix((n, 1))]),
+            sp.hstack([eye, np.full((n, 1), -ub)]),
+            np.r_[np.zeros(n), 1.0],
+        ])
+        k = len(self.b_ineq)
+        l = np.r_[1.0, np.zeros(len(self.b_eq)), np.zeros(k), np.zeros(n), np.full(n, -np.inf), 0.0]
+        u = np.r_[1.0, np.zeros(len(self.b_eq)), np.full(k, np.inf), np.full(n, np.inf), np.zeros(n), np.inf]
+        return self._qp_quadratic(A, l, u)
+
+    def _qp_quadratic(self, A, l, u):
+        """
+        Add the quadratic term x[:n]'Σx[:n] to QP constraint data built in sparse form.
+        A dense covariance gives dense (P, A). A FactorCovariance is lifted instead: K factor exposures
+        f = B'x[:n] are appended as variables, so P = blockdiag(2D, 0, 2F) and A gains the K rows
+        B'x[:n] - f = 0; everything stays sparse with O(NK) non-zeros.
+        """
+        n = len(self.mu)
+        m, n_var = A.shape
+        if not isinstance(self.cov, FactorCovariance):
+            P = np.zeros((n_var, n_var))
+            P[:n, :n] = 2 * self.cov
+            return P, np.zeros(n_var), A.toarray(), l, u
+        B, F, D = self.cov.loadings, self.cov.factor_cov, self.cov.specific_var
+        k = B.shape[1]
+        P = sp.block_diag([sp.diags(2 * D), sp.csr_matrix((n_var - n, n_var - n)), sp.csr_matrix(2 * F)],
+                          format='csc')
+        link = sp.hstack([B.T, sp.csr_matrix((k, n_var - n)), -sp.identity(k)])
+        A = sp.vstack([sp.hstack([A, sp.csr_matrix((m, k))]), link], format='csr')
+        return P, np.zeros(n_var + k), A, np.r_[l, np.zeros(k)], np.r_[u, np.zeros(k)]
+
+    def legacy_constraints(self):
+        """Original function-handle constraints (finite-differenced by SLSQP)."""
+        alt_idx, esg_arr = self.alt_idx, self.esg
+        constraints = [
+            {'type': 'eq', 'fun': lambda w: np.sum(w) - 1},  # Fully invested
+        ]
+        
+        # Add alternatives constraint if alternatives exist
+        if alt_idx:
+            constraints.append({'type': 'ineq', 'fun': lambda w: np.sum(w[alt_idx]) - self.min_alt})
+        
+        # Add ESG constraint
+        constraints.append({'type': 'ineq', 'fun': lambda w: np.dot(w, esg_arr) / np.sum(w) - self.min_esg})
+        
+        # Add max single asset constraint
+        constraints.append({'type': 'ineq', 'fun': lambda w: self.max_single - np.max(w)})
+        return constraints
+
 # Example test (to be removed in production)
 if __name__ == "__main__":
     # Simulate some data for testing
@@ -0,0 +1,135 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class ReturnsPanel:
+    """
+    T x N returns matrix backed by a numpy.memmap, with a date index and a ticker index.
+
+    Values are stored column-major (Fortran order), so every ticker's history and any
+    run of adjacent tickers is one contiguous block: column slices are views into the
+    mapped file and large universes never have to be loaded whole into memory.
+    """
+
+    VALUES = 'values.dat'
+    INDEX = 'index.json'
+
+    def __init__(self, path, values, dates, tickers):
+        self.path = path
+        self.values = values
+        self.dates = dates
+        self.tickers = tickers
+        self._position = {t: i for i, t in enumerate(tickers)}
+
+    @classmethod
+    def create(cls, path, dates, tickers, dtype='float64'):
+        """
+        Allocate an empty (NaN-filled) panel on disk.
+        Args:
+            path (str): Directory for the panel files
+            dates (list or pd.DatetimeIndex): Row index
+            tickers (list): Column index
+            dtype (str): 'float64' or 'float32'
+        Returns:
+            ReturnsPanel: Writable panel
+        """
+        dtype = np.dtype(dtype)
+        if dtype not in (np.float32, np.float64):
+            raise ValueError(f"Unsupported panel dtype {dtype}, expected float32 or float64")
+        os.makedirs(path, exist_ok=True)
+        dates = pd.DatetimeIndex(dates)
+        tickers = list(tickers)
+        values = np.memmap(os.path.join(path, cls.VALUES), dtype=dtype, mode='w+',
+                           shape=(len(dates), len(tickers)), order='F')
+        values[:] = np.nan
+        with open(os.path.join(path, cls.INDEX), 'w') as f:
+            json.dump({'dtype': dtype.name, 'shape': [len(dates), len(tickers)],
+                       'dates': [d.strftime('%Y-%m-%d') for d in dates], 'tickers': tickers}, f)
+        return cls(path, values, dates, tickers)
+
+    @classmethod
+    def from_frame(cls, path, frame, dtype='float64'):
+        """Write a returns DataFrame (dates x tickers) to a new panel."""
+        panel = cls.create(path, frame.index, frame.columns, dtype=dtype)
+        panel.values[:] = frame.values
+        panel.flush()
+        return panel
+
+    @classmethod
+    def open(cls, path, mode='r'):
+        """
+        Map an existing panel.
+        Args:
+            path (str): Panel directory
+            mode (str): 'r' (read-only) or 'r+' (read-write)
+        """
+        with open(os.path.join(path, cls.INDEX)) as f:
+            index = json.load(f)
+        values = np.memmap(os.path.join(path, cls.VALUES), dtype=index['dtype'], mode=mode,
+                           shape=tuple(index['shape']), order='F')
+        return cls(path, values, pd.DatetimeIndex(index['dates']), index['tickers'])
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def flush(self):
+        self.values.flush()
+
+    def positions(self, tickers):
+        """Column positions of the given tickers."""
+        missing = [t for t in tickers if t not in self._position]
+        if missing:
+            raise KeyError(f"Tickers not in panel: {missing}")
+        return [self._position[t] for t in tickers]
+
+    def columns(self, tickers=None):
+        """
+        Returns matrix for a set of tickers.
+        A run of adjacent tickers (in panel order) is returned as a view of the memmap;
+        any other selection needs a gather and is returned as an in-memory copy.
+        Args:
+            tickers (list): Tickers to select, or None for the whole panel
+        Returns:
+            np.ndarray: T x len(tickers) returns
+        """
+        if tickers is None:
+            return self.values
+        pos = self.positions(tickers)
+        if pos == list(range(pos[0], pos[0] + len(pos))):
+            return self.values[:, pos[0]:pos[0] + len(pos)]
+        return self.values[:, pos]
+
+    def frame(self, tickers=None):
+        """DataFrame over columns(tickers), sharing memory with the panel when the selection is a view."""
+        tickers = self.tickers if tickers is None else list(tickers)
+        return pd.DataFrame(self.columns(tickers), index=self.dates, columns=tickers, copy=False)
+
+    def moments(self, tickers=None, chunk_rows=4096):
+        """
+        Mean vector and sample covariance (ddof=1) of the selected columns, accumulated
+        over blocks of rows so only chunk_rows x N values are resident at a time.
+        Each block's centred co-moments are merged into the running ones (Chan et al.),
+        so the result stays accurate for long series with a large mean.
+        NaNs are treated as zero returns, as in collect_market_data.
+        Returns:
+            tuple: (mean (N,), covariance (N, N)) as float64 arrays
+        """
+        data = self.columns(tickers)
+        t, n = data.shape
+        count = 0
+        mean = np.zeros(n)
+        comoment = np.zeros((n, n))
+        for start in range(0, t, chunk_rows):
+            block = np.nan_to_num(np.asarray(data[start:start + chunk_rows], dtype=np.float64))
+            m = len(block)
+            block_mean = block.mean(axis=0)
+            centred = block - block_mean
+            delta = block_mean - mean
+            comoment += centred.T @ centred + np.outer(delta, delta) * (count * m / (count + m))
+            mean += delta * (m / (count + m))
+            count += m
+        return mean, comoment / (t - 1)
@@ -2,8 +2,10 @@ import numpy as np
 import pandas as pd
 from scipy import stats
 
+from frequency import periods_per_year as tagged_periods_per_year
 
-def evaluate_managers(manager_returns, benchmark_returns, fees=None, dd_scores=None):
+
+def evaluate_managers(manager_returns, benchmark_returns, fees=None, dd_scores=None, periods_per_year=None):
     """
     Evaluate and rank third-party managers by risk-adjusted metrics and due diligence.
     Args:
@@ -11,20 +13,22 @@ def evaluate_managers(manager_returns, benchmark_returns, fees=None, dd_scores=N
         benchmark_returns (pd.Series): Monthly benchmark returns
         fees (dict): Annual fee for each manager (in decimal, e.g., 0.01)
         dd_scores (dict): Due diligence scores (0-10) for each manager
+        periods_per_year (int): Annualization factor (defaults to the one tagged on manager_returns, else 12)
     Returns:
         pd.DataFrame: Manager evaluation table with all metrics and ranking
     """
+    ppy = periods_per_year or tagged_periods_per_year(manager_returns)
     results = []
     for mgr in manager_returns.columns:
         rets = manager_returns[mgr]
         fee = fees.get(mgr, 0.01) if fees else 0.01
         dd = dd_scores.get(mgr, 7) if dd_scores else 7
-        ann_ret = (1 + rets).prod() ** (12 / len(rets)) - 1 - fee
-        ann_vol = rets.std() * np.sqrt(12)
+        ann_ret = (1 + rets).prod() ** (ppy / len(rets)) - 1 - fee
+        ann_vol = rets.std() * np.sqrt(ppy)
         sharpe = ann_ret / ann_vol if ann_vol > 0 else np.nan
         # Alpha/Beta
         slope, intercept, r, p, std_err = stats.linregress(benchmark_returns, rets)
-        alpha = intercept * 12
+        alpha = intercept * ppy
         beta = slope
         # Max drawdown
         cum = (1 + rets).cumprod()
@@ -0,0 +1,202 @@
+import json
+import os
+import threading
+
+import pandas as pd
+
+from frequency import get_frequency, resample_prices
+
+
+class PriceStore:
+    """
+    Local columnar store of daily prices, one Parquet (or Feather) file per ticker.
+
+    A small JSON manifest records which [start, end) window has already been
+    fetched for every ticker, so callers only download the missing head/tail and
+    weekends or holidays at the edge of the window are not re-requested.
+    """
+
+    MANIFEST = 'manifest.json'
+    FORMATS = {'parquet': '.parquet', 'feather': '.feather'}
+
+    def __init__(self, root, fmt='parquet'):
+        """
+        Args:
+            root (str): Directory holding the store (created if missing)
+            fmt (str): 'parquet' or 'feather'
+        """
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Unsupported store format '{fmt}', expected one of {list(self.FORMATS)}")
+        self.root = root
+        self.fmt = fmt
+        self._lock = threading.RLock()
+        self._panels = {}
+        os.makedirs(root, exist_ok=True)
+        self._manifest = self._load_manifest()
+
+    @property
+    def revision(self):
+        """Counter bumped by every write that changes stored prices or coverage."""
+        return self._manifest['revision']
+
+    def tickers(self):
+        """Tickers with at least one stored bar."""
+        return sorted(self._manifest['coverage'])
+
+    def coverage(self, ticker):
+        """Fetched [start, end) window for a ticker as Timestamps, or None."""
+        window = self._manifest['coverage'].get(ticker)
+        if window is None:
+            return None
+        return pd.Timestamp(window[0]), pd.Timestamp(window[1])
+
+    def missing_ranges(self, tickers, start, end):
+        """
+        Work out which parts of [start, end) still have to be fetched.
+        Args:
+            tickers (list): Tickers requested
+            start, end (str or Timestamp): Requested window, end exclusive
+        Returns:
+            dict: {(range_start, range_end): [tickers]} grouped so each range can be fetched in one call
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        gaps = {}
+        for ticker in tickers:
+            window = self.coverage(ticker)
+            if window is None:
+                ranges = [(start, end)]
+            else:
+                # Gaps run up to / from the covered window even when the request does not touch it,
+                # so the window stays contiguous once they are written back
+                cov_start, cov_end = window
+                ranges = []
+                if start < cov_start:
+                    ranges.append((start, cov_start))
+                if end > cov_end:
+                    ranges.append((cov_end, end))
+            for rng in ranges:
+                if rng[0] < rng[1]:
+                    gaps.setdefault(rng, []).append(ticker)
+        return gaps
+
+    def read(self, tickers, start=None, end=None):
+        """
+        Load stored daily prices as a wide DataFrame (dates x tickers).
+        Args:
+            tickers (list): Tickers to load
+            start, end (str or Timestamp): Optional window, end exclusive
+        Returns:
+            pd.DataFrame: Daily prices, tickers missing from the store are omitted
+        """
+        series = {}
+        for ticker in tickers:
+            s = self._read_ticker(ticker)
+            if s is None:
+                continue
+            if start is not None:
+                s = s[s.index >= pd.Timestamp(start)]
+            if end is not None:
+                s = s[s.index < pd.Timestamp(end)]
+            series[ticker] = s
+        if not series:
+            return pd.DataFrame()
+        return pd.DataFrame(series).sort_index()
+
+    def resampled(self, tickers, start, end, freq):
+        """
+        Stored prices cleaned and resampled to a frequency, cached in memory per
+        (tickers, window, frequency) until the store is next written to.
+        The returned frame is shared between callers and must not be modified in place.
+        Args:
+            tickers (list): Tickers to load
+            start, end (str or Timestamp): Window, end exclusive
+            freq (str or Frequency): 'D', 'W' or 'M'
+        Returns:
+            pd.DataFrame: Period-end prices
+        """
+        freq = get_frequency(freq)
+        key = (tuple(tickers), str(start), str(end), freq.code)
+        with self._lock:
+            cached = self._panels.get(key)
+            if cached is not None and cached[0] == self.revision:
+                return cached[1]
+            panel = resample_prices(self.read(tickers, start, end), freq)
+            self._panels[key] = (self.revision, panel)
+            return panel
+
+    def write(self, prices, start, end):
+        """
+        Merge freshly fetched prices into the store and extend each ticker's coverage.
+        A ticker without any bars in prices, or a window that neither overlaps nor touches the
+        existing coverage, does not extend it.
+        Args:
+            prices (pd.DataFrame): Daily prices (dates x tickers); may be empty for a ticker
+            start, end (str or Timestamp): Window the prices were fetched for, end exclusive
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        with self._lock:
+            changed = False
+            for ticker in prices.columns:
+                new = prices[ticker].dropna()
+                if not len(new):
+                    # Nothing came back (a failed download looks the same as a window without trading
+                    # days): leave the coverage alone so the next call retries the window
+                    continue
+                old = self._read_ticker(ticker)
+                if old is not None:
+                    new = pd.concat([old[~old.index.isin(new.index)], new]).sort_index()
+                if old is None or not new.equals(old):
+                    self._write_ticker(ticker, new)
+                    changed = True
+                window = self.coverage(ticker)
+                if window is not None and (end < window[0] or start > window[1]):
+                    # Disjoint from the covered window: the bars are kept, but claiming the gap
+                    # between the two windows as covered would hide it from missing_ranges
+                    start_, end_ = window
+                elif window is not None:
+                    start_, end_ = min(start, window[0]), max(end, window[1])
+                else:
+                    start_, end_ = start, end
+                if (start_, end_) != window:
+                    self._manifest['coverage'][ticker] = [start_.strftime('%Y-%m-%d'), end_.strftime('%Y-%m-%d')]
+                    changed = True
+            if changed:
+                # Only a real change invalidates the resampled panels and results cached against the revision
+                self._manifest['revision'] += 1
+                self._panels.clear()
+                self._save_manifest()
+
+    def _path(self, ticker):
+        return os.path.join(self.root, f"{ticker}{self.FORMATS[self.fmt]}")
+
+    def _read_ticker(self, ticker):
+        path = self._path(ticker)
+        if not os.path.exists(path):
+            return None
+        if self.fmt == 'parquet':
+            frame = pd.read_parquet(path)
+        else:
+            frame = pd.read_feather(path)
+        return pd.Series(frame['close'].values, index=pd.DatetimeIndex(frame['date']), name=ticker)
+
+    def _write_ticker(self, ticker, series):
+        frame = pd.DataFrame({'date': series.index, 'close': series.values.astype(float)})
+        tmp = self._path(ticker) + '.tmp'
+        if self.fmt == 'parquet':
+            frame.to_parquet(tmp, index=False)
+        else:
+            frame.to_feather(tmp)
+        os.replace(tmp, self._path(ticker))
+
+    def _load_manifest(self):
+        path = os.path.join(self.root, self.MANIFEST)
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        return {'revision': 0, 'format': self.fmt, 'coverage': {}}
+
+    def _save_manifest(self):
+        path = os.path.join(self.root, self.MANIFEST)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self._manifest, f, indent=2, sort_keys=True)
+        os.replace(path + '.tmp', path)
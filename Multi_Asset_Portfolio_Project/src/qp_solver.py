@@ -0,0 +1,380 @@
+import copy
+import time
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.linalg import cho_factor, cho_solve
+from scipy.sparse.linalg import splu
+
+
+class QPSolver:
+    """
+    Convex quadratic program solver (ADMM, in the style of OSQP):
+
+        minimize    0.5 x^T P x + q^T x
+        subject to  l <= A x <= u
+
+    P must be positive semi-definite; equality rows have l == u and one-sided rows use +/-inf.
+    The KKT matrix P + sigma I + A^T R A is factorized once per step size and cached, so repeated
+    solves with new q, l, u (or warm starts) only cost triangular solves. After ADMM converges the
+    active set is polished with one direct KKT solve, which gives a solution accurate to machine
+    precision instead of the ADMM tolerance.
+
+    If P or A is a scipy.sparse matrix the solver works on the sparse quasi-definite system
+    [[P + sigma I, A^T], [A, -R^-1]] (sparse LU) and never forms an n x n dense matrix, which is what
+    keeps lifted factor-model problems with thousands of assets cheap.
+
+    solve(method='interior_point') runs a Mehrotra predictor-corrector interior point method on the
+    same kind of system instead. It refactorizes every step but needs a few dozen steps whatever the
+    problem size, where ADMM can need tens of thousands of iterations on large, many-bound problems;
+    it cannot be warm-started.
+    """
+
+    def __init__(self, P, A, rho=0.1, sigma=1e-6, alpha=1.6, adaptive_rho=True):
+        """
+        Args:
+            P (np.ndarray or sparse): n x n PSD quadratic term (ValueError if indefinite; for sparse P
+                only the diagonal is checked, the caller guarantees the rest)
+            A (np.ndarray or sparse): m x n constraint matrix
+            rho (float): Initial ADMM step size
+            sigma (float): Regularization of the x-update (keeps the KKT matrix positive definite)
+            alpha (float): Over-relaxation parameter in (0, 2)
+            adaptive_rho (bool): Rescale rho from the primal/dual residual ratio while iterating
+        """
+        self.sparse = sp.issparse(P) or sp.issparse(A)
+        if self.sparse:
+            self.P = sp.csc_matrix(P, dtype=float)
+            self.A = sp.csr_matrix(A, dtype=float)
+            if (self.P.diagonal() < 0).any():
+                raise ValueError("P must be positive semi-definite for a convex QP")
+        else:
+            self.P = np.asarray(P, dtype=float)
+            self.A = np.atleast_2d(np.asarray(A, dtype=float))
+            eigenvalues = np.linalg.eigvalsh((self.P + self.P.T) / 2)
+            if eigenvalues[0] < -1e-10 * max(1.0, abs(eigenvalues[-1])):
+                raise ValueError("P must be positive semi-definite for a convex QP")
+        self.n = self.P.shape[0]
+        self.m = self.A.shape[0]
+        self.rho = rho
+        self.sigma = sigma
+        self.alpha = alpha
+        self.adaptive_rho = adaptive_rho
+        self._factors = {}
+
+    def with_constraints(self, A):
+        """
+        Solver for the same P and a new constraint matrix. Returns self (keeping every cached
+        factorization) when A is unchanged; otherwise the PSD check on P is not repeated.
+        """
+        A = sp.csr_matrix(A, dtype=float) if self.sparse else np.atleast_2d(np.asarray(A, dtype=float))
+        if A.shape == self.A.shape and (((A != self.A).nnz == 0) if self.sparse else np.array_equal(A, self.A)):
+            return self
+        other = copy.copy(self)
+        other.A = A
+        other.m = A.shape[0]
+        other._factors = {}
+        return other
+
+    def solve(self, q, l, u, x0=None, y0=None, max_iter=10000, eps_abs=1e-7, eps_rel=1e-7,
+              check_every=10, polish=True, method='admm'):
+        """
+        Solve the QP for the given linear term and constraint bounds.
+        Args:
+            q (array-like): Linear term (n,)
+            l, u (array-like): Lower/upper constraint bounds (m,)
+            x0, y0 (array-like): Optional warm start for the primal and dual variables
+            max_iter (int): ADMM iteration limit (interior point steps are capped at 200)
+            eps_abs, eps_rel (float): Absolute/relative residual tolerances
+            check_every (int): Iterations between convergence checks
+            polish (bool): Refine the solution with a direct solve on the detected active set
+            method (str): 'admm' or 'interior_point'
+        Returns:
+            dict: {'x', 'y', 'objective', 'status' ('solved', 'primal_infeasible' or 'max_iter'),
+                   'iterations', 'polished', 'time'}
+        """
+        if method not in ('admm', 'interior_point'):
+            raise ValueError(f"Unknown QP method '{method}', expected 'admm' or 'interior_point'")
+        t0 = time.perf_counter()
+        A, P = self.A, self.P
+        q = np.asarray(q, dtype=float)
+        l = np.asarray(l, dtype=float)
+        u = np.asarray(u, dtype=float)
+        eq = l == u
+        x = np.zeros(self.n) if x0 is None else np.asarray(x0, dtype=float).copy()
+        y = np.zeros(self.m) if y0 is None else np.asarray(y0, dtype=float).copy()
+        z = np.clip(A @ x, l, u)
+        if polish and x0 is not None and y0 is not None:
+            # A nearby solution usually has the right active set: try the direct solve first
+            Ax, Aty = A @ x, A.T @ y
+            guess = self._polish(q, l, u, x, y, z,
+                                 eps_abs + eps_rel * max(_norm(Ax), _norm(z)),
+                                 eps_abs + eps_rel * max(_norm(P @ x), _norm(Aty), _norm(q)))
+            if guess is not None:
+                x, y = guess
+                return self._result(x, y, q, 'solved', 0, True, t0)
+        if method == 'interior_point':
+            x, y, status, it = self._interior_point(q, l, u, eps_abs, eps_rel, min(max_iter, 200))
+            polished = False
+            if polish and status == 'solved':
+                refined = self._polish(q, l, u, x, y, np.clip(A @ x, l, u),
+                                       _norm(A @ x - np.clip(A @ x, l, u)), _norm(P @ x + q + A.T @ y))
+                if refined is not None:
+                    x, y = refined
+                    polished = True
+            return self._result(x, y, q, status, it, polished, t0)
+
+        rho = self.rho
+        rho_vec = self._rho_vector(rho, eq)
+        factor = self._factor(rho, eq)
+
+        status = 'max_iter'
+        it = 0
+        for it in range(1, max_iter + 1):
+            y_prev = y
+            x_tilde = factor(self.sigma * x - q + A.T @ (rho_vec * z - y))
+            z_tilde = A @ x_tilde
+            x = self.alpha * x_tilde + (1 - self.alpha) * x
+            z_relaxed = self.alpha * z_tilde + (1 - self.alpha) * z
+            z = np.clip(z_relaxed + y / rho_vec, l, u)
+            y = y + rho_vec * (z_relaxed - z)
+
+            if it % check_every:
+                continue
+            Ax, Px, Aty = A @ x, P @ x, A.T @ y
+            prim_scale = max(_norm(Ax), _norm(z))
+            dual_scale = max(_norm(Px), _norm(Aty), _norm(q))
+            r_prim = _norm(Ax - z)
+            r_dual = _norm(Px + q + Aty)
+            if r_prim <= eps_abs + eps_rel * prim_scale and r_dual <= eps_abs + eps_rel * dual_scale:
+                status = 'solved'
+                break
+            if self._primal_infeasible(y - y_prev, l, u, eps_abs):
+                status = 'primal_infeasible'
+                break
+            if self.adaptive_rho and r_dual > 0 and prim_scale > 0 and dual_scale > 0:
+                ratio = np.sqrt((r_prim / prim_scale) / (r_dual / dual_scale))
+                if ratio > 5 or ratio < 0.2:
+                    rho = float(np.clip(rho * ratio, 1e-6, 1e6))
+                    rho_vec = self._rho_vector(rho, eq)
+                    factor = self._factor(rho, eq)
+
+        polished = False
+        if polish and status == 'solved':
+            # Accept the polished point only if it is at least as accurate as the ADMM iterate
+            refined = self._polish(q, l, u, x, y, z, _norm(A @ x - np.clip(A @ x, l, u)),
+                                   _norm(P @ x + q + A.T @ y))
+            if refined is not None:
+                x, y = refined
+                polished = True
+        return self._result(x, y, q, status, it, polished, t0)
+
+    def _result(self, x, y, q, status, iterations, polished, t0):
+        return {
+            'x': x,
+            'y': y,
+            'objective': 0.5 * x @ self.P @ x + q @ x,
+            'status': status,
+            'iterations': iterations,
+            'polished': polished,
+            'time': time.perf_counter() - t0
+        }
+
+    def _interior_point(self, q, l, u, eps_abs, eps_rel, max_iter, delta=1e-10):
+        """
+        Mehrotra predictor-corrector on l <= Ax <= u with slacks s_l = Ax - l, s_u = u - Ax and the
+        sign convention of the ADMM duals (y = z_u - z_l). Each step solves the quasi-definite system
+        [[P, A^T], [A, -W^-1]] with W = z_l / s_l + z_u / s_u (equality rows: W^-1 = 0); inequality rows
+        with at most two non-zeros (bounds) are folded into the first block as A_f^T W A_f, which keeps
+        the system at about n rows without creating fill-in. The cost is scaled so that P has unit
+        average column norm, which makes the absolute tolerances meaningful for covariance-sized P.
+        Returns (x, y, status, steps).
+        """
+        A = self.A
+        col_norm = np.mean(abs(self.P).max(axis=0).toarray() if self.sparse else np.abs(self.P).max(axis=0))
+        c = float(np.clip(1.0 / max(col_norm, _norm(q)), 1e-4, 1e4)) if max(col_norm, _norm(q)) > 0 else 1.0
+        P, q = c * self.P, c * q
+        l_full, u_full = l, u
+        eq = l == u
+        has_l = np.isfinite(l) & ~eq
+        has_u = np.isfinite(u) & ~eq
+        keep = eq | has_l | has_u
+        A = sp.csr_matrix(A[keep])
+        l, u, eq, has_l, has_u = l[keep], u[keep], eq[keep], has_l[keep], has_u[keep]
+        fold = ~eq & (np.diff(A.indptr) <= 2)
+        A_f, A_k, eq_k = A[fold], A[~fold], eq[~fold]
+        n_compl = has_l.sum() + has_u.sum()
+        P_reg = sp.csc_matrix(P) + delta * sp.identity(self.n)
+        bound_scale = max(_norm(l[np.isfinite(l)]), _norm(u[np.isfinite(u)]), 1.0)
+
+        x = np.zeros(self.n)
+        Ax = A @ x
+        s_l = np.where(has_l, np.maximum(Ax - np.where(has_l, l, 0), 1.0), 1.0)
+        s_u = np.where(has_u, np.maximum(np.where(has_u, u, 0) - Ax, 1.0), 1.0)
+        z_l = has_l.astype(float)
+        z_u = has_u.astype(float)
+        y = z_u - z_l
+        l0, u0, b = np.where(has_l, l, 0), np.where(has_u, u, 0), np.where(eq, l, 0)
+
+        status, it = 'max_iter', 0
+        for it in range(1, max_iter + 1):
+            Ax, Px, Aty = A @ x, P @ x, A.T @ y
+            r_d = Px + q + Aty
+            r_l = np.where(has_l, Ax - s_l - l0, 0.0)
+            r_u = np.where(has_u, Ax + s_u - u0, 0.0)
+            r_eq = np.where(eq, Ax - b, 0.0)
+            mu = (s_l @ z_l + s_u @ z_u) / n_compl if n_compl else 0.0
+            r_prim = max(_norm(r_l), _norm(r_u), _norm(r_eq))
+            # The gap is driven well below the residual tolerance so weakly active bounds are
+            # clearly separated from inactive ones when the active set is polished
+            if (r_prim <= eps_abs + eps_rel * max(_norm(Ax), bound_scale)
+                    and _norm(r_d) <= eps_abs + eps_rel * max(_norm(Px), _norm(Aty), _norm(q))
+                    and s_l @ z_l + s_u @ z_u <= 1e-3 * (eps_abs + eps_rel * abs(0.5 * x @ Px + q @ x))):
+                status = 'solved'
+                break
+            # On an infeasible problem the duals diverge along a Farkas certificate
+            y_full = np.zeros(self.m)
+            y_full[keep] = y
+            if self._primal_infeasible(y_full, l_full, u_full, eps_abs):
+                status = 'primal_infeasible'
+                break
+            if not (np.isfinite(x).all() and np.isfinite(y).all()):
+                break
+
+            W = z_l / s_l + z_u / s_u
+            W_k = np.where(eq_k, 1.0, W[~fold])
+            kkt = sp.bmat([[P_reg + A_f.T @ sp.diags(W[fold]) @ A_f, A_k.T],
+                           [A_k, sp.diags(np.where(eq_k, -delta, -1.0 / W_k))]], format='csc')
+            try:
+                lu = splu(kkt)
+            except RuntimeError:
+                break
+
+            def direction(c_l, c_u):
+                g = c_u / s_u + z_u / s_u * r_u - c_l / s_l + z_l / s_l * r_l
+                sol = lu.solve(np.r_[-r_d - A_f.T @ g[fold], np.where(eq_k, -r_eq[~fold], -g[~fold] / W_k)])
+                dx = sol[:self.n]
+                Adx = A @ dx
+                dy = np.empty(len(W))
+                dy[~fold] = sol[self.n:]
+                dy[fold] = W[fold] * Adx[fold] + g[fold]
+                ds_l = np.where(has_l, Adx + r_l, 0.0)
+                ds_u = np.where(has_u, -r_u - Adx, 0.0)
+                return dx, dy, ds_l, (c_l - z_l * ds_l) / s_l, ds_u, (c_u - z_u * ds_u) / s_u
+
+            # Predictor (affine scaling), then the centred corrector
+            d_aff = direction(-s_l * z_l, -s_u * z_u)
+            alpha = _max_step((s_l, z_l, s_u, z_u), d_aff[2:])
+            mu_aff = (((s_l + alpha * d_aff[2]) @ (z_l + alpha * d_aff[3])
+                       + (s_u + alpha * d_aff[4]) @ (z_u + alpha * d_aff[5])) / n_compl) if n_compl else 0.0
+            sigma = (mu_aff / mu) ** 3 if mu > 0 else 0.0
+            c_l = np.where(has_l, sigma * mu - s_l * z_l - d_aff[2] * d_aff[3], 0.0)
+            c_u = np.where(has_u, sigma * mu - s_u * z_u - d_aff[4] * d_aff[5], 0.0)
+            dx, dy, ds_l, dz_l, ds_u, dz_u = direction(c_l, c_u)
+            alpha = min(1.0, 0.99 * _max_step((s_l, z_l, s_u, z_u), (ds_l, dz_l, ds_u, dz_u)))
+            x, y = x + alpha * dx, y + alpha * dy
+            s_l, z_l = np.where(has_l, s_l + alpha * ds_l, 1.0), np.where(has_l, z_l + alpha * dz_l, 0.0)
+            s_u, z_u = np.where(has_u, s_u + alpha * ds_u, 1.0), np.where(has_u, z_u + alpha * dz_u, 0.0)
+
+        y_full = np.zeros(self.m)
+        y_full[keep] = y / c
+        return x, y_full, status, it
+
+    def _rho_vector(self, rho, eq):
+        # Equality rows get a much larger step so they are enforced quickly
+        return np.where(eq, rho * 1e3, rho)
+
+    def _factor(self, rho, eq):
+        """Cached solve r -> (P + sigma I + A^T R A)^-1 r for one step size."""
+        key = (rho, eq.tobytes())
+        if key not in self._factors:
+            if len(self._factors) > 8:
+                self._factors.clear()
+            rho_vec = self._rho_vector(rho, eq)
+            if self.sparse:
+                # Quasi-definite form: A x = R^-1 nu eliminates to the reduced system above
+                kkt = sp.bmat([[self.P + self.sigma * sp.identity(self.n), self.A.T],
+                               [self.A, sp.diags(-1.0 / rho_vec)]], format='csc')
+                lu = splu(kkt)
+                zeros = np.zeros(self.m)
+                self._factors[key] = lambda r: lu.solve(np.r_[r, zeros])[:self.n]
+            else:
+                kkt = self.P + self.sigma * np.eye(self.n) + self.A.T @ (rho_vec[:, None] * self.A)
+                factor = cho_factor(kkt)
+                self._factors[key] = lambda r: cho_solve(factor, r)
+        return self._factors[key]
+
+    def _primal_infeasible(self, dy, l, u, eps):
+        # Farkas certificate: A^T dy = 0 while u^T max(dy, 0) + l^T min(dy, 0) < 0
+        scale = _norm(dy)
+        if scale <= eps:
+            return False
+        if _norm(self.A.T @ dy) > eps * scale:
+            return False
+        up = np.where(np.isfinite(u), u, 0.0) @ np.maximum(dy, 0)
+        lo = np.where(np.isfinite(l), l, 0.0) @ np.minimum(dy, 0)
+        unbounded = (~np.isfinite(u) & (dy > eps * scale)) | (~np.isfinite(l) & (dy < -eps * scale))
+        return not unbounded.any() and up + lo < -eps * scale
+
+    def _polish(self, q, l, u, x, y, z, max_prim, max_dual, delta=1e-10, refine=5, tol=1e-9):
+        """
+        Direct solve of the equality-constrained QP on the active set guessed from (x, y, z).
+        Returns (x, y) if the result satisfies the KKT conditions within max(max_prim, tol) and
+        max(max_dual, tol), otherwise None.
+        """
+        A, P = self.A, self.P
+        lower = (z - l < -y) | (l == u)
+        upper = (u - z < y) & ~lower
+        active = lower | upper
+        A_act = A[active]
+        b_act = np.where(lower, l, u)[active]
+        k = A_act.shape[0]
+        shift = np.r_[np.full(self.n, delta), np.full(k, -delta)]
+        rhs = np.r_[-q, b_act]
+        try:
+            if self.sparse:
+                kkt = sp.bmat([[P, A_act.T], [A_act, sp.csr_matrix((k, k))]], format='csc')
+                solve = splu((kkt + sp.diags(shift)).tocsc()).solve
+            else:
+                kkt = np.block([[P, A_act.T], [A_act, np.zeros((k, k))]])
+                solve = lambda r, reg=kkt + np.diag(shift): np.linalg.solve(reg, r)
+            sol = solve(rhs)
+            for _ in range(refine):
+                sol += solve(rhs - kkt @ sol)
+        except (np.linalg.LinAlgError, RuntimeError):
+            return None
+        x_pol = sol[:self.n]
+        y_pol = np.zeros(self.m)
+        y_pol[active] = sol[self.n:]
+        Ax = A @ x_pol
+        r_prim = _norm(Ax - np.clip(Ax, l, u))
+        r_dual = _norm(P @ x_pol + q + A.T @ y_pol)
+        signs_ok = (y_pol[lower & ~(l == u)] <= tol).all() and (y_pol[upper] >= -tol).all()
+        if signs_ok and r_prim <= max(max_prim, tol) and r_dual <= max(max_dual, tol):
+            return x_pol, y_pol
+        return None
+
+
+def solve_qp(P, q, A, l, u, **kwargs):
+    """
+    One-shot convenience wrapper around QPSolver.
+    Args:
+        P, q, A, l, u: Problem data (see QPSolver)
+        **kwargs: Options for QPSolver.solve (x0, y0, max_iter, eps_abs, eps_rel, polish)
+    Returns:
+        dict: Solution as returned by QPSolver.solve
+    """
+    return QPSolver(P, A).solve(q, l, u, **kwargs)
+
+
+def _max_step(values, steps):
+    """Largest step in [0, 1/0.99] keeping every value positive (values > 0)."""
+    alpha = 1.0 / 0.99
+    for v, dv in zip(values, steps):
+        neg = dv < 0
+        if neg.any():
+            alpha = min(alpha, np.min(-v[neg] / dv[neg]))
+    return alpha
+
+
+def _norm(v):
+    return np.max(np.abs(v)) if len(v) else 0.0
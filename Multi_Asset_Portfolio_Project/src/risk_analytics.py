@@ -1,69 +1,395 @@
+import json
+import os
+import warnings
+from functools import partial
+
 import numpy as np
 import pandas as pd
 
+from covariance import FactorCovariance
+from frequency import periods_per_year as tagged_periods_per_year
+from monte_carlo import map_chunks
+from scenarios import stress_scenarios
+
 
-def calculate_var(returns, confidence_levels=[0.95, 0.99]):
+def calculate_var(returns, confidence_levels=[0.95, 0.99], weights=None):
     """
     Calculate Value at Risk (VaR) at specified confidence levels using historical simulation.
     Args:
-        returns (pd.Series or pd.DataFrame): Portfolio or asset returns
+        returns (pd.Series or pd.DataFrame): Portfolio returns, or asset returns together with weights
         confidence_levels (list): List of confidence levels (e.g., [0.95, 0.99])
+        weights (dict, pd.Series or np.ndarray): Portfolio weights for asset returns. Deprecated: without
+            weights the asset returns are summed per period as before, with a DeprecationWarning; weights
+            will be required in the next release
     Returns:
         dict: VaR values for each confidence level
     """
-    if isinstance(returns, pd.DataFrame):
+    if isinstance(returns, pd.DataFrame) and weights is None:
+        warnings.warn("calculate_var on a DataFrame without weights sums the asset returns; pass weights "
+                      "(they will be required in the next release)", DeprecationWarning, stacklevel=2)
         returns = returns.sum(axis=1)
-    var_results = {}
-    for cl in confidence_levels:
-        var = -np.percentile(returns.dropna(), 100 * (1 - cl))
-        var_results[f"VaR_{int(cl*100)}"] = var
-    return var_results
+    if isinstance(returns, pd.DataFrame):
+        table = portfolio_var_es(returns, weights, confidence_levels)
+        return {f"VaR_{int(cl*100)}": float(table[f"VaR_{int(cl*100)}"].iloc[0]) for cl in confidence_levels}
+    var = -np.percentile(returns.dropna(), 100 * (1 - np.asarray(confidence_levels, dtype=float)))
+    return {f"VaR_{int(cl*100)}": v for cl, v in zip(confidence_levels, var)}
+
+
+def portfolio_var_es(returns, weights, confidence_levels=[0.95, 0.99], chunk_size=None):
+    """
+    Historical VaR and Expected Shortfall of many portfolios over one returns history.
+    Each chunk of portfolios is priced with one matrix product and all quantiles are taken with a single
+    np.partition pass. VaR matches calculate_var (linearly interpolated quantile); ES is the mean of the
+    observations at or below the lower order statistic of that quantile.
+    Args:
+        returns (pd.DataFrame or np.ndarray): Asset returns (T x N); dates with a missing return are dropped
+        weights (pd.DataFrame, np.ndarray, dict or pd.Series): Weights (P x N), or a single portfolio;
+            labelled weights are aligned to the return columns
+        confidence_levels (list): List of confidence levels (e.g., [0.95, 0.99])
+        chunk_size (int): Portfolios priced at once (default keeps each T x chunk block near 64 MB)
+    Returns:
+        pd.DataFrame: VaR_<cl> and ES_<cl> columns per portfolio (P rows, indexed like a weights DataFrame)
+    """
+    labels = list(returns.columns) if isinstance(returns, pd.DataFrame) else []
+    values = np.asarray(returns, dtype=float)
+    values = values[~np.isnan(values).any(axis=1)]
+    index = weights.index if isinstance(weights, pd.DataFrame) else None
+    if isinstance(weights, pd.DataFrame):
+        W = weights.reindex(columns=labels).fillna(0).values if labels else weights.values
+    else:
+        W = np.atleast_2d(_align_weights(weights, labels))
+    W = np.asarray(W, dtype=float)
+    T, P = len(values), len(W)
+    if T == 0:
+        raise ValueError("No complete return observations")
+
+    h, lo, hi = _order_statistics(T, confidence_levels)
+    kth = np.unique(np.r_[lo, hi])
+    chunk_size = chunk_size or max(1, 2**23 // T)
+
+    var = np.empty((P, len(h)))
+    es = np.empty((P, len(h)))
+    for start in range(0, P, chunk_size):
+        block = values @ W[start:start + chunk_size].T  # T x chunk
+        block = np.partition(block, kth, axis=0)
+        # Partitioning at every kth leaves rows [0, lo] holding exactly the lo + 1 smallest returns
+        tail = np.cumsum(block[:kth.max() + 1], axis=0)
+        var[start:start + chunk_size] = -(block[lo] + (h - lo)[:, None] * (block[hi] - block[lo])).T
+        es[start:start + chunk_size] = -(tail[lo] / (lo + 1)[:, None]).T
+
+    return pd.DataFrame(np.hstack([var, es]), index=index, columns=_var_es_columns(confidence_levels))
+
+
+def _order_statistics(n, confidence_levels):
+    # Position h of each loss quantile among n sorted returns and its bracketing order statistics
+    h = (n - 1) * (1 - np.asarray(confidence_levels, dtype=float))
+    lo = np.floor(h).astype(int)
+    return h, lo, np.minimum(lo + 1, n - 1)
+
+
+def _var_es_columns(confidence_levels):
+    return [f"VaR_{int(cl*100)}" for cl in confidence_levels] + [f"ES_{int(cl*100)}" for cl in confidence_levels]
+
+
+def rolling_var_es(returns, windows=12, confidence_levels=[0.95, 0.99], weights=None):
+    """
+    Historical VaR and Expected Shortfall over sliding windows, for many portfolios and window lengths at once.
+    The history is cut into blocks of w periods, so every window of length w lies inside two adjacent blocks.
+    Each portfolio keeps its window in Fenwick trees of counts and sums indexed by the return's rank within
+    those 2w periods: each step inserts one return, drops one and reads the order statistics and tail sums
+    in O(log w), and the trees (P x 2w per window length) are rebuilt in O(w) once every w steps. All
+    portfolios advance together in vectorized steps. Values match calculate_var / portfolio_var_es on each window.
+    Args:
+        returns (pd.Series or pd.DataFrame): Portfolio returns (one column per portfolio), or asset returns
+            when weights are given; dates with a missing return are dropped
+        windows (int or list): Window length(s) in periods
+        confidence_levels (list): List of confidence levels (e.g., [0.95, 0.99])
+        weights (pd.DataFrame, np.ndarray, dict or pd.Series): Optional P x N weights applied to asset returns
+    Returns:
+        pd.DataFrame: Dates x (window, portfolio, VaR_<cl>/ES_<cl>) columns, NaN until a window is full
+    """
+    frame = returns.to_frame() if isinstance(returns, pd.Series) else returns
+    if weights is None:
+        values, names = frame.values.astype(float), list(frame.columns)
+    elif isinstance(weights, pd.DataFrame):
+        values, names = frame.values @ weights.reindex(columns=frame.columns).fillna(0).values.T, list(weights.index)
+    else:
+        W = np.atleast_2d(_align_weights(weights, list(frame.columns)))
+        values, names = frame.values @ W.T, list(range(len(W)))
+    complete = ~np.isnan(values).any(axis=1)
+    values, dates = values[complete], frame.index[complete]
+    windows = [windows] if np.isscalar(windows) else list(windows)
+    T, P = values.shape
+    L = len(confidence_levels)
+    every = np.arange(P)
+
+    out = np.full((T, len(windows), P, 2 * L), np.nan)
+    for i, w in enumerate(windows):
+        h, lo, hi = _order_statistics(w, confidence_levels)
+        k = np.tile(np.r_[lo, hi] + 1, (P, 1))
+        block = None
+        for t in range(w - 1, T):
+            start = t - w + 1
+            if start // w != block:
+                # Window entered the next pair of blocks: rank their returns and rebuild from the window
+                block = start // w
+                first = block * w
+                segment = values[first:first + 2 * w]
+                order = np.argsort(segment, axis=0, kind='stable')
+                ranks = np.empty_like(order)
+                np.put_along_axis(ranks, order, np.arange(1, len(segment) + 1)[:, None], axis=0)
+                ordered = np.take_along_axis(segment, order, axis=0)
+                counts, sums = _fenwick_build(ranks[start - first:t - first + 1], segment[start - first:t - first + 1],
+                                              len(segment))
+            else:
+                _fenwick_add(counts, sums, every, ranks[t - first], values[t], 1)
+                _fenwick_add(counts, sums, every, ranks[t - w - first], values[t - w], -1)
+            rank, below = _fenwick_select(counts, sums, every, k)
+            at = ordered[rank - 1, every[:, None]]
+            low, high = at[:, :L], at[:, L:]
+            out[t, i, :, :L] = -(low + (h - lo) * (high - low))
+            out[t, i, :, L:] = -(below[:, :L] + low) / (lo + 1)
+
+    columns = pd.MultiIndex.from_tuples(
+        [(w, name, metric) for w in windows for name in names for metric in _var_es_columns(confidence_levels)],
+        names=['window', 'portfolio', 'metric']
+    )
+    return pd.DataFrame(out.reshape(T, -1), index=dates, columns=columns)
+
+
+def _fenwick_build(ranks, values, n):
+    # Trees over positions 1..n holding one entry per row of ranks (periods x portfolios); node i covers
+    # positions (i - lowbit(i), i], read off prefix sums in one pass
+    P = ranks.shape[1]
+    cols = np.broadcast_to(np.arange(P), ranks.shape)
+    counts = np.zeros((P, n + 1), dtype=np.int32)
+    sums = np.zeros((P, n + 1))
+    counts[cols, ranks] = 1
+    sums[cols, ranks] = values
+    node = np.arange(1, n + 1)
+    for tree in (counts, sums):
+        prefix = np.cumsum(tree, axis=1)
+        tree[:, 1:] = prefix[:, node] - prefix[:, node - (node & -node)]
+    return counts, sums
+
+
+def _fenwick_add(counts, sums, rows, index, values, sign):
+    # Point update of one position per row; rows are distinct, so fancy-index += is safe
+    n = counts.shape[1] - 1
+    while len(rows):
+        counts[rows, index] += sign
+        sums[rows, index] += sign * values
+        index = index + (index & -index)
+        inside = index <= n
+        rows, index, values = rows[inside], index[inside], values[inside]
+
+
+def _fenwick_select(counts, sums, rows, k):
+    # k-th smallest by binary lifting: returns its 1-based rank and the sum of the k - 1 smaller values
+    n = counts.shape[1] - 1
+    rows = rows[:, None]
+    pos = np.zeros(k.shape, dtype=int)
+    below = np.zeros(k.shape)
+    step = 1 << (n.bit_length() - 1)
+    while step:
+        nxt = np.minimum(pos + step, n)
+        c = counts[rows, nxt]
+        go = (pos + step <= n) & (c < k)
+        pos = np.where(go, nxt, pos)
+        k = k - np.where(go, c, 0)
+        below = below + np.where(go, sums[rows, nxt], 0)
+        step >>= 1
+    return pos + 1, below
+
+
+def parametric_var(weights, cov_matrix, confidence_levels=[0.95, 0.99], expected_returns=None, periods_per_year=12,
+                   method='gaussian', returns=None):
+    """
+    Parametric Value at Risk and Expected Shortfall over one period from an annualized covariance.
+    'gaussian' is the variance-covariance method; 'cornish_fisher' adjusts the normal quantile for the
+    skewness and excess kurtosis of the portfolio's historical returns (ES integrates the adjusted quantile
+    over the tail).
+    Args:
+        weights (dict, pd.Series or np.ndarray): Portfolio weights; dict/Series are aligned to the
+            covariance labels
+        cov_matrix (pd.DataFrame, CovarianceEstimator or FactorCovariance): Annualized covariance; a factor
+            model keeps the cost at O(NK)
+        confidence_levels (list): List of confidence levels (e.g., [0.95, 0.99])
+        expected_returns (pd.Series or np.ndarray): Annualized expected returns (zero mean if None)
+        periods_per_year (int): The VaR horizon is one period at this frequency
+        method (str): 'gaussian' or 'cornish_fisher'
+        returns (pd.DataFrame): Asset returns used for the higher moments (required for 'cornish_fisher')
+    Returns:
+        dict: VaR_<cl> and ES_<cl> values for each confidence level
+    """
+    from scipy.stats import norm
+    if method not in ('gaussian', 'cornish_fisher'):
+        raise ValueError(f"Unknown parametric VaR method '{method}', expected 'gaussian' or 'cornish_fisher'")
+    if hasattr(cov_matrix, 'covariance'):
+        cov_matrix = cov_matrix.covariance()
+    labels = _labels(cov_matrix)
+    w = _align_weights(weights, labels)
+    variance = w @ (cov_matrix @ w)
+    sigma = np.sqrt(np.asarray(variance, dtype=float) / periods_per_year)
+    mean = 0.0 if expected_returns is None else w @ _align_weights(expected_returns, labels) / periods_per_year
+
+    levels = np.asarray(confidence_levels, dtype=float)
+    if method == 'gaussian':
+        z = norm.ppf(1 - levels)
+        var = -(mean + sigma * z)
+        es = -mean + sigma * norm.pdf(z) / (1 - levels)
+    else:
+        if returns is None:
+            raise ValueError("Cornish-Fisher VaR needs the asset returns for skewness and kurtosis")
+        port = (returns.reindex(columns=labels) if labels else returns).dot(w).dropna()
+        skew, kurt = port.skew(), port.kurt()
+        var = -(mean + sigma * _cornish_fisher(norm.ppf(1 - levels), skew, kurt))
+        # ES: average of the adjusted quantile over the tail probabilities (midpoint rule)
+        grid = (np.arange(256) + 0.5) / 256
+        tails = norm.ppf(np.outer(1 - levels, grid))
+        es = -(mean + sigma * _cornish_fisher(tails, skew, kurt).mean(axis=1))
+    return dict(zip(_var_es_columns(confidence_levels), np.r_[var, es].astype(float).tolist()))
+
+
+def _cornish_fisher(z, skew, kurt):
+    return (z + (z ** 2 - 1) * skew / 6 + (z ** 3 - 3 * z) * kurt / 24
+            - (2 * z ** 3 - 5 * z) * skew ** 2 / 36)
 
 
-def stress_test_portfolio(returns, scenarios=None):
+def monte_carlo_var(weights, cov_matrix, confidence_levels=[0.95, 0.99], expected_returns=None, periods_per_year=12,
+                    n_scenarios=1000000, chunk_size=None, seed=None, n_jobs=1, dist='normal', df=5):
     """
-    Perform scenario analysis for specified stress events.
+    Monte Carlo Value at Risk and Expected Shortfall over one period from correlated simulated returns.
+    Scenarios are drawn chunk by chunk through a Cholesky factor of the covariance (the estimator's cached
+    factor, or factor/specific draws for a FactorCovariance) and only each chunk's worst outcomes are kept.
+    These tail buffers merge exactly, so chunks can run in worker processes (see monte_carlo.map_chunks)
+    and memory is bounded by the tail (1 - min(confidence_levels)) of n_scenarios per portfolio.
+    VaR and ES follow the portfolio_var_es definitions on the simulated sample.
     Args:
-        returns (pd.DataFrame): Asset or portfolio returns (monthly)
+        weights (dict, pd.Series, np.ndarray or pd.DataFrame): One portfolio, or P x N weights
+        cov_matrix (pd.DataFrame, CovarianceEstimator or FactorCovariance): Annualized covariance
+        confidence_levels (list): List of confidence levels (e.g., [0.95, 0.99])
+        expected_returns (pd.Series or np.ndarray): Annualized expected returns (zero mean if None)
+        periods_per_year (int): The VaR horizon is one period at this frequency
+        n_scenarios (int): Number of simulated scenarios
+        chunk_size (int): Scenarios per chunk (default keeps each chunk's draws near 32 MB)
+        seed (int): Seed; results do not depend on n_jobs
+        n_jobs (int): Worker processes (1 runs in-process, None uses all cores)
+        dist (str): 'normal' or 't' (unit-variance Student-t shocks, as in simulate_paths)
+        df (float): Degrees of freedom for dist='t'
+    Returns:
+        dict or pd.DataFrame: VaR_<cl> and ES_<cl> for one portfolio, or one row per portfolio for P x N weights
+    """
+    labels = _labels(cov_matrix)
+    index = weights.index if isinstance(weights, pd.DataFrame) else None
+    if isinstance(weights, pd.DataFrame):
+        W = weights.reindex(columns=labels).fillna(0).values if labels else weights.values
+    else:
+        W = _align_weights(weights, labels)
+    W = np.atleast_2d(np.asarray(W, dtype=float))
+    mu = np.zeros(len(W)) if expected_returns is None else W @ _align_weights(expected_returns, labels)
+
+    # Portfolio returns are mu + z @ G^T W^T with z ~ iid unit shocks, so only G^T W^T (m x P) is needed
+    if isinstance(cov_matrix, FactorCovariance):
+        chol = np.linalg.cholesky(cov_matrix.factor_cov + 1e-12 * np.eye(len(cov_matrix.factors)))
+        exposure = np.vstack([chol.T @ (cov_matrix.loadings.T @ W.T), np.sqrt(cov_matrix.specific_var)[:, None] * W.T])
+    else:
+        if hasattr(cov_matrix, 'cholesky'):
+            chol = cov_matrix.cholesky()
+        else:
+            cov = np.asarray(cov_matrix, dtype=float)
+            chol = np.linalg.cholesky(cov + 1e-12 * np.eye(len(cov)))
+        exposure = chol.T @ W.T
+    exposure = exposure / np.sqrt(periods_per_year)
+    mu = mu / periods_per_year
+
+    if dist not in ('normal', 't'):
+        raise ValueError(f"Unknown distribution '{dist}', expected 'normal' or 't'")
+    if dist == 't' and df <= 2:
+        raise ValueError("Student-t degrees of freedom must be > 2 for a finite variance")
+    h, lo, hi = _order_statistics(n_scenarios, confidence_levels)
+    keep = int(hi.max()) + 1
+    chunk_size = chunk_size or max(1000, 2**22 // len(exposure))
+    tail = map_chunks(_simulate_tail, n_scenarios, chunk_size, seed=seed, n_jobs=n_jobs,
+                      args=(mu, exposure, dist, df, keep), reduce=partial(_merge_tails, keep=keep))
+    tail = np.sort(tail, axis=0)
+
+    var = -(tail[lo] + (h - lo)[:, None] * (tail[hi] - tail[lo])).T
+    es = -(np.cumsum(tail, axis=0)[lo] / (lo + 1)[:, None]).T
+    table = pd.DataFrame(np.hstack([var, es]), index=index, columns=_var_es_columns(confidence_levels))
+    if index is None and len(W) == 1:
+        return {k: float(v) for k, v in table.iloc[0].items()}
+    return table
+
+
+def _simulate_tail(rng, size, mu, exposure, dist, df, keep):
+    """Worst `keep` simulated returns per portfolio in one chunk (top-level so it runs in a worker)."""
+    if dist == 't':
+        z = rng.standard_t(df, (size, len(exposure))) * np.sqrt((df - 2) / df)
+    else:
+        z = rng.standard_normal((size, len(exposure)))
+    return _smallest(mu + z @ exposure, keep)
+
+
+def _merge_tails(acc, tail, keep):
+    return tail if acc is None else _smallest(np.vstack([acc, tail]), keep)
+
+
+def _smallest(values, keep):
+    if len(values) <= keep:
+        return values
+    return np.partition(values, keep - 1, axis=0)[:keep]
+
+
+def _labels(cov_matrix):
+    return list(getattr(cov_matrix, 'assets', getattr(cov_matrix, 'index', [])))
+
+
+def _align_weights(weights, labels):
+    if isinstance(weights, dict):
+        weights = pd.Series(weights)
+    if isinstance(weights, pd.Series) and labels:
+        weights = weights.reindex(labels).fillna(0)
+    return np.asarray(weights, dtype=float)
+
+
+def stress_test_portfolio(returns, scenarios=None, periods_per_year=None, weights=None):
+    """
+    Perform scenario analysis for specified stress events on a buy-and-hold portfolio.
+    Args:
+        returns (pd.DataFrame): Asset returns (monthly)
         scenarios (dict): Dict of scenario_name: (start_date, end_date)
+        periods_per_year (int): Annualization factor (defaults to the one tagged on returns, else 12)
+        weights (dict, pd.Series or np.ndarray): Portfolio weights (equal weight if None)
     Returns:
-        dict: Scenario results (drawdown, return, volatility)
+        dict: Scenario results (drawdown, return, volatility; worst period and its return for Custom_Worst)
     """
+    ppy = periods_per_year or tagged_periods_per_year(returns)
     if scenarios is None:
         scenarios = {
             '2008_Crisis': ('2007-10-01', '2009-03-01'),
             'COVID_Crash': ('2020-02-01', '2020-04-01'),
-            'Rate_Shock': None,  # Custom: -2% to all bonds in one month
+            'Rate_Shock': None,  # Custom: -2% to all bonds in the last month
             'Custom_Worst': None
         }
+    if weights is None:
+        weights = np.full(returns.shape[1], 1.0 / returns.shape[1])
+    w = _align_weights(weights, list(returns.columns))
+    scenario_set = stress_scenarios(returns, scenarios)
+    outcome = scenario_set.evaluate(w, ppy)
+
     results = {}
-    for name, period in scenarios.items():
-        if period:
-            start, end = period
-            mask = (returns.index >= start) & (returns.index <= end)
-            sub = returns.loc[mask]
-            port_ret = sub.sum(axis=1) if isinstance(sub, pd.DataFrame) else sub
-            drawdown = (port_ret.cummin() - port_ret.cummax()).min()
+    for name in scenarios:
+        if name in scenario_set.names:
+            k = scenario_set.names.index(name)
             results[name] = {
-                'total_return': port_ret.sum(),
-                'volatility': port_ret.std() * np.sqrt(12),
-                'max_drawdown': drawdown
-            }
-        elif name == 'Rate_Shock':
-            # Apply -2% shock to bond assets
-            shock = returns.copy()
-            for col in shock.columns:
-                if col in ['AGG', 'TIP', 'HYG']:
-                    shock.iloc[-1][col] -= 0.02
-            port_ret = shock.sum(axis=1)
-            results[name] = {
-                'total_return': port_ret.sum(),
-                'volatility': port_ret.std() * np.sqrt(12),
-                'max_drawdown': (port_ret.cummin() - port_ret.cummax()).min()
+                'total_return': outcome['total_return'][k, 0],
+                'volatility': outcome['volatility'][k, 0],
+                'max_drawdown': outcome['max_drawdown'][k, 0]
             }
         elif name == 'Custom_Worst':
             # Worst single month in history
-            port_ret = returns.sum(axis=1)
+            port_ret = returns.fillna(0).dot(w)
             min_month = port_ret.idxmin()
             results[name] = {
                 'worst_month': min_month,
@@ -76,33 +402,256 @@ def factor_analysis(returns, factors):
     """
     Calculate exposures to major risk factors using linear regression.
     Args:
-        returns (pd.DataFrame): Asset or portfolio returns
+        returns (pd.Series or pd.DataFrame): Portfolio returns, or asset returns (one regression per column)
         factors (pd.DataFrame): Factor returns (same index)
     Returns:
-        pd.Series: Factor loadings (betas)
+        pd.Series or pd.DataFrame: Factor loadings (betas); assets x factors for DataFrame returns
     """
     from sklearn.linear_model import LinearRegression
     X = factors.values
     y = returns.values
     reg = LinearRegression().fit(X, y)
+    if isinstance(returns, pd.DataFrame):
+        return pd.DataFrame(reg.coef_, index=returns.columns, columns=factors.columns)
     return pd.Series(reg.coef_, index=factors.columns)
 
 
-def dynamic_correlation(returns, window=12):
+def dynamic_correlation(returns, window=12, method='rolling', decay=0.94, upper=False):
     """
-    Calculate rolling correlation matrices for the given window size (months).
+    Rolling (or EWMA) correlation matrices for every date, as one array.
+    Window sums of returns and cross-products are differences of cumulative sums, so the cost is O(T N^2)
+    whatever the window length. Rolling windows use pairwise-complete observations like DataFrame.corr();
+    'ewma' is the zero-mean RiskMetrics estimate (as CovarianceEstimator 'ewma'), where missing returns
+    contribute nothing.
     Args:
         returns (pd.DataFrame): Asset returns
-        window (int): Rolling window size in months
+        window (int): Rolling window size in periods (for 'ewma', the periods before the first estimate)
+        method (str): 'rolling' or 'ewma'
+        decay (float): EWMA decay lambda
+        upper (bool): Keep only the strictly upper triangle (N(N-1)/2 pairs per date) instead of N x N
     Returns:
-        dict: {end_date: correlation matrix}
+        dict: {'dates': end date of each estimate, 'columns': asset names,
+               'corr': np.ndarray (dates x N x N, or dates x pairs if upper),
+               'pairs': [(asset_i, asset_j)] in 'corr' column order (only if upper)}
     """
-    corrs = {}
-    for i in range(window, len(returns)+1):
-        end = returns.index[i-1]
-        sub = returns.iloc[i-window:i]
-        corrs[end] = sub.corr()
-    return corrs
+    if method not in ('rolling', 'ewma'):
+        raise ValueError(f"Unknown correlation method '{method}', expected 'rolling' or 'ewma'")
+    x = returns.values.astype(float)
+    n_assets = x.shape[1]
+    valid = ~np.isnan(x)
+    i, j = np.triu_indices(n_assets)
+    diag = np.flatnonzero(i == j)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if method == 'ewma':
+            from scipy.signal import lfilter
+            x = np.where(valid, x, 0.0)
+            # The normalizing weight sum cancels in the correlation, so decayed sums are enough
+            cross = lfilter([1.0], [1.0, -decay], x[:, i] * x[:, j], axis=0)[window - 1:]
+            var_i, var_j = cross[:, diag][:, i], cross[:, diag][:, j]
+        else:
+            # Correlation is shift-invariant: centering first keeps the cumulative sums well conditioned
+            x = np.where(valid, x - np.nanmean(x, axis=0), 0.0)
+            if valid.all():
+                count = window
+                sums = _window_sums(x, window)
+                sum_i, sum_j = sums[:, i], sums[:, j]
+                cross = _window_sums(x[:, i] * x[:, j], window)
+                sq_i, sq_j = cross[:, diag][:, i], cross[:, diag][:, j]
+            else:
+                m = valid.astype(float)
+                count = _window_sums(m[:, i] * m[:, j], window)
+                sum_i = _window_sums(x[:, i] * m[:, j], window)
+                sum_j = _window_sums(x[:, j] * m[:, i], window)
+                sq_i = _window_sums(x[:, i] ** 2 * m[:, j], window)
+                sq_j = _window_sums(x[:, j] ** 2 * m[:, i], window)
+                cross = _window_sums(x[:, i] * x[:, j], window)
+            cross = cross - sum_i * sum_j / count
+            var_i, var_j = sq_i - sum_i ** 2 / count, sq_j - sum_j ** 2 / count
+            cross = np.where(np.asarray(count) >= 2, cross, np.nan)
+        corr = np.clip(cross / np.sqrt(var_i * var_j), -1.0, 1.0)
+    corr[:, diag] = np.where(np.isnan(corr[:, diag]), np.nan, 1.0)
+
+    result = {'dates': returns.index[window - 1:], 'columns': list(returns.columns)}
+    if upper:
+        off = i != j
+        result['corr'] = corr[:, off]
+        result['pairs'] = [(returns.columns[a], returns.columns[b]) for a, b in zip(i[off], j[off])]
+    else:
+        full = np.empty((len(corr), n_assets, n_assets))
+        full[:, i, j] = corr
+        full[:, j, i] = corr
+        result['corr'] = full
+    return result
+
+
+def _window_sums(values, window):
+    # Trailing window sums of each column for every full window, from one cumulative sum
+    cumulative = np.zeros((len(values) + 1,) + values.shape[1:])
+    np.cumsum(values, axis=0, out=cumulative[1:])
+    return cumulative[window:] - cumulative[:-window]
+
+class CorrelationMonitor:
+    """
+    Streaming correlation estimate that updates on every new bar and flags diversification breakdowns.
+
+    'ewma' is the zero-mean RiskMetrics correlation (the last row of dynamic_correlation(method='ewma')).
+    'dcc' standardizes each return by its EWMA volatility and runs the DCC recursion
+    Q = (1 - a - b) Qbar + a e e' + b Q, with Qbar the running mean of e e'. Only O(N^2) state is kept, so a
+    long-running process can checkpoint it as JSON. Each step returns a compact summary: average pairwise
+    correlation, the top eigenvalue's share of N (by power iteration warm-started from the previous
+    eigenvector) and an alert when the average correlation rises more than alert_threshold above its
+    slow-moving baseline.
+    """
+
+    def __init__(self, assets, method='dcc', decay=0.94, dcc_a=0.05, dcc_b=0.93, baseline_decay=0.97,
+                 alert_threshold=0.2, warmup=12):
+        """
+        Args:
+            assets (list): Asset names
+            method (str): 'dcc' or 'ewma'
+            decay (float): EWMA decay lambda (volatilities for 'dcc', cross-products for 'ewma')
+            dcc_a, dcc_b (float): DCC news and persistence parameters (a + b < 1)
+            baseline_decay (float): Decay of the average-correlation baseline the alert compares against
+            alert_threshold (float): Rise of average correlation above the baseline that raises an alert
+            warmup (int): Updates before alerts are raised
+        """
+        if method not in ('dcc', 'ewma'):
+            raise ValueError(f"Unknown correlation method '{method}', expected 'dcc' or 'ewma'")
+        if dcc_a < 0 or dcc_b < 0 or dcc_a + dcc_b >= 1:
+            raise ValueError("DCC parameters need a, b >= 0 and a + b < 1")
+        self.assets = list(assets)
+        self.method = method
+        self.decay = decay
+        self.dcc_a = dcc_a
+        self.dcc_b = dcc_b
+        self.baseline_decay = baseline_decay
+        self.alert_threshold = alert_threshold
+        self.warmup = warmup
+        n = len(self.assets)
+        self.count = 0
+        self.variance = np.full(n, np.nan)
+        self.q = np.eye(n)
+        self.q_bar = np.zeros((n, n))
+        self.n_shocks = 0
+        self.eigenvector = np.full(n, 1 / np.sqrt(n))
+        self.baseline = np.nan
+        self.last_index = None
+
+    def update(self, row, index=None):
+        """
+        Fold in one period of returns (missing returns contribute nothing).
+        Args:
+            row (array-like or pd.Series): Returns for every asset, in self.assets order
+            index: Label of the period (e.g. date)
+        Returns:
+            dict: Summary of the updated estimate (see summary())
+        """
+        x = np.asarray(row.reindex(self.assets) if isinstance(row, pd.Series) else row, dtype=float)
+        valid = ~np.isnan(x)
+        x = np.where(valid, x, 0.0)
+        if self.method == 'ewma':
+            self.q = self.decay * self.q if self.count else np.zeros_like(self.q)
+            self.q += np.outer(x, x)
+        else:
+            seen = valid & ~np.isnan(self.variance)
+            if seen.any():
+                # Shock standardized by the volatility forecast made before this bar
+                shock = np.where(seen, x / np.sqrt(np.where(seen, self.variance, 1.0)), 0.0)
+                outer = np.outer(shock, shock)
+                self.n_shocks += 1
+                self.q_bar += (outer - self.q_bar) / self.n_shocks
+                self.q = (1 - self.dcc_a - self.dcc_b) * self.q_bar + self.dcc_a * outer + self.dcc_b * self.q
+            first = valid & np.isnan(self.variance)
+            self.variance[first] = np.maximum(x[first] ** 2, 1e-12)
+            update = valid & ~first
+            self.variance[update] = self.decay * self.variance[update] + (1 - self.decay) * x[update] ** 2
+        self.count += 1
+        self.last_index = index.strftime('%Y-%m-%d') if hasattr(index, 'strftime') else index
+
+        summary = self.summary()
+        summary['alert'] = bool(self.count > self.warmup and summary['avg_corr'] - self.baseline > self.alert_threshold)
+        summary['baseline'] = self.baseline
+        if not np.isnan(summary['avg_corr']):
+            self.baseline = (summary['avg_corr'] if np.isnan(self.baseline) else
+                             self.baseline_decay * self.baseline + (1 - self.baseline_decay) * summary['avg_corr'])
+        return summary
+
+    def update_many(self, returns):
+        """
+        Fold in the rows of a returns DataFrame that come after last_index.
+        Args:
+            returns (pd.DataFrame): Returns (periods x assets), sorted by index
+        Returns:
+            pd.DataFrame: One summary row per new period (avg_corr, top_eigen_share, alert, baseline)
+        """
+        new = returns.reindex(columns=self.assets)
+        if self.last_index is not None:
+            new = new.loc[new.index > pd.Timestamp(self.last_index)]
+        rows = [self.update(row, idx) for idx, row in zip(new.index, new.values)]
+        return pd.DataFrame(rows, index=new.index, columns=['avg_corr', 'top_eigen_share', 'alert', 'baseline'])
+
+    def correlation(self):
+        """Current N x N correlation estimate as a DataFrame."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vol = np.sqrt(np.diag(self.q))
+            corr = np.clip(self.q / np.outer(vol, vol), -1.0, 1.0)
+        np.fill_diagonal(corr, np.where(vol > 0, 1.0, np.nan))
+        return pd.DataFrame(corr, index=self.assets, columns=self.assets)
+
+    def summary(self, max_iter=50, tol=1e-10):
+        """
+        Average pairwise correlation and the share of the top eigenvalue in the current estimate.
+        Returns:
+            dict: {'avg_corr': float, 'top_eigen_share': float}
+        """
+        corr = np.nan_to_num(self.correlation().values)
+        n = len(corr)
+        if n < 2 or not np.diag(corr).any():
+            return {'avg_corr': np.nan, 'top_eigen_share': np.nan}
+        v = self.eigenvector
+        for _ in range(max_iter):
+            w = corr @ v
+            w /= np.linalg.norm(w)
+            done = np.abs(w - v).max() < tol
+            v = w
+            if done:
+                break
+        self.eigenvector = v
+        off = corr.sum() - np.trace(corr)
+        return {'avg_corr': float(off / (n * (n - 1))), 'top_eigen_share': float(v @ corr @ v / n)}
+
+    def to_dict(self):
+        params = ('assets', 'method', 'decay', 'dcc_a', 'dcc_b', 'baseline_decay', 'alert_threshold', 'warmup',
+                  'count', 'n_shocks', 'last_index')
+        state = {key: getattr(self, key) for key in params}
+        for key in ('variance', 'q', 'q_bar', 'eigenvector'):
+            state[key] = np.where(np.isnan(getattr(self, key)), None, getattr(self, key)).tolist()
+        state['baseline'] = None if np.isnan(self.baseline) else self.baseline
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        monitor = cls(state['assets'], state['method'], state['decay'], state['dcc_a'], state['dcc_b'],
+                      state['baseline_decay'], state['alert_threshold'], state['warmup'])
+        for key in ('count', 'n_shocks', 'last_index'):
+            setattr(monitor, key, state[key])
+        for key in ('variance', 'q', 'q_bar', 'eigenvector'):
+            setattr(monitor, key, np.array(state[key], dtype=float))
+        monitor.baseline = np.nan if state['baseline'] is None else state['baseline']
+        return monitor
+
+    def save(self, path):
+        """Write the state to a JSON file (atomically)."""
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
 
 # Example test (to be removed in production)
 if __name__ == "__main__":
@@ -110,9 +659,9 @@ if __name__ == "__main__":
     idx = pd.date_range('2018-01-31', periods=60, freq='M')
     np.random.seed(42)
     rets = pd.DataFrame(np.random.normal(0.01, 0.04, (60, 5)), index=idx, columns=[f'A{i}' for i in range(5)])
-    print("VaR:", calculate_var(rets))
+    print("VaR:", calculate_var(rets, weights=np.full(5, 0.2)))
     print("Stress Test:", stress_test_portfolio(rets))
     # Simulate factors
     factors = pd.DataFrame(np.random.normal(0, 0.03, (60, 3)), index=idx, columns=['MKT', 'RFR', 'TERM'])
     print("Factor Analysis:", factor_analysis(rets.iloc[:,0], factors))
-    print("Dynamic Correlation (last):", list(dynamic_correlation(rets, 12).values())[-1]) 
\ No newline at end of file
+    print("Dynamic Correlation (last):", dynamic_correlation(rets, 12)['corr'][-1]) 
\ No newline at end of file
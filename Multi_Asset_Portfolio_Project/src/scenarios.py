@@ -0,0 +1,276 @@
+import numpy as np
+import pandas as pd
+
+# Results of ScenarioSet.evaluate, in the order of the last axis of 'values'
+SCENARIO_METRICS = ['total_return', 'max_drawdown', 'volatility', 'worst_period']
+
+
+class ScenarioSet:
+    """
+    Stress scenarios stored as one (scenarios x horizon x assets) tensor of period returns.
+
+    Every scenario is a return path built as base * multiplier + shock: a historical window replayed as-is,
+    scaled (multiplicative shock, e.g. a crisis at 1.5x severity) or shifted (additive shock, e.g. -2% on
+    bonds). Paths shorter than the longest one are zero-padded, which leaves buy-and-hold wealth unchanged,
+    so all scenarios are evaluated against all portfolios together in a few batched array operations.
+    """
+
+    def __init__(self, assets):
+        """
+        Args:
+            assets (list): Asset names, fixing the last axis of the tensor
+        """
+        self.assets = list(assets)
+        self.names = []
+        self._paths = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, base=None, multiplier=1.0, shock=0.0, periods=None):
+        """
+        Add one scenario path base * multiplier + shock.
+        Args:
+            name (str): Scenario name
+            base (pd.DataFrame or np.ndarray): Period returns (periods x assets); zeros if None
+            multiplier (float, dict, pd.Series or np.ndarray): Scale per asset (or per period and asset)
+            shock (float, dict, pd.Series or np.ndarray): Return added per asset (or per period and asset)
+            periods (int): Path length when base is None (default 1)
+        """
+        if base is None:
+            base = np.zeros((periods or 1, len(self.assets)))
+        elif isinstance(base, pd.DataFrame):
+            base = base.reindex(columns=self.assets).values
+        path = np.nan_to_num(np.asarray(base, dtype=float)) * self._per_asset(multiplier) + self._per_asset(shock)
+        self.names.append(name)
+        self._paths.append(path)
+
+    def add_historical(self, name, returns, start, end, multiplier=1.0, shock=0.0):
+        """
+        Replay the returns of [start, end] (missing returns count as zero), optionally scaled or shifted.
+        Args:
+            name (str): Scenario name
+            returns (pd.DataFrame): Asset returns (dates x assets)
+            start, end (str or Timestamp): Window, both ends inclusive
+            multiplier, shock: As in add()
+        """
+        mask = (returns.index >= pd.Timestamp(start)) & (returns.index <= pd.Timestamp(end))
+        self.add(name, returns.loc[mask], multiplier, shock)
+
+    def add_rolling_windows(self, returns, length, step=1, prefix='window'):
+        """
+        Add every historical window of `length` periods, stepping by `step`, named '<prefix>_<end date>'.
+        Args:
+            returns (pd.DataFrame): Asset returns (dates x assets)
+            length (int): Periods per window
+            step (int): Periods between window ends
+            prefix (str): Scenario name prefix
+        """
+        values = returns.reindex(columns=self.assets).values
+        for end in range(length, len(returns) + 1, step):
+            label = returns.index[end - 1]
+            label = label.strftime('%Y-%m-%d') if hasattr(label, 'strftime') else label
+            self.add(f'{prefix}_{label}', values[end - length:end])
+
+    def tensor(self):
+        """
+        Returns:
+            tuple: (np.ndarray scenarios x horizon x assets of zero-padded returns, np.ndarray path lengths)
+        """
+        lengths = np.array([len(p) for p in self._paths], dtype=int)
+        horizon = max(lengths.max(initial=0), 1)
+        paths = np.zeros((len(self._paths), horizon, len(self.assets)))
+        for s, path in enumerate(self._paths):
+            paths[s, :len(path)] = path
+        return paths, lengths
+
+    def evaluate(self, weights, periods_per_year=12):
+        """
+        Buy-and-hold outcome of every portfolio under every scenario.
+        Args:
+            weights (pd.DataFrame, np.ndarray, dict or pd.Series): P x N weights, or a single portfolio;
+                labelled weights are aligned to self.assets
+            periods_per_year (int): Annualization factor for the volatility
+        Returns:
+            dict: {'scenarios': names, 'portfolios': labels, 'metrics': SCENARIO_METRICS,
+                   'values': np.ndarray scenarios x portfolios x metrics, plus one scenarios x portfolios
+                   array per metric}; scenarios without any period are NaN
+        """
+        names = list(weights.index) if isinstance(weights, pd.DataFrame) else None
+        W = np.atleast_2d(_weight_matrix(weights, self.assets))
+        paths, lengths = self.tensor()
+        S, H, _ = paths.shape
+
+        # Asset growth per period, then portfolio wealth for all scenarios and portfolios in one contraction
+        wealth = np.einsum('shn,pn->shp', np.cumprod(1 + paths, axis=1), W)
+        wealth = np.concatenate([np.broadcast_to(W.sum(axis=1), (S, 1, len(W))), wealth], axis=1)
+        period = wealth[:, 1:] / wealth[:, :-1] - 1
+        live = (np.arange(H)[None, :] < lengths[:, None])[:, :, None]
+
+        values = np.empty((S, len(W), len(SCENARIO_METRICS)))
+        values[..., 0] = wealth[:, -1] / wealth[:, 0] - 1
+        values[..., 1] = (wealth / np.maximum.accumulate(wealth, axis=1) - 1).min(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            count = lengths[:, None].astype(float)
+            mean = np.where(live, period, 0).sum(axis=1) / count
+            var = np.where(live, (period - mean[:, None]) ** 2, 0).sum(axis=1) / (count - 1)
+            values[..., 2] = np.where(count > 1, np.sqrt(var) * np.sqrt(periods_per_year), np.nan)
+        values[..., 3] = np.where(live, period, np.inf).min(axis=1)
+        values[lengths == 0] = np.nan
+
+        result = {'scenarios': list(self.names), 'portfolios': names or list(range(len(W))),
+                  'metrics': list(SCENARIO_METRICS), 'values': values}
+        result.update({metric: values[..., k] for k, metric in enumerate(SCENARIO_METRICS)})
+        return result
+
+    def _per_asset(self, value):
+        if isinstance(value, dict):
+            value = pd.Series(value)
+        if isinstance(value, pd.Series):
+            value = value.reindex(self.assets).fillna(0).values
+        return np.asarray(value, dtype=float)
+
+
+def _weight_matrix(weights, assets):
+    if isinstance(weights, pd.DataFrame):
+        return weights.reindex(columns=assets).fillna(0).values.astype(float)
+    if isinstance(weights, dict):
+        weights = pd.Series(weights)
+    if isinstance(weights, pd.Series):
+        weights = weights.reindex(assets).fillna(0)
+    return np.asarray(weights, dtype=float)
+
+
+def stress_scenarios(returns, scenarios, bond_assets=('AGG', 'TIP', 'HYG'), rate_shock=-0.02):
+    """
+    Build a ScenarioSet from a STRESS_SCENARIOS-style dict.
+    Args:
+        returns (pd.DataFrame): Asset returns
+        scenarios (dict): name -> (start, end) historical window, or None for the built-in 'Rate_Shock'
+            (the last period with rate_shock added to bond_assets); other None entries are skipped
+        bond_assets (tuple): Assets hit by the rate shock
+        rate_shock (float): Additive return shock to the bond assets
+    Returns:
+        ScenarioSet
+    """
+    scenario_set = ScenarioSet(returns.columns)
+    for name, period in scenarios.items():
+        if period:
+            scenario_set.add_historical(name, returns, *period)
+        elif name == 'Rate_Shock':
+            shock = {asset: rate_shock for asset in bond_assets}
+            scenario_set.add(name, returns.iloc[-1:], shock=shock)
+    return scenario_set
+
+
+def scenario_table(result, portfolio=0):
+    """
+    One portfolio's results from ScenarioSet.evaluate as a scenarios x metrics DataFrame.
+    Args:
+        result (dict): Output of ScenarioSet.evaluate
+        portfolio: Portfolio label (or position for unlabelled weights)
+    Returns:
+        pd.DataFrame
+    """
+    p = result['portfolios'].index(portfolio)
+    return pd.DataFrame(result['values'][:, p], index=result['scenarios'], columns=result['metrics'])
+
+
+class FactorStressModel:
+    """
+    Factor-propagated stress testing: shocks specified on a few factors move every asset through its betas.
+
+    Betas are estimated once with risk_analytics.factor_analysis and the factor covariance from the same
+    history. A scenario that shocks factors S by s moves the unshocked factors U by their conditional
+    expectation E[f_U | f_S = s] = Sigma_US Sigma_SS^-1 s, and assets by B f. Scenarios are grouped by
+    which factors they shock, so each group costs one cached small solve and one matrix product.
+    """
+
+    def __init__(self, betas, factor_cov):
+        """
+        Args:
+            betas (pd.DataFrame): Asset-to-factor betas (assets x factors)
+            factor_cov (pd.DataFrame): Factor covariance (factors x factors)
+        """
+        self.betas = betas
+        self.factor_cov = factor_cov.reindex(index=betas.columns, columns=betas.columns)
+        self.assets = list(betas.index)
+        self.factors = list(betas.columns)
+        self._conditional = {}
+
+    @classmethod
+    def from_returns(cls, returns, factors):
+        """
+        Estimate betas and factor covariance on the dates where assets and factors are both complete.
+        Args:
+            returns (pd.DataFrame): Asset returns
+            factors (pd.DataFrame): Factor returns (e.g. equity, rates, credit spread changes)
+        Returns:
+            FactorStressModel
+        """
+        from risk_analytics import factor_analysis
+        joined = returns.join(factors, how='inner', rsuffix='_factor').dropna()
+        asset_returns = joined.iloc[:, :returns.shape[1]]
+        factor_returns = joined.iloc[:, returns.shape[1]:]
+        factor_returns.columns = factors.columns
+        return cls(factor_analysis(asset_returns, factor_returns), factor_returns.cov())
+
+    def propagate(self, shocks):
+        """
+        Full factor moves implied by partial factor shocks.
+        Args:
+            shocks (pd.DataFrame or dict): Scenarios x factors, NaN (or a missing column) where a factor is not
+                shocked; or {scenario: {factor: shock}}
+        Returns:
+            pd.DataFrame: Scenarios x factors with conditional expectations filled in
+        """
+        if isinstance(shocks, dict):
+            shocks = pd.DataFrame(list(shocks.values()), index=list(shocks))
+        unknown = set(shocks.columns) - set(self.factors)
+        if unknown:
+            raise ValueError(f"Shocks refer to unknown factors {sorted(unknown)}")
+        values = shocks.reindex(columns=self.factors).values.astype(float)
+        shocked = ~np.isnan(values)
+        moves = np.where(shocked, values, 0.0)
+        patterns, group = np.unique(shocked, axis=0, return_inverse=True)
+        for g, pattern in enumerate(patterns):
+            if pattern.all() or not pattern.any():
+                continue
+            rows = np.flatnonzero(group.ravel() == g)
+            moves[np.ix_(rows, ~pattern)] = values[np.ix_(rows, pattern)] @ self._transfer(pattern).T
+        return pd.DataFrame(moves, index=shocks.index, columns=self.factors)
+
+    def asset_pnl(self, shocks):
+        """
+        Asset returns under each factor scenario.
+        Returns:
+            pd.DataFrame: Scenarios x assets
+        """
+        moves = self.propagate(shocks)
+        return pd.DataFrame(moves.values @ self.betas.values.T, index=moves.index, columns=self.assets)
+
+    def portfolio_pnl(self, shocks, weights):
+        """
+        Portfolio returns under each factor scenario, via the portfolios' factor exposures (weights @ betas).
+        Args:
+            shocks (pd.DataFrame or dict): As in propagate()
+            weights (pd.DataFrame, dict or pd.Series): P x N weights, or a single portfolio
+        Returns:
+            pd.DataFrame or pd.Series: Scenarios x portfolios, or one value per scenario for a single portfolio
+        """
+        moves = self.propagate(shocks)
+        W = np.atleast_2d(_weight_matrix(weights, self.assets))
+        pnl = moves.values @ (W @ self.betas.values).T
+        if isinstance(weights, pd.DataFrame):
+            return pd.DataFrame(pnl, index=moves.index, columns=weights.index)
+        return pd.Series(pnl[:, 0], index=moves.index, name='portfolio_pnl')
+
+    def _transfer(self, pattern):
+        # Sigma_US Sigma_SS^-1 for one shock pattern, cached across calls
+        key = tuple(pattern)
+        if key not in self._conditional:
+            cov = self.factor_cov.values
+            s, u = np.flatnonzero(pattern), np.flatnonzero(~pattern)
+            solved = np.linalg.lstsq(cov[np.ix_(s, s)], cov[np.ix_(s, u)], rcond=None)[0]
+            self._conditional[key] = solved.T
+        return self._conditional[key]
@@ -91,16 +91,17 @@ def plot_risk_contribution_bar(weights, cov_matrix, save_path=None):
     Plot a risk contribution bar chart by asset class.
     Args:
         weights (dict or pd.Series): Portfolio weights
-        cov_matrix (pd.DataFrame): Covariance matrix of asset returns
+        cov_matrix (pd.DataFrame or FactorCovariance): Covariance matrix of asset returns
         save_path (str): If provided, save the plot to this path
     """
     import matplotlib.pyplot as plt
     import numpy as np
     w = np.array(list(weights.values()))
     assets = list(weights.keys())
-    # Marginal contribution to risk
-    port_vol = np.sqrt(np.dot(w, np.dot(cov_matrix, w)))
-    mcr = np.dot(cov_matrix, w) / port_vol
+    # Marginal contribution to risk (cov @ w is O(NK) for a factor model)
+    cov_w = np.asarray(cov_matrix @ w, dtype=float)
+    port_vol = np.sqrt(np.dot(w, cov_w))
+    mcr = cov_w / port_vol
     # Risk contribution
     rc = w * mcr
     plt.figure(figsize=(10, 6))
@@ -0,0 +1,61 @@
+import unittest
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from backtest import walk_forward_backtest, rebalance_dates
+
+
+class TestBacktest(unittest.TestCase):
+    """Test cases for the walk-forward backtest"""
+
+    def setUp(self):
+        """Set up ten years of synthetic monthly returns"""
+        rng = np.random.default_rng(0)
+        self.assets = ['SPY', 'EFA', 'AGG', 'TIP', 'GLD', 'Hedge_Fund', 'Private_Equity']
+        index = pd.date_range('2015-01-31', periods=60, freq='ME')
+        self.returns = pd.DataFrame(rng.normal(0.006, 0.04, (60, len(self.assets))),
+                                    index=index, columns=self.assets)
+
+    def test_rebalance_dates(self):
+        """Test quarter ends are used once the first window is full"""
+        dates = rebalance_dates(self.returns.index, window=12, rebalance='Q')
+        self.assertEqual(dates[0], pd.Timestamp('2015-12-31'))
+        self.assertTrue((dates.month % 3 == 0).all())
+        self.assertEqual(len(dates), 17)
+
+    def test_costs_and_pnl(self):
+        """Test net returns differ from gross only by the cost of each rebalance"""
+        result = walk_forward_backtest(self.returns, window=12, rebalance='Q', transaction_costs=0.01)
+        weights, net, gross = result['weights'], result['net_returns'], result['gross_returns']
+
+        np.testing.assert_allclose(weights.sum(axis=1), 1.0, atol=1e-6)
+        self.assertAlmostEqual(result['turnover'].iloc[0], 1.0, places=6)  # first trade is from cash
+        self.assertEqual(net.index[0], self.returns.index[12])
+
+        # Gross return of the first period is the target portfolio's return
+        first = self.returns.iloc[12] @ weights.iloc[0]
+        self.assertAlmostEqual(gross.iloc[0], first, places=10)
+        # The last rebalance falls on the final observation, so its cost is not realized yet
+        total_cost = 1 - np.prod((1 + net) / (1 + gross))
+        self.assertAlmostEqual(total_cost, 1 - np.prod(1 - result['costs'].iloc[:-1]), places=10)
+        self.assertEqual(len(result['timings']), len(weights))
+
+    def test_turnover_aware_and_parallel_windows(self):
+        """Test prev_weights lowers turnover and pooled windows match the serial run"""
+        kwargs = dict(window=12, rebalance='Q', transaction_costs=0.02)
+        aware = walk_forward_backtest(self.returns, **kwargs)
+        serial = walk_forward_backtest(self.returns, turnover_aware=False, **kwargs)
+        pooled = walk_forward_backtest(self.returns, turnover_aware=False, n_jobs=2, **kwargs)
+
+        self.assertLess(aware['turnover'].iloc[1:].sum(), serial['turnover'].iloc[1:].sum())
+        pd.testing.assert_frame_equal(serial['weights'], pooled['weights'])
+        pd.testing.assert_series_equal(serial['net_returns'], pooled['net_returns'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import tempfile
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from optimization import optimize_portfolio
+from constraint_surface import ConstraintSurface
+
+
+class TestConstraintSurface(unittest.TestCase):
+    """Test cases for the precomputed optimization surface"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Build one small surface shared by the tests"""
+        rng = np.random.default_rng(7)
+        cls.assets = ['SPY', 'EFA', 'AGG', 'GLD', 'Hedge_Fund', 'Private_Equity']
+        loadings = rng.normal(0, 0.12, (6, 2))
+        cls.cov = pd.DataFrame(loadings @ loadings.T + np.diag(rng.uniform(0.01, 0.03, 6)),
+                               index=cls.assets, columns=cls.assets)
+        cls.expected_returns = pd.Series(rng.uniform(0.04, 0.12, 6), index=cls.assets)
+        cls.axes = {'risk_free_rate': [0.0, 0.02, 0.04], 'min_alt': [0.1, 0.2, 0.3],
+                    'max_single': [0.25, 0.3, 0.4], 'min_esg': [7.0, 7.5]}
+        cls.surface = ConstraintSurface.build(cls.expected_returns, cls.cov, axes=cls.axes)
+
+    def _direct(self, **params):
+        return optimize_portfolio(self.expected_returns, self.cov, solver='qp', **params)
+
+    def test_grid_node_lookup(self):
+        """Test a request on a grid node is served from the stored solution"""
+        self.assertEqual(self.surface.shape, (3, 3, 3, 2))
+        params = dict(risk_free_rate=0.02, min_alt=0.2, max_single=0.3, min_esg=7.5)
+        result = self.surface.query(**params)
+
+        self.assertEqual(result['diagnostics']['source'], 'grid')
+        self.assertAlmostEqual(result['sharpe_ratio'], self._direct(**params)['sharpe_ratio'], places=8)
+
+    def test_off_grid_polish_matches_exact_solve(self):
+        """Test an off-grid request is polished to the exact optimum; tolerance=None skips the solve"""
+        params = dict(risk_free_rate=0.025, min_alt=0.22, max_single=0.28, min_esg=7.3)
+        result = self.surface.query(**params)
+        direct = self._direct(**params)
+
+        self.assertEqual(result['diagnostics']['source'], 'polished')
+        self.assertEqual(result['diagnostics']['grid_point'],
+                         {'risk_free_rate': 0.02, 'min_alt': 0.2, 'max_single': 0.3, 'min_esg': 7.5})
+        self.assertAlmostEqual(result['sharpe_ratio'], direct['sharpe_ratio'], places=7)
+        self.assertGreaterEqual(result['weights']['Hedge_Fund'] + result['weights']['Private_Equity'],
+                                0.22 - 1e-8)
+
+        nearest = self.surface.query(tolerance=None, **params)
+        self.assertEqual(nearest['diagnostics']['source'], 'nearest')
+
+    def test_save_load_roundtrip(self):
+        """Test a saved surface answers identically and still matches its inputs"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'surface.npz')
+            self.surface.save(path)
+            loaded = ConstraintSurface.load(path)
+
+        params = dict(risk_free_rate=0.01, min_alt=0.15, max_single=0.35, min_esg=7.2)
+        self.assertEqual(loaded.query(**params)['weights'], self.surface.query(**params)['weights'])
+        self.assertTrue(loaded.matches(self.expected_returns, self.cov))
+        self.assertFalse(loaded.matches(self.expected_returns + 0.01, self.cov))
+
+
+if __name__ == '__main__':
+    unittest.main()
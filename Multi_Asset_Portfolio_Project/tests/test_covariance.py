@@ -0,0 +1,148 @@
+import unittest
+import tempfile
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from covariance import CovarianceEstimator, FactorCovariance, nearest_psd
+from optimization import optimize_portfolio
+from risk_analytics import parametric_var
+
+
+class TestCovarianceEstimator(unittest.TestCase):
+    """Test cases for the streaming covariance engine"""
+
+    def setUp(self):
+        """Set up correlated sample returns"""
+        rng = np.random.default_rng(42)
+        idx = pd.date_range('2015-01-31', periods=80, freq='M')
+        mix = rng.normal(0, 0.02, (6, 6))
+        self.returns = pd.DataFrame(rng.normal(0.005, 0.03, (80, 6)) @ mix + 0.004, index=idx,
+                                    columns=[f'A{i}' for i in range(6)])
+
+    def test_sample_matches_pandas(self):
+        """Test the incremental sample covariance equals the batch estimate"""
+        est = CovarianceEstimator.from_returns(self.returns.iloc[:50])
+        for idx, row in self.returns.iloc[50:].iterrows():
+            est.update(row, idx)
+        pd.testing.assert_frame_equal(est.covariance(), self.returns.cov() * 12)
+
+    def test_ewma_matches_direct_weights(self):
+        """Test EWMA equals the normalized exponentially weighted sum of outer products"""
+        est = CovarianceEstimator.from_returns(self.returns, method='ewma', decay=0.9)
+        x = self.returns.values
+        w = 0.9 ** np.arange(len(x))[::-1]
+        expected = (x * w[:, None]).T @ x / w.sum()
+        np.testing.assert_allclose(est.covariance(annualized=False).values, expected)
+
+    def test_ledoit_wolf_matches_sklearn(self):
+        """Test streaming Ledoit-Wolf shrinkage equals scikit-learn's batch estimate"""
+        from sklearn.covariance import ledoit_wolf
+        expected, shrinkage = ledoit_wolf(self.returns.values)
+        est = CovarianceEstimator.from_returns(self.returns, method='ledoit_wolf')
+        self.assertAlmostEqual(est.shrinkage, shrinkage, places=8)
+        np.testing.assert_allclose(est.covariance(annualized=False).values, expected, rtol=1e-8)
+
+    def test_cached_factor_and_risk_contributions(self):
+        """Test the Cholesky factor is reused and risk contributions add up to volatility"""
+        est = CovarianceEstimator.from_returns(self.returns)
+        self.assertIs(est.cholesky(), est.cholesky())
+        weights = dict(zip(self.returns.columns, np.full(6, 1 / 6)))
+        vol = est.portfolio_volatility(weights)
+        cov = est.covariance().values
+        self.assertAlmostEqual(vol, np.sqrt(np.full(6, 1 / 6) @ cov @ np.full(6, 1 / 6)))
+        self.assertAlmostEqual(est.risk_contributions(weights).sum(), vol)
+
+    def test_revised_last_row_and_psd_repair(self):
+        """Test a revised last period replaces the old one, and short histories are repaired to PSD"""
+        partial = self.returns.iloc[:40].copy()
+        partial.iloc[-1] = 0.2
+        est = CovarianceEstimator(self.returns.columns, method='ewma', decay=0.95)
+        est.update_many(partial)
+        est.update_many(self.returns)
+        full = CovarianceEstimator.from_returns(self.returns, method='ewma', decay=0.95)
+        np.testing.assert_allclose(est.covariance().values, full.covariance().values)
+
+        short = CovarianceEstimator.from_returns(self.returns.iloc[:3])
+        self.assertGreaterEqual(np.linalg.eigvalsh(short.covariance().values).min(), -1e-12)
+        bad = np.array([[1.0, 2.0], [2.0, 1.0]])
+        self.assertGreaterEqual(np.linalg.eigvalsh(nearest_psd(bad)).min(), -1e-12)
+
+    def test_state_roundtrip_and_window_shift(self):
+        """Test the state survives JSON with a pending revision, and a moved window start restarts the estimate"""
+        partial = self.returns.iloc[:40].copy()
+        partial.iloc[-1] = 0.2
+        est = CovarianceEstimator(self.returns.columns, method='ledoit_wolf')
+        est.update_many(partial)
+        with tempfile.TemporaryDirectory() as tmp:
+            est.save(os.path.join(tmp, 'cov.json'))
+            restored = CovarianceEstimator.load(os.path.join(tmp, 'cov.json'))
+        restored.update_many(self.returns)
+        full = CovarianceEstimator.from_returns(self.returns, method='ledoit_wolf')
+        np.testing.assert_allclose(restored.covariance().values, full.covariance().values)
+
+        restored.update_many(self.returns.iloc[12:])
+        trailing = CovarianceEstimator.from_returns(self.returns.iloc[12:], method='ledoit_wolf')
+        self.assertEqual(restored.count, len(self.returns) - 12)
+        np.testing.assert_allclose(restored.covariance().values, trailing.covariance().values)
+
+
+class TestFactorCovariance(unittest.TestCase):
+    """Test cases for the factor-model covariance"""
+
+    def setUp(self):
+        """Set up returns driven by two factors"""
+        rng = np.random.default_rng(3)
+        idx = pd.date_range('2015-01-31', periods=120, freq='M')
+        self.factors = pd.DataFrame(rng.normal(0, 0.03, (120, 2)), index=idx, columns=['MKT', 'RATES'])
+        betas = rng.normal(0.8, 0.4, (2, 8))
+        noise = rng.normal(0, 0.01, (120, 8))
+        tickers = ['SPY', 'EFA', 'EEM', 'AGG', 'TLT', 'GLD', 'Hedge_Fund', 'Private_Equity']
+        self.returns = pd.DataFrame(self.factors.values @ betas + noise + 0.006, index=idx, columns=tickers)
+
+    def test_products_match_dense(self):
+        """Test matrix products, variance and diagonal agree with the dense B F B' + D"""
+        fc = FactorCovariance.from_returns(self.returns, factors=self.factors, periods_per_year=12)
+        dense = fc.dense()
+        w = np.full(8, 1 / 8)
+        X = np.random.default_rng(0).normal(size=(8, 3))
+
+        self.assertEqual(fc.shape, (8, 8))
+        np.testing.assert_allclose(fc @ w, dense @ w)
+        np.testing.assert_allclose(fc @ X, dense @ X)
+        np.testing.assert_allclose(w @ fc, w @ dense)
+        np.testing.assert_allclose(fc.diagonal(), np.diag(dense))
+        self.assertAlmostEqual(fc.variance(w), w @ dense @ w)
+        self.assertEqual(list(fc.to_frame().index), list(self.returns.columns))
+        self.assertGreaterEqual(np.linalg.eigvalsh(dense).min(), -1e-12)
+
+    def test_pca_keeps_total_variance(self):
+        """Test statistical factors reproduce each asset's sample variance"""
+        fc = FactorCovariance.from_returns(self.returns, n_factors=2, periods_per_year=12)
+        np.testing.assert_allclose(fc.diagonal(), self.returns.var().values * 12, rtol=1e-8)
+        self.assertEqual(fc.loadings.shape, (8, 2))
+
+    def test_optimizer_and_var_match_dense(self):
+        """Test the QP backend and parametric VaR give the dense-matrix answers"""
+        fc = FactorCovariance.from_returns(self.returns, factors=self.factors, periods_per_year=12)
+        expected_returns = self.returns.mean() * 12
+        factor = optimize_portfolio(expected_returns, fc, solver='qp')
+        dense = optimize_portfolio(expected_returns, fc.to_frame(), solver='qp')
+
+        self.assertEqual(factor['diagnostics']['status'], 'solved')
+        self.assertAlmostEqual(factor['sharpe_ratio'], dense['sharpe_ratio'], places=6)
+        for ticker in self.returns.columns:
+            self.assertAlmostEqual(factor['weights'][ticker], dense['weights'][ticker], places=5)
+
+        var_factor = parametric_var(factor['weights'], fc)
+        var_dense = parametric_var(factor['weights'], fc.to_frame())
+        for key in var_dense:
+            self.assertAlmostEqual(var_factor[key], var_dense[key])
+
+
+if __name__ == '__main__':
+    unittest.main()
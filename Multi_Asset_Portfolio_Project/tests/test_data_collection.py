@@ -7,7 +7,10 @@ import os
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from data_collection import collect_market_data, calculate_annualized_metrics, simulate_alternative_assets
+from data_collection import (
+    collect_market_data, calculate_annualized_metrics, simulate_alternative_assets,
+    AnnualizedMetricsAccumulator
+)
 
 
 class TestDataCollection(unittest.TestCase):
@@ -73,6 +76,58 @@ class TestDataCollection(unittest.TestCase):
         self.assertTrue(alt_assets['Hedge_Fund'].mean() > 0)
         self.assertTrue(alt_assets['Private_Equity'].mean() > 0)
         
+    def test_simulated_alternatives_are_seeded(self):
+        """Test the alternatives are reproducible per seed, stable as the history grows and leave np.random alone"""
+        index = pd.date_range('2020-01-31', periods=36, freq='ME')
+        np.random.seed(0)
+        state = np.random.get_state()[1].copy()
+        first = simulate_alternative_assets(index, seed=7)
+
+        np.testing.assert_array_equal(np.random.get_state()[1], state)
+        pd.testing.assert_frame_equal(first, simulate_alternative_assets(index, seed=7))
+        self.assertFalse(first.equals(simulate_alternative_assets(index, seed=8)))
+        pd.testing.assert_frame_equal(simulate_alternative_assets(index[:24], seed=7), first.iloc[:24])
+
+    def test_metrics_accumulator_matches_batch(self):
+        """Test incremental metrics match the full recomputation after each new period"""
+        np.random.seed(42)
+        index = pd.date_range('2020-01-31', periods=36, freq='M')
+        sample_returns = pd.DataFrame(np.random.normal(0.01, 0.04, (36, 3)), index=index,
+                                      columns=['Asset1', 'Asset2', 'Asset3'])
+
+        acc = AnnualizedMetricsAccumulator()
+        self.assertEqual(acc.update_many(sample_returns.iloc[:24]), 24)
+        for i in range(24, 36):
+            acc.update(sample_returns.iloc[i], sample_returns.index[i])
+        expected = calculate_annualized_metrics(sample_returns)
+        for key in expected:
+            np.testing.assert_allclose(acc.metrics()[key].values, expected[key].values)
+
+    def test_metrics_accumulator_resume_and_revise(self):
+        """Test state round-trips through JSON and a revised last period is replaced"""
+        np.random.seed(1)
+        index = pd.date_range('2020-01-31', periods=13, freq='M')
+        sample_returns = pd.DataFrame(np.random.normal(0.01, 0.04, (13, 2)), index=index, columns=['A', 'B'])
+        partial = sample_returns.iloc[:12].copy()
+        partial.iloc[-1] = 0.5  # month-to-date bar that is later revised
+
+        acc = AnnualizedMetricsAccumulator(periods_per_year=12)
+        acc.update_many(partial)
+        restored = AnnualizedMetricsAccumulator.from_dict(acc.to_dict())
+        self.assertEqual(restored.update_many(sample_returns), 1)
+
+        expected = calculate_annualized_metrics(sample_returns)
+        np.testing.assert_allclose(restored.metrics()['annualized_return'].values,
+                                   expected['annualized_return'].values)
+        np.testing.assert_allclose(restored.metrics()['annualized_volatility'].values,
+                                   expected['annualized_volatility'].values)
+
+        # A trailing window that starts one period later is rebuilt rather than extended
+        self.assertEqual(restored.update_many(sample_returns.iloc[1:]), 12)
+        expected = calculate_annualized_metrics(sample_returns.iloc[1:])
+        np.testing.assert_allclose(restored.metrics()['annualized_return'].values,
+                                   expected['annualized_return'].values)
+
     def test_data_quality_checks(self):
         """Test data quality and missing data handling"""
         prices, returns, metrics, corr = collect_market_data(
@@ -0,0 +1,64 @@
+import unittest
+import shutil
+import tempfile
+import pandas as pd
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from data_collection import collect_market_data, calculate_annualized_metrics
+from data_providers import SyntheticProvider
+from frequency import get_frequency, periods_per_year
+from price_store import PriceStore
+
+
+class TestFrequency(unittest.TestCase):
+    """Test cases for configurable sampling frequency"""
+
+    def setUp(self):
+        """Set up a synthetic source with a known volatility"""
+        self.provider = SyntheticProvider(seed=3, mu=0.08, sigma=0.20)
+        self.tickers = ['SPY', 'AGG', 'GLD']
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_get_frequency(self):
+        """Test codes and aliases resolve to the same frequency"""
+        self.assertEqual(get_frequency('ME'), get_frequency('M'))
+        self.assertEqual(get_frequency('daily').periods_per_year, 252)
+        with self.assertRaises(ValueError):
+            get_frequency('Q')
+
+    def test_annualization_consistent_across_frequencies(self):
+        """Test each frequency is tagged and annualizes to the same volatility"""
+        vols = {}
+        for code, expected_ppy in [('D', 252), ('W', 52), ('M', 12)]:
+            _, returns, metrics, _ = collect_market_data(self.tickers, '2010-01-01', '2024-01-01',
+                                                         simulate_alternatives=False, provider=self.provider,
+                                                         frequency=code)
+            self.assertEqual(periods_per_year(returns), expected_ppy)
+            vols[code] = metrics['annualized_volatility'].mean()
+            pd.testing.assert_series_equal(metrics['annualized_volatility'],
+                                           calculate_annualized_metrics(returns)['annualized_volatility'])
+        for code in vols:
+            self.assertAlmostEqual(vols[code], 0.20, delta=0.025)
+
+    def test_store_caches_resampled_panel(self):
+        """Test the resampled panel is reused until the store changes"""
+        store = PriceStore(self.root)
+        store.write(self.provider.fetch(self.tickers, '2020-01-01', '2023-01-01'), '2020-01-01', '2023-01-01')
+
+        weekly = store.resampled(self.tickers, '2020-01-01', '2023-01-01', 'W')
+        self.assertIs(store.resampled(self.tickers, '2020-01-01', '2023-01-01', 'W'), weekly)
+        self.assertIsNot(store.resampled(self.tickers, '2020-01-01', '2023-01-01', 'M'), weekly)
+
+        store.write(self.provider.fetch(self.tickers, '2023-01-01', '2023-06-01'), '2023-01-01', '2023-06-01')
+        self.assertIsNot(store.resampled(self.tickers, '2020-01-01', '2023-01-01', 'W'), weekly)
+
+
+if __name__ == '__main__':
+    unittest.main()
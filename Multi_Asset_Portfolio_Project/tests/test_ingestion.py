@@ -0,0 +1,128 @@
+import unittest
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from data_collection import collect_market_data
+from data_providers import HTTPCSVProvider
+from ingestion import ingest_tickers
+from price_store import PriceStore
+
+
+class CannedCSVHandler(BaseHTTPRequestHandler):
+    """Serves /<TICKER>.csv from the server's canned files; FLAKY fails its first two requests"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        ticker = self.path.split('?')[0].strip('/').replace('.csv', '')
+        with server.lock:
+            server.requests += 1
+            server.clients.add(self.client_address)
+            server.hits[ticker] = server.hits.get(ticker, 0) + 1
+            hits = server.hits[ticker]
+        if ticker == 'FLAKY' and hits <= 2:
+            self._reply(503, b'busy')
+        elif ticker not in server.files:
+            self._reply(404, b'unknown ticker')
+        else:
+            self._reply(200, server.files[ticker].encode())
+
+    def _reply(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/csv')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestIngestion(unittest.TestCase):
+    """Test cases for concurrent ingestion against a local stand-in server"""
+
+    def setUp(self):
+        """Start the stand-in server"""
+        dates = pd.bdate_range('2023-01-02', '2023-12-29')
+        rng = np.random.default_rng(3)
+        self.files = {}
+        for ticker in ['SPY', 'AGG', 'GLD', 'EFA', 'FLAKY']:
+            close = 100 * np.cumprod(1 + rng.normal(0, 0.01, len(dates)))
+            self.files[ticker] = pd.DataFrame({'date': dates, 'close': close}).to_csv(index=False)
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), CannedCSVHandler)
+        self.server.files = self.files
+        self.server.lock = threading.Lock()
+        self.server.requests = 0
+        self.server.clients = set()
+        self.server.hits = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        port = self.server.server_address[1]
+        self.provider = HTTPCSVProvider(f'http://127.0.0.1:{port}/{{ticker}}.csv?start={{start}}&end={{end}}')
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.root)
+
+    def test_retry_and_partial_failure(self):
+        """Test transient errors are retried, unknown tickers fail fast, and the rest is stored"""
+        store = PriceStore(self.root)
+        tickers = ['SPY', 'AGG', 'FLAKY', 'MISSING', 'GLD', 'EFA']
+        result = ingest_tickers(tickers, '2023-01-01', '2024-01-01', provider=self.provider, store=store,
+                                max_workers=2, retries=3, backoff=0.01)
+        report = result['report']
+
+        self.assertEqual(list(report.index), tickers)
+        self.assertEqual(report.loc['FLAKY', 'status'], 'ok')
+        self.assertEqual(report.loc['FLAKY', 'attempts'], 3)
+        self.assertEqual(report.loc['MISSING', 'status'], 'failed')
+        self.assertEqual(report.loc['MISSING', 'attempts'], 1)
+        self.assertTrue((report.loc[report['status'] == 'ok', 'rows'] == 260).all())
+        self.assertGreater(result['tickers_per_sec'], 0)
+        self.assertEqual(list(result['prices'].columns), ['SPY', 'AGG', 'FLAKY', 'GLD', 'EFA'])
+
+        # Partial results were written; the failed ticker stays uncovered so it is retried next time
+        self.assertEqual(store.tickers(), ['AGG', 'EFA', 'FLAKY', 'GLD', 'SPY'])
+        self.assertIn('MISSING', store.missing_ranges(['MISSING'], '2023-01-01', '2024-01-01')[
+            (pd.Timestamp('2023-01-01'), pd.Timestamp('2024-01-01'))])
+
+        # Keep-alive sessions: far fewer connections than requests
+        self.assertLessEqual(len(self.server.clients), 2)
+        self.assertEqual(self.server.requests, 8)
+
+    def test_empty_result_is_retried_and_not_stored(self):
+        """Test a ticker that comes back without any rows is retried, reported as failed and left uncovered"""
+        self.files['EMPTY'] = 'date,close\n'
+        store = PriceStore(self.root)
+        store.write(pd.DataFrame({'EMPTY': [100.0]}, index=[pd.Timestamp('2022-12-30')]), '2022-12-01', '2023-01-01')
+        result = ingest_tickers(['SPY', 'EMPTY'], '2023-01-01', '2024-01-01', provider=self.provider, store=store,
+                                retries=2, backoff=0.01)
+
+        self.assertEqual(result['report'].loc['EMPTY', 'status'], 'failed')
+        self.assertEqual(result['report'].loc['EMPTY', 'attempts'], 3)
+        self.assertEqual(list(result['prices'].columns), ['SPY'])
+        self.assertEqual(store.coverage('EMPTY'), (pd.Timestamp('2022-12-01'), pd.Timestamp('2023-01-01')))
+
+    def test_collect_market_data_with_ingestion(self):
+        """Test collect_market_data fills the store through the concurrent pipeline"""
+        with self.assertWarns(UserWarning):
+            _, returns, _, _ = collect_market_data(
+                ['SPY', 'AGG', 'MISSING'], '2023-01-01', '2024-01-01', simulate_alternatives=False,
+                store=PriceStore(self.root), provider=self.provider, ingest_workers=4
+            )
+        self.assertEqual(list(returns.columns), ['SPY', 'AGG'])
+        self.assertEqual(len(returns), 11)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+import tempfile
+import threading
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from memoize import ResultCache, content_hash
+from price_store import PriceStore
+from risk_analytics import calculate_var
+
+
+class TestResultCache(unittest.TestCase):
+    """Test cases for the content-addressed result cache"""
+
+    def setUp(self):
+        """Set up sample returns and a counting function"""
+        rng = np.random.default_rng(1)
+        idx = pd.date_range('2020-01-31', periods=36, freq='ME')
+        self.returns = pd.Series(rng.normal(0.005, 0.03, 36), index=idx)
+        self.calls = 0
+
+    def _var(self, returns, confidence_levels):
+        self.calls += 1
+        return calculate_var(returns, confidence_levels)
+
+    def test_content_hash(self):
+        """Test equal contents hash equally and any change in values, labels or parameters does not"""
+        frame = pd.DataFrame({'SPY': [0.01, 0.02], 'AGG': [0.0, -0.01]})
+        self.assertEqual(content_hash(frame, levels=[0.95]), content_hash(frame.copy(), levels=[0.95]))
+        self.assertEqual(content_hash(a=1, b=2), content_hash(b=2, a=1))
+
+        changed = frame.copy()
+        changed.iloc[0, 0] = 0.011
+        keys = {content_hash(frame), content_hash(changed), content_hash(frame.rename(columns={'SPY': 'EFA'})),
+                content_hash(frame.values), content_hash(frame, levels=[0.99])}
+        self.assertEqual(len(keys), 5)
+
+    def test_callable_hash(self):
+        """Test functions differing only in a constant, a default or a closure value hash differently"""
+        def scaled(factor):
+            return lambda x: x * factor
+
+        keys = {content_hash(lambda x: x * 0.95), content_hash(lambda x: x * 0.99),
+                content_hash(lambda x, k=1: x * k), content_hash(lambda x, k=2: x * k),
+                content_hash(scaled(0.95)), content_hash(scaled(0.99))}
+        self.assertEqual(len(keys), 6)
+        self.assertEqual(content_hash(scaled(0.95)), content_hash(scaled(0.95)))
+
+    def test_memory_and_disk_tiers(self):
+        """Test repeated calls hit memory, a new cache hits disk, and both tiers evict"""
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResultCache(max_entries=2, directory=tmp)
+            first = cache.call(self._var, self.returns, [0.95, 0.99])
+            second = cache.call(self._var, self.returns.copy(), [0.95, 0.99])
+            second['VaR_95'] = 1.0  # hits are private copies
+
+            self.assertEqual(self.calls, 1)
+            self.assertEqual(cache.call(self._var, self.returns, [0.95, 0.99]), first)
+            stats = cache.stats()
+            self.assertEqual((stats['hits'], stats['memory_hits'], stats['misses']), (2, 2, 1))
+
+            for level in (0.9, 0.8):
+                cache.call(self._var, self.returns, [level])
+            self.assertEqual(cache.stats()['evictions'], 1)
+
+            reopened = ResultCache(directory=tmp)
+            self.assertEqual(reopened.call(self._var, self.returns, [0.95, 0.99]), first)
+            self.assertEqual(reopened.stats()['disk_hits'], 1)
+            self.assertEqual(self.calls, 3)
+
+            small = ResultCache(directory=tmp, max_disk_bytes=reopened.stats()['disk_bytes'] // 2)
+            self.assertLess(small.stats()['disk_entries'], 3)
+            self.assertLessEqual(small.stats()['disk_bytes'], small.max_disk_bytes)
+
+    def test_store_revision_invalidates_and_threads(self):
+        """Test price changes drop cached results and stale files, no-op writes do not, and threads share entries"""
+        with tempfile.TemporaryDirectory() as tmp:
+            store = PriceStore(os.path.join(tmp, 'store'))
+            cache = ResultCache(directory=os.path.join(tmp, 'cache'), store=store)
+            cache.call(self._var, self.returns, [0.95])
+            prices = pd.DataFrame({'SPY': [100.0, 101.0]}, index=pd.date_range('2024-01-01', periods=2))
+            store.write(prices, '2024-01-01', '2024-01-03')
+
+            cache.call(self._var, self.returns, [0.95])
+            self.assertEqual(self.calls, 2)
+            self.assertEqual(cache.stats()['invalidations'], 1)
+            self.assertEqual(cache.stats()['disk_entries'], 1)
+
+            # Re-writing bars already stored is not a change
+            store.write(prices, '2024-01-01', '2024-01-03')
+            cache.call(self._var, self.returns, [0.95])
+            self.assertEqual((store.revision, self.calls), (1, 2))
+
+            # Files of an older revision are deleted when the next cache opens the directory
+            store.write(prices * 1.01, '2024-01-01', '2024-01-03')
+            reopened = ResultCache(directory=os.path.join(tmp, 'cache'), store=store)
+            self.assertEqual(reopened.stats()['disk_entries'], 0)
+            self.assertEqual(os.listdir(os.path.join(tmp, 'cache')), [])
+            reopened.call(self._var, self.returns, [0.95])
+
+            results = []
+            workers = [threading.Thread(target=lambda: results.append(reopened.call(self._var, self.returns, [0.95])))
+                       for _ in range(8)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            self.assertEqual(self.calls, 3)
+            self.assertTrue(all(r == results[0] for r in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import numpy as np
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from monte_carlo import simulate_paths, simulate_alternative_paths, map_chunks, iter_path_chunks
+
+
+def terminal_wealth_sum(rng, size, means, vols):
+    """Sum of terminal wealth over a chunk of paths"""
+    paths = simulate_paths(size, 12, means, vols, rng=rng)
+    return np.prod(1 + paths, axis=1).sum(axis=0)
+
+
+class TestMonteCarlo(unittest.TestCase):
+    """Test cases for the vectorized path generator"""
+
+    def setUp(self):
+        """Set up assumptions"""
+        self.means = [0.008, 0.01]
+        self.vols = [0.04, 0.05]
+        self.corr = [[1.0, 0.6], [0.6, 1.0]]
+
+    def test_shape_and_moments(self):
+        """Test paths have the requested shape, moments and correlation"""
+        paths = simulate_paths(2000, 60, self.means, self.vols, corr=self.corr, rng=np.random.default_rng(0))
+        self.assertEqual(paths.shape, (2000, 60, 2))
+        flat = paths.reshape(-1, 2)
+        np.testing.assert_allclose(flat.mean(axis=0), self.means, atol=5e-4)
+        np.testing.assert_allclose(flat.std(axis=0), self.vols, rtol=0.02)
+        self.assertAlmostEqual(np.corrcoef(flat.T)[0, 1], 0.6, delta=0.02)
+
+    def test_fat_tails(self):
+        """Test Student-t paths keep the volatility but have excess kurtosis"""
+        paths = simulate_paths(5000, 24, [0.0], [0.05], dist='t', df=5, rng=np.random.default_rng(1)).ravel()
+        self.assertAlmostEqual(paths.std(), 0.05, delta=0.003)
+        kurtosis = np.mean((paths / paths.std()) ** 4)
+        self.assertGreater(kurtosis, 4)
+
+    def test_appraisal_smoothing(self):
+        """Test smoothing dampens volatility and induces autocorrelation"""
+        paths = simulate_alternative_paths(2000, 60, rng=np.random.default_rng(2))
+        pe = paths[:, :, 1]
+        a = 0.5
+        expected_vol = 0.18 / np.sqrt(12) * np.sqrt((1 - a) / (1 + a))
+        self.assertAlmostEqual(pe.std(), expected_vol, delta=0.002)
+        lag1 = np.corrcoef(pe[:, 1:].ravel(), pe[:, :-1].ravel())[0, 1]
+        self.assertAlmostEqual(lag1, a, delta=0.03)
+
+    def test_chunked_study_is_reproducible(self):
+        """Test results do not depend on the number of workers"""
+        kwargs = dict(n_items=10000, chunk_size=1500, seed=7, args=(self.means, self.vols),
+                      reduce=lambda acc, r: acc + r, initial=np.zeros(2))
+        serial = map_chunks(terminal_wealth_sum, n_jobs=1, **kwargs)
+        parallel = map_chunks(terminal_wealth_sum, n_jobs=2, **kwargs)
+        np.testing.assert_array_equal(serial, parallel)
+
+        chunks = list(iter_path_chunks(10000, 12, self.means, self.vols, chunk_size=1500, seed=7))
+        self.assertEqual(sum(len(c) for c in chunks), 10000)
+        np.testing.assert_allclose(sum(np.prod(1 + c, axis=1).sum(axis=0) for c in chunks), serial)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+from unittest import mock
 import pandas as pd
 import numpy as np
 import sys
@@ -7,7 +8,10 @@ import os
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from optimization import optimize_portfolio, ESG_SCORES
+from scipy.optimize import check_grad
+from qp_solver import QPSolver
+from optimization import (optimize_portfolio, optimize_portfolio_grid, efficient_frontier, rebalance_portfolio,
+                          rebalance_accounts, ESG_SCORES, _PortfolioProblem)
 
 
 class TestOptimization(unittest.TestCase):
@@ -100,9 +104,173 @@ class TestOptimization(unittest.TestCase):
             transaction_costs=0.001
         )
         
-        # Should have similar but not identical results
-        self.assertNotEqual(result1['weights'], result2['weights'])
+        # Rebalancing starts from the holdings: already optimal, so (almost) nothing is worth trading
+        self.assertLess(result2['turnover'], 1e-4)
+
+        # From other holdings the costs make the rebalance stop short of the cost-free optimum
+        result3 = optimize_portfolio(
+            expected_returns=self.expected_returns,
+            cov_matrix=self.cov_matrix,
+            prev_weights=np.ones(4) / 4,
+            transaction_costs=0.05
+        )
+        self.assertNotEqual(result1['weights'], result3['weights'])
+        self.assertGreater(result3['turnover'], 0.0)
+        self.assertLess(result3['turnover'], np.abs(np.array(list(result1['weights'].values())) - 0.25).sum())
+
+        # Both gradient modes apply to the rebalance; multistart options do not and are rejected
+        analytic = optimize_portfolio(self.expected_returns, self.cov_matrix, prev_weights=np.ones(4) / 4,
+                                      transaction_costs=0.05, gradients='analytic')
+        self.assertAlmostEqual(analytic['sharpe_ratio'], result3['sharpe_ratio'], places=6)
+        for option in ({'n_starts': 5}, {'seed': 1}, {'n_jobs': 2}):
+            with self.assertRaises(ValueError):
+                optimize_portfolio(self.expected_returns, self.cov_matrix, prev_weights=np.ones(4) / 4, **option)
         
+    def test_analytic_gradient_matches_finite_difference(self):
+        """Test the closed-form Sharpe gradient"""
+        problem = _PortfolioProblem(self.expected_returns, self.cov_matrix, self.test_assets, ESG_SCORES,
+                                    0.2, 0.3, 0.4, 7.0, 0.02, 0.001, None)
+        w = np.array([0.1, 0.4, 0.3, 0.2])
+        self.assertLess(check_grad(problem.objective, problem.gradient, w), 1e-6)
+
+    def test_analytic_mode_matches_numeric(self):
+        """Test analytic gradients reach the same optimum with fewer evaluations"""
+        numeric = optimize_portfolio(self.expected_returns, self.cov_matrix, min_alt=0.2, max_single=0.3)
+        analytic = optimize_portfolio(self.expected_returns, self.cov_matrix, min_alt=0.2, max_single=0.3,
+                                      gradients='analytic')
+
+        self.assertAlmostEqual(analytic['sharpe_ratio'], numeric['sharpe_ratio'], places=5)
+        self.assertAlmostEqual(sum(analytic['weights'].values()), 1.0, places=8)
+        self.assertLessEqual(max(analytic['weights'].values()), 0.3)
+        self.assertGreaterEqual(analytic['weights']['Hedge_Fund'], 0.2 - 1e-8)
+        self.assertLess(analytic['diagnostics']['nfev'], numeric['diagnostics']['nfev'])
+
+    def test_qp_solver_matches_slsqp(self):
+        """Test the convex QP backend reaches the SLSQP optimum in one deterministic solve"""
+        cov = self._psd_cov()
+        slsqp = optimize_portfolio(self.expected_returns, cov, gradients='analytic')
+        qp = optimize_portfolio(self.expected_returns, cov, solver='qp')
+        again = optimize_portfolio(self.expected_returns, cov, solver='qp')
+
+        self.assertEqual(qp['diagnostics']['status'], 'solved')
+        self.assertTrue(qp['success'])
+        self.assertGreaterEqual(qp['sharpe_ratio'], slsqp['sharpe_ratio'] - 1e-6)
+        self.assertAlmostEqual(sum(qp['weights'].values()), 1.0, places=10)
+        self.assertLessEqual(max(qp['weights'].values()), 0.3 + 1e-10)
+        self.assertGreaterEqual(qp['weights']['Hedge_Fund'], 0.2 - 1e-10)
+        self.assertEqual(qp['weights'], again['weights'])
+
+        # A solve that runs out of iterations falls back to equal weights, flagged as unsuccessful
+        solve = QPSolver.solve
+        with mock.patch.object(QPSolver, 'solve', lambda self, *args, **kw: solve(self, *args, **dict(kw, max_iter=2))):
+            stalled = optimize_portfolio(self.expected_returns, cov, solver='qp')
+        self.assertEqual(stalled['diagnostics']['status'], 'max_iter')
+        self.assertFalse(stalled['success'])
+        self.assertEqual(set(stalled['weights'].values()), {0.25})
+
+    def test_min_variance_objective(self):
+        """Test both solvers agree on the constrained minimum-variance portfolio"""
+        cov = self._psd_cov()
+        slsqp = optimize_portfolio(self.expected_returns, cov, gradients='analytic', objective='min_variance')
+        qp = optimize_portfolio(self.expected_returns, cov, solver='qp', objective='min_variance')
+        self.assertLessEqual(qp['volatility'], slsqp['volatility'] + 1e-6)
+
+        with self.assertRaises(ValueError):
+            optimize_portfolio(self.expected_returns, cov, solver='qp', prev_weights=np.ones(4) / 4)
+        with self.assertRaises(ValueError):
+            # The fixture covariance is indefinite, so the problem is not a convex QP
+            optimize_portfolio(self.expected_returns, self.cov_matrix, solver='qp')
+
+    def _psd_cov(self):
+        c = self.cov_matrix.values
+        return pd.DataFrame(c @ c.T + np.eye(4) * 0.01, index=self.test_assets, columns=self.test_assets)
+
+    def test_multistart_reproducible_across_workers(self):
+        """Test seeded starts give the same answer in-process, in a pool and after reseeding NumPy"""
+        serial = optimize_portfolio(self.expected_returns, self.cov_matrix, gradients='analytic', n_starts=6)
+        np.random.seed(123)
+        pooled = optimize_portfolio(self.expected_returns, self.cov_matrix, gradients='analytic', n_starts=6,
+                                    n_jobs=3)
+
+        self.assertEqual(serial['weights'], pooled['weights'])
+        starts = serial['diagnostics']['starts']
+        self.assertEqual([s['start'] for s in starts], list(range(6)))
+        self.assertTrue(all({'nit', 'status', 'time', 'score', 'error'} <= set(s) for s in starts))
+        best = serial['diagnostics']['best_start']
+        self.assertEqual(starts[best]['score'], max(s['score'] for s in starts))
+        self.assertEqual(best, min(i for i, s in enumerate(starts) if s['score'] == starts[best]['score']))
+
+    def test_grid_matches_individual_solves(self):
+        """Test the batch grid gives the same portfolios as one optimize_portfolio call per setting"""
+        cov = self._psd_cov()
+        grid = {'risk_free_rate': [0.0, 0.02], 'min_alt': [0.2, 0.25], 'min_esg': [7.0, 7.5]}
+        table = optimize_portfolio_grid(self.expected_returns, cov, grid)
+
+        self.assertEqual(len(table), 8)
+        self.assertEqual(list(table.columns[-4:]), self.test_assets)
+        for _, row in table.iterrows():
+            single = optimize_portfolio(self.expected_returns, cov, solver='qp',
+                                        risk_free_rate=row['risk_free_rate'], min_alt=row['min_alt'],
+                                        min_esg=row['min_esg'])
+            self.assertEqual(row['status'], 'solved')
+            self.assertAlmostEqual(row['sharpe_ratio'], single['sharpe_ratio'], places=5)
+            self.assertGreaterEqual(row['Hedge_Fund'], row['min_alt'] - 1e-8)
+
+        with self.assertRaises(ValueError):
+            optimize_portfolio_grid(self.expected_returns, cov, {'max_asset': [0.3]})
+
+    def test_rebalance_costs_and_no_trade_band(self):
+        """Test per-asset costs discourage trading an asset and small trades are frozen by the band"""
+        cov = self._psd_cov()
+        prev = pd.Series([0.25, 0.25, 0.25, 0.25], index=self.test_assets)
+        free = rebalance_portfolio(self.expected_returns, cov, prev, transaction_costs=0.0)
+        costly = rebalance_portfolio(self.expected_returns, cov, prev,
+                                     transaction_costs={'SPY': 0.5, 'AGG': 0.0, 'GLD': 0.0, 'Hedge_Fund': 0.0})
+
+        self.assertEqual(costly['trades']['SPY'], 0.0)
+        self.assertAlmostEqual(sum(costly['weights'].values()), 1.0, places=8)
+        self.assertLess(free['diagnostics']['nit'], 20)
+
+        band = rebalance_portfolio(self.expected_returns, cov, prev, transaction_costs=0.0, no_trade_band=0.3)
+        for ticker, trade in band['trades'].items():
+            self.assertTrue(trade == 0.0 or abs(trade) >= 0.3 - 1e-8, ticker)
+
+    def test_rebalance_accounts_parallel(self):
+        """Test batch rebalancing gives the same answer per account in-process and in a pool"""
+        cov = self._psd_cov()
+        rng = np.random.default_rng(3)
+        holdings = pd.DataFrame(rng.dirichlet(np.ones(4), 6), columns=self.test_assets,
+                                index=[f'acct{i}' for i in range(6)])
+        serial = rebalance_accounts(self.expected_returns, cov, holdings)
+        pooled = rebalance_accounts(self.expected_returns, cov, holdings, n_jobs=2)
+
+        pd.testing.assert_frame_equal(serial['weights'], pooled['weights'])
+        self.assertEqual(list(serial['summary'].index), list(holdings.index))
+        single = rebalance_portfolio(self.expected_returns, cov, holdings.loc['acct2'])
+        self.assertEqual(serial['weights'].loc['acct2'].to_dict(), single['weights'])
+
+    def test_efficient_frontier(self):
+        """Test the frontier is feasible, spans the return range and has increasing risk"""
+        frontier = efficient_frontier(self.expected_returns, self.cov_matrix, min_alt=0.2, max_single=0.3,
+                                      n_points=10)
+        weights = frontier['weights']
+
+        self.assertEqual(weights.shape, (10, 4))
+        self.assertTrue(frontier['success'].all())
+        np.testing.assert_allclose(weights.sum(axis=1), 1.0, atol=1e-8)
+        np.testing.assert_allclose(frontier['returns'], frontier['target_returns'], atol=1e-8)
+        self.assertTrue((weights <= 0.3 + 1e-8).all())
+        self.assertTrue((weights[:, 3] >= 0.2 - 1e-8).all())
+        self.assertTrue((np.diff(frontier['vols']) >= -1e-8).all())
+        # Nothing under the constraints beats the top of the frontier
+        self.assertAlmostEqual(frontier['returns'][-1], 0.3 * 0.12 + 0.3 * 0.10 + 0.3 * 0.08 + 0.1 * 0.05)
+
+    def test_efficient_frontier_parallel_matches_serial(self):
+        """Test splitting the sweep across processes gives the same frontier"""
+        serial = efficient_frontier(self.expected_returns, self.cov_matrix, n_points=8)
+        parallel = efficient_frontier(self.expected_returns, self.cov_matrix, n_points=8, n_jobs=2)
+        np.testing.assert_allclose(parallel['vols'], serial['vols'], atol=1e-6)
+
     def test_optimization_failure_handling(self):
         """Test handling of optimization failures"""
         # Create invalid covariance matrix
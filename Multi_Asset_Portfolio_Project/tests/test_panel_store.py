@@ -0,0 +1,96 @@
+import unittest
+import shutil
+import tempfile
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from covariance import CovarianceEstimator
+from data_collection import collect_market_data
+from data_providers import SyntheticProvider
+from panel_store import ReturnsPanel
+from risk_analytics import calculate_var
+
+
+class TestReturnsPanel(unittest.TestCase):
+    """Test cases for the memory-mapped returns panel"""
+
+    def setUp(self):
+        """Write a sample panel"""
+        self.root = tempfile.mkdtemp()
+        np.random.seed(42)
+        idx = pd.date_range('2015-01-31', periods=120, freq='ME')
+        self.returns = pd.DataFrame(np.random.normal(0.005, 0.04, (120, 6)), index=idx,
+                                    columns=[f'A{i}' for i in range(6)])
+        ReturnsPanel.from_frame(self.root, self.returns)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_roundtrip(self):
+        """Test the reopened panel matches the source frame"""
+        panel = ReturnsPanel.open(self.root)
+        self.assertEqual(panel.shape, (120, 6))
+        pd.testing.assert_frame_equal(panel.frame(), self.returns, check_freq=False)
+
+    def test_column_slices_are_views(self):
+        """Test adjacent tickers are served without copying"""
+        panel = ReturnsPanel.open(self.root)
+        block = panel.columns(['A2', 'A3', 'A4'])
+        self.assertTrue(np.shares_memory(block, panel.values))
+        self.assertTrue(block.flags['F_CONTIGUOUS'])
+        self.assertTrue(np.shares_memory(panel.frame(['A2', 'A3']).values, panel.values))
+        self.assertFalse(np.shares_memory(panel.columns(['A4', 'A1']), panel.values))
+
+        # Risk functions run directly on the mapped columns
+        var = calculate_var(panel.frame(['A1'])['A1'])
+        self.assertGreater(var['VaR_95'], 0)
+
+    def test_chunked_moments(self):
+        """Test chunked moments match pandas"""
+        panel = ReturnsPanel.open(self.root)
+        mean, cov = panel.moments(['A0', 'A1', 'A2'], chunk_rows=7)
+        np.testing.assert_allclose(mean, self.returns.iloc[:, :3].mean().values)
+        np.testing.assert_allclose(cov, self.returns.iloc[:, :3].cov().values)
+
+        # Long series with a large mean: raw cross products would cancel catastrophically
+        rng = np.random.default_rng(5)
+        shifted = pd.DataFrame(1e4 + rng.normal(0, 1e-3, (20000, 3)), columns=['X', 'Y', 'Z'],
+                               index=pd.date_range('1950-01-01', periods=20000))
+        long_panel = ReturnsPanel.from_frame(os.path.join(self.root, 'long'), shifted)
+        mean, cov = long_panel.moments(chunk_rows=1000)
+        np.testing.assert_allclose(cov, shifted.cov().values, rtol=1e-6, atol=1e-12)
+
+    def test_covariance_estimator_from_panel(self):
+        """Test the covariance read from the panel in blocks matches the estimate from the frame"""
+        panel = ReturnsPanel.open(self.root)
+        for method in ('sample', 'ewma', 'ledoit_wolf'):
+            est = CovarianceEstimator.from_panel(panel, ['A1', 'A2', 'A3'], method=method, decay=0.9, chunk_rows=16)
+            full = CovarianceEstimator.from_returns(self.returns[['A1', 'A2', 'A3']], method=method, decay=0.9)
+            np.testing.assert_allclose(est.covariance().values, full.covariance().values)
+
+        # The last period can still be revised
+        revised = self.returns.copy()
+        revised.iloc[-1] = 0.1
+        est.update_many(revised[['A1', 'A2', 'A3']])
+        full.update_many(revised[['A1', 'A2', 'A3']])
+        np.testing.assert_allclose(est.covariance().values, full.covariance().values)
+
+    def test_float32_panel_from_collect_market_data(self):
+        """Test collect_market_data writes a float32 panel"""
+        path = os.path.join(self.root, 'collected')
+        _, returns, _, _ = collect_market_data(['SPY', 'AGG'], '2022-01-01', '2024-01-01',
+                                               provider=SyntheticProvider(), panel_path=path,
+                                               panel_dtype='float32')
+        panel = ReturnsPanel.open(path)
+        self.assertEqual(panel.values.dtype, np.float32)
+        self.assertEqual(panel.tickers, list(returns.columns))
+        np.testing.assert_allclose(panel.values, returns.values, rtol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import unittest
+import shutil
+import tempfile
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from data_collection import collect_market_data
+from data_providers import MarketDataProvider
+from price_store import PriceStore
+
+
+def make_prices(tickers, start, end):
+    """Deterministic daily price paths for the given window (end exclusive)"""
+    dates = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1))
+    rng = np.random.default_rng(0)
+    data = 100 * np.cumprod(1 + rng.normal(0.0005, 0.01, (len(dates), len(tickers))), axis=0)
+    return pd.DataFrame(data, index=dates, columns=tickers)
+
+
+class RecordingProvider(MarketDataProvider):
+    """Serves a fixed price frame and records every fetch"""
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.calls = []
+
+    def fetch(self, tickers, start, end):
+        self.calls.append((list(tickers), start, end))
+        window = self.prices.loc[(self.prices.index >= start) & (self.prices.index < end)]
+        return window[list(tickers)]
+
+
+class TestPriceStore(unittest.TestCase):
+    """Test cases for the local price store"""
+
+    def setUp(self):
+        """Set up an empty store"""
+        self.root = tempfile.mkdtemp()
+        self.store = PriceStore(self.root)
+        self.tickers = ['SPY', 'AGG']
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_write_read_roundtrip(self):
+        """Test stored prices come back unchanged"""
+        prices = make_prices(self.tickers, '2023-01-01', '2023-07-01')
+        self.store.write(prices, '2023-01-01', '2023-07-01')
+
+        loaded = self.store.read(self.tickers)
+        pd.testing.assert_frame_equal(loaded, prices, check_freq=False, check_names=False)
+        self.assertEqual(self.store.revision, 1)
+
+        # Manifest survives reopening the store
+        reopened = PriceStore(self.root)
+        self.assertEqual(reopened.coverage('SPY'), (pd.Timestamp('2023-01-01'), pd.Timestamp('2023-07-01')))
+
+    def test_missing_ranges_only_tail(self):
+        """Test only the missing tail is requested for covered tickers"""
+        self.store.write(make_prices(['SPY'], '2023-01-01', '2023-07-01'), '2023-01-01', '2023-07-01')
+
+        gaps = self.store.missing_ranges(self.tickers, '2023-01-01', '2023-12-31')
+        self.assertEqual(gaps[(pd.Timestamp('2023-07-01'), pd.Timestamp('2023-12-31'))], ['SPY'])
+        self.assertEqual(gaps[(pd.Timestamp('2023-01-01'), pd.Timestamp('2023-12-31'))], ['AGG'])
+        self.assertEqual(self.store.missing_ranges(['SPY'], '2023-02-01', '2023-06-01'), {})
+
+    def test_disjoint_request_keeps_coverage_contiguous(self):
+        """Test a request that does not touch the stored window also fetches the gap in between"""
+        prices = make_prices(['SPY'], '2020-01-01', '2023-01-01')
+        self.store.write(prices.loc[:'2020-12-31'], '2020-01-01', '2021-01-01')
+
+        gaps = self.store.missing_ranges(['SPY'], '2022-01-01', '2023-01-01')
+        self.assertEqual(list(gaps), [(pd.Timestamp('2021-01-01'), pd.Timestamp('2023-01-01'))])
+        self.assertEqual(list(self.store.missing_ranges(['SPY'], '2018-01-01', '2019-01-01')),
+                         [(pd.Timestamp('2018-01-01'), pd.Timestamp('2020-01-01'))])
+
+        # A disjoint write keeps its bars but does not claim the gap as covered
+        self.store.write(prices.loc['2022-01-01':], '2022-01-01', '2023-01-01')
+        self.assertEqual(self.store.coverage('SPY'), (pd.Timestamp('2020-01-01'), pd.Timestamp('2021-01-01')))
+        self.assertIn((pd.Timestamp('2021-01-01'), pd.Timestamp('2023-01-01')),
+                      self.store.missing_ranges(['SPY'], '2020-01-01', '2023-01-01'))
+
+        provider = RecordingProvider(prices)
+        _, returns, _, _ = collect_market_data(['SPY'], '2020-01-01', '2023-01-01',
+                                               simulate_alternatives=False, store=self.store, provider=provider)
+        self.assertEqual(provider.calls, [(['SPY'], '2021-01-01', '2023-01-01')])
+        self.assertEqual(len(returns), 35)
+        self.assertTrue((self.store.read(['SPY'], '2021-01-01', '2022-01-01')['SPY'].notna()).any())
+
+    def test_failed_tail_fetch_is_retried(self):
+        """Test an empty download for stored tickers leaves the tail missing so the next call fetches it"""
+        prices = make_prices(self.tickers, '2020-01-01', '2022-01-01')
+        self.store.write(prices.loc[:'2020-12-31'], '2020-01-01', '2021-01-01')
+
+        failing = RecordingProvider(prices.iloc[:0])
+        collect_market_data(self.tickers, '2020-01-01', '2022-01-01',
+                            simulate_alternatives=False, store=self.store, provider=failing)
+        self.assertEqual(self.store.coverage('SPY'), (pd.Timestamp('2020-01-01'), pd.Timestamp('2021-01-01')))
+        self.assertEqual(self.store.revision, 1)
+
+        working = RecordingProvider(prices)
+        _, returns, _, _ = collect_market_data(self.tickers, '2020-01-01', '2022-01-01',
+                                               simulate_alternatives=False, store=self.store, provider=working)
+        self.assertEqual(working.calls, [(self.tickers, '2021-01-01', '2022-01-01')])
+        self.assertEqual(returns.index[-1], pd.Timestamp('2021-12-31'))
+
+    def test_collect_market_data_fetches_delta(self):
+        """Test collect_market_data downloads only bars missing from the store"""
+        provider = RecordingProvider(make_prices(self.tickers, '2023-01-01', '2024-01-01'))
+
+        collect_market_data(self.tickers, '2023-01-01', '2023-07-01',
+                            simulate_alternatives=False, store=self.store, provider=provider)
+        _, returns, _, _ = collect_market_data(self.tickers, '2023-01-01', '2024-01-01',
+                                               simulate_alternatives=False, store=self.store, provider=provider)
+
+        self.assertEqual(len(provider.calls), 2)
+        self.assertEqual(provider.calls[1], (self.tickers, '2023-07-01', '2024-01-01'))
+        self.assertEqual(len(returns), 11)
+
+    def test_offline_mode(self):
+        """Test offline mode serves the store and never downloads"""
+        self.store.write(make_prices(self.tickers, '2023-01-01', '2024-01-01'), '2023-01-01', '2024-01-01')
+
+        provider = RecordingProvider(make_prices(self.tickers, '2023-01-01', '2024-06-01'))
+        prices, returns, metrics, corr = collect_market_data(
+            self.tickers, '2023-01-01', '2024-06-01',
+            simulate_alternatives=False, store=self.store, offline=True, provider=provider
+        )
+
+        self.assertEqual(provider.calls, [])
+        self.assertEqual(list(returns.columns), self.tickers)
+        with self.assertRaises(ValueError):
+            collect_market_data(['SPY', 'GLD'], '2023-01-01', '2024-01-01', store=self.store, offline=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
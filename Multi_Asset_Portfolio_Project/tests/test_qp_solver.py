@@ -0,0 +1,92 @@
+import unittest
+import numpy as np
+import sys
+import os
+import scipy.sparse as sp
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from scipy.optimize import minimize
+from qp_solver import QPSolver, solve_qp
+
+
+class TestQPSolver(unittest.TestCase):
+    """Test cases for the ADMM quadratic program solver"""
+
+    def setUp(self):
+        """Set up a random long-only minimum-variance problem"""
+        rng = np.random.default_rng(0)
+        n = 8
+        x = rng.normal(0, 0.1, (60, n))
+        self.P = 2 * np.cov(x, rowvar=False)
+        self.q = -rng.uniform(0.0, 0.02, n)
+        self.A = np.vstack([np.ones(n), np.eye(n)])
+        self.l = np.r_[1.0, np.zeros(n)]
+        self.u = np.r_[1.0, np.full(n, 0.3)]
+
+    def test_matches_slsqp(self):
+        """Test the solution matches a general-purpose solver and is feasible"""
+        sol = solve_qp(self.P, self.q, self.A, self.l, self.u)
+        ref = minimize(lambda x: 0.5 * x @ self.P @ x + self.q @ x, np.ones(8) / 8,
+                       bounds=[(0, 0.3)] * 8, constraints={'type': 'eq', 'fun': lambda x: x.sum() - 1},
+                       method='SLSQP', options={'ftol': 1e-14, 'maxiter': 1000})
+
+        self.assertEqual(sol['status'], 'solved')
+        self.assertTrue(sol['polished'])
+        self.assertAlmostEqual(sol['x'].sum(), 1.0, places=10)
+        self.assertTrue((sol['x'] >= -1e-10).all() and (sol['x'] <= 0.3 + 1e-10).all())
+        self.assertLessEqual(sol['objective'], ref.fun + 1e-10)
+        np.testing.assert_allclose(sol['x'], ref.x, atol=1e-5)
+
+    def test_warm_start_and_cached_factorization(self):
+        """Test re-solving from the previous solution converges immediately"""
+        solver = QPSolver(self.P, self.A)
+        cold = solver.solve(self.q, self.l, self.u)
+        n_factors = len(solver._factors)
+        warm = solver.solve(self.q, self.l, self.u, x0=cold['x'], y0=cold['y'])
+
+        self.assertLess(warm['iterations'], cold['iterations'])
+        self.assertEqual(len(solver._factors), n_factors)
+        np.testing.assert_allclose(warm['x'], cold['x'], atol=1e-9)
+
+    def test_with_constraints_reuses_solver(self):
+        """Test an unchanged constraint matrix keeps the cached factorization"""
+        solver = QPSolver(self.P, self.A)
+        solver.solve(self.q, self.l, self.u)
+        self.assertIs(solver.with_constraints(self.A.copy()), solver)
+
+        other = solver.with_constraints(self.A[:-1])
+        sol = other.solve(self.q, self.l[:-1], self.u[:-1])
+        self.assertEqual(sol['status'], 'solved')
+        self.assertAlmostEqual(sol['x'].sum(), 1.0, places=8)
+
+    def test_primal_infeasible(self):
+        """Test conflicting constraints are reported instead of returning a bogus point"""
+        u = self.u.copy()
+        u[1:] = 0.1  # eight assets capped at 10% cannot sum to one
+        sol = solve_qp(self.P, self.q, self.A, self.l, u)
+        self.assertEqual(sol['status'], 'primal_infeasible')
+
+
+    def test_interior_point_matches_admm(self):
+        """Test the interior point method agrees with ADMM, also on sparse data"""
+        admm = solve_qp(self.P, self.q, self.A, self.l, self.u)
+        ipm = solve_qp(self.P, self.q, self.A, self.l, self.u, method='interior_point')
+        sparse = solve_qp(sp.csc_matrix(self.P), self.q, sp.csc_matrix(self.A), self.l, self.u,
+                          method='interior_point')
+
+        self.assertEqual(ipm['status'], 'solved')
+        self.assertEqual(sparse['status'], 'solved')
+        np.testing.assert_allclose(ipm['x'], admm['x'], atol=1e-7)
+        np.testing.assert_allclose(sparse['x'], admm['x'], atol=1e-7)
+
+        u = self.u.copy()
+        u[1:] = 0.1
+        infeasible = solve_qp(self.P, self.q, self.A, self.l, u, method='interior_point')
+        self.assertEqual(infeasible['status'], 'primal_infeasible')
+        with self.assertRaises(ValueError):
+            solve_qp(self.P, self.q, self.A, self.l, self.u, method='newton')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,250 @@
+import unittest
+import tempfile
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from scipy.stats import norm
+from covariance import CovarianceEstimator, FactorCovariance
+from risk_analytics import calculate_var, portfolio_var_es, parametric_var, monte_carlo_var, rolling_var_es
+from risk_analytics import dynamic_correlation, CorrelationMonitor
+
+
+class TestPortfolioVarEs(unittest.TestCase):
+    """Test cases for the vectorized historical VaR / Expected Shortfall kernel"""
+
+    def setUp(self):
+        """Set up asset returns and a batch of long-only portfolios"""
+        rng = np.random.default_rng(0)
+        idx = pd.date_range('2019-01-31', periods=60, freq='ME')
+        self.assets = ['SPY', 'EFA', 'AGG', 'GLD', 'Hedge_Fund', 'Private_Equity']
+        self.returns = pd.DataFrame(rng.normal(0.005, 0.04, (60, 6)), index=idx, columns=self.assets)
+        self.returns.iloc[3, 2] = np.nan
+        self.weights = pd.DataFrame(rng.dirichlet(np.ones(6), 7), columns=self.assets)
+
+    def test_matches_per_portfolio_loop(self):
+        """Test every portfolio's VaR equals calculate_var and ES equals the mean of its tail"""
+        levels = [0.9, 0.95, 0.99]
+        table = portfolio_var_es(self.returns, self.weights, levels)
+
+        self.assertEqual(table.shape, (7, 6))
+        for i, w in self.weights.iterrows():
+            port = self.returns.dot(w).dropna()
+            expected = calculate_var(port, levels)
+            worst = np.sort(port.values)
+            for cl in levels:
+                key = f"{int(cl*100)}"
+                self.assertAlmostEqual(table.loc[i, f"VaR_{key}"], expected[f"VaR_{key}"])
+                n_tail = int(np.floor((len(port) - 1) * (1 - cl))) + 1
+                self.assertAlmostEqual(table.loc[i, f"ES_{key}"], -worst[:n_tail].mean())
+                self.assertGreaterEqual(table.loc[i, f"ES_{key}"], table.loc[i, f"VaR_{key}"])
+
+    def test_chunking_and_weight_inputs(self):
+        """Test chunk size does not change results and single/unordered weights are aligned by label"""
+        full = portfolio_var_es(self.returns, self.weights)
+        chunked = portfolio_var_es(self.returns, self.weights, chunk_size=3)
+        pd.testing.assert_frame_equal(full, chunked)
+
+        single = dict(self.weights.iloc[2])
+        shuffled = self.weights[self.assets[::-1]]
+        self.assertAlmostEqual(portfolio_var_es(self.returns, single)['VaR_95'].iloc[0], full['VaR_95'].iloc[2])
+        pd.testing.assert_frame_equal(portfolio_var_es(self.returns, shuffled), full)
+
+    def test_calculate_var_asset_returns(self):
+        """Test asset returns are weighted, and summing them without weights still works but is deprecated"""
+        with self.assertWarns(DeprecationWarning):
+            summed = calculate_var(self.returns)
+        self.assertEqual(summed, calculate_var(self.returns.sum(axis=1)))
+        weights = self.weights.iloc[0]
+        result = calculate_var(self.returns, weights=weights)
+        expected = calculate_var(self.returns.dot(weights).dropna())
+        self.assertEqual(list(result), ['VaR_95', 'VaR_99'])
+        for key in expected:
+            self.assertAlmostEqual(result[key], expected[key])
+
+
+class TestModelVar(unittest.TestCase):
+    """Test cases for parametric and Monte Carlo VaR / Expected Shortfall"""
+
+    def setUp(self):
+        """Set up correlated monthly returns with a crash-prone asset"""
+        rng = np.random.default_rng(5)
+        idx = pd.date_range('2010-01-31', periods=120, freq='ME')
+        mix = rng.normal(0, 0.02, (4, 4))
+        values = rng.normal(0.006, 1.0, (120, 4)) @ mix
+        values[:, 0] -= 0.08 * (rng.random(120) < 0.05)
+        self.returns = pd.DataFrame(values, index=idx, columns=['SPY', 'EFA', 'AGG', 'Hedge_Fund'])
+        self.estimator = CovarianceEstimator.from_returns(self.returns, periods_per_year=12)
+        self.weights = {'SPY': 0.4, 'EFA': 0.2, 'AGG': 0.3, 'Hedge_Fund': 0.1}
+
+    def test_gaussian_and_cornish_fisher(self):
+        """Test the Gaussian closed form, and that negative skew raises the Cornish-Fisher tail"""
+        gaussian = parametric_var(self.weights, self.estimator)
+        sigma = self.estimator.portfolio_volatility(self.weights) / np.sqrt(12)
+        self.assertAlmostEqual(gaussian['VaR_99'], norm.ppf(0.99) * sigma)
+        self.assertAlmostEqual(gaussian['ES_95'], sigma * norm.pdf(norm.ppf(0.95)) / 0.05)
+
+        cf = parametric_var(self.weights, self.estimator, method='cornish_fisher', returns=self.returns)
+        self.assertGreater(cf['VaR_99'], gaussian['VaR_99'])
+        self.assertGreater(cf['ES_99'], cf['VaR_99'])
+        with self.assertRaises(ValueError):
+            parametric_var(self.weights, self.estimator, method='cornish_fisher')
+
+    def test_monte_carlo_converges_to_gaussian(self):
+        """Test simulated VaR/ES match the closed form for dense and factor covariances"""
+        gaussian = parametric_var(self.weights, self.estimator)
+        simulated = monte_carlo_var(self.weights, self.estimator, n_scenarios=400000, seed=0)
+        for key in gaussian:
+            self.assertAlmostEqual(simulated[key], gaussian[key], delta=0.02 * gaussian[key])
+
+        factor = FactorCovariance.from_returns(self.returns, n_factors=2, periods_per_year=12)
+        simulated = monte_carlo_var(self.weights, factor, n_scenarios=400000, seed=0)
+        for key, value in parametric_var(self.weights, factor).items():
+            self.assertAlmostEqual(simulated[key], value, delta=0.02 * value)
+
+    def test_monte_carlo_chunks_merge_exactly(self):
+        """Test results for many portfolios do not depend on worker processes"""
+        weights = pd.DataFrame(np.random.default_rng(1).dirichlet(np.ones(4), 3), columns=self.returns.columns)
+        kwargs = dict(n_scenarios=50000, chunk_size=7000, seed=3, dist='t')
+        serial = monte_carlo_var(weights, self.estimator, **kwargs)
+        parallel = monte_carlo_var(weights, self.estimator, n_jobs=2, **kwargs)
+
+        self.assertEqual(serial.shape, (3, 4))
+        pd.testing.assert_frame_equal(serial, parallel)
+        self.assertAlmostEqual(serial['VaR_95'].iloc[1],
+                               monte_carlo_var(weights.iloc[1], self.estimator, **kwargs)['VaR_95'])
+
+
+class TestRollingVarEs(unittest.TestCase):
+    """Test cases for sliding-window VaR / Expected Shortfall"""
+
+    def setUp(self):
+        """Set up daily asset returns with repeated values and two portfolios"""
+        rng = np.random.default_rng(2)
+        idx = pd.date_range('2022-01-03', periods=150, freq='B')
+        self.returns = pd.DataFrame(rng.normal(0.0004, 0.01, (150, 3)), index=idx, columns=['SPY', 'AGG', 'GLD'])
+        self.returns.iloc[40] = self.returns.iloc[20]
+        self.weights = pd.DataFrame([[0.6, 0.3, 0.1], [0.2, 0.5, 0.3]], index=['growth', 'defensive'],
+                                    columns=['SPY', 'AGG', 'GLD'])
+
+    def test_matches_window_by_window(self):
+        """Test every window of every portfolio and length equals a direct computation"""
+        table = rolling_var_es(self.returns, [10, 42], [0.9, 0.95, 0.99], weights=self.weights)
+
+        self.assertEqual(table.shape, (150, 2 * 2 * 6))
+        for window in (10, 42):
+            for name, w in self.weights.iterrows():
+                port = self.returns.dot(w).to_frame()
+                series = table[(window, name)]
+                self.assertTrue(series.iloc[:window - 1].isna().all().all())
+                for end in range(window - 1, 150, 9):
+                    expected = portfolio_var_es(port.iloc[end - window + 1:end + 1], [1.0], [0.9, 0.95, 0.99])
+                    np.testing.assert_allclose(series.iloc[end][expected.columns].values, expected.iloc[0].values,
+                                               rtol=0, atol=1e-14)
+
+    def test_portfolio_return_series(self):
+        """Test a single portfolio return series can be passed directly"""
+        port = self.returns['SPY']
+        table = rolling_var_es(port, 20)
+        expected = calculate_var(port.iloc[-20:])
+        self.assertEqual(list(table.columns.get_level_values('metric')), ['VaR_95', 'VaR_99', 'ES_95', 'ES_99'])
+        self.assertAlmostEqual(table[(20, 'SPY', 'VaR_95')].iloc[-1], expected['VaR_95'])
+        self.assertAlmostEqual(table[(20, 'SPY', 'VaR_99')].iloc[-1], expected['VaR_99'])
+
+
+class TestDynamicCorrelation(unittest.TestCase):
+    """Test cases for the array-backed rolling correlation engine"""
+
+    def setUp(self):
+        """Set up correlated monthly returns with a few gaps"""
+        rng = np.random.default_rng(4)
+        idx = pd.date_range('2018-01-31', periods=48, freq='ME')
+        values = rng.normal(0.01, 0.04, (48, 4)) @ rng.normal(0, 1, (4, 4))
+        self.returns = pd.DataFrame(values, index=idx, columns=['SPY', 'EFA', 'AGG', 'GLD'])
+        self.gappy = self.returns.copy()
+        self.gappy.iloc[5, 1] = np.nan
+        self.gappy.iloc[20:23, 3] = np.nan
+
+    def test_rolling_matches_pandas(self):
+        """Test every window equals DataFrame.corr, with pairwise-complete handling of gaps"""
+        for returns in (self.returns, self.gappy):
+            result = dynamic_correlation(returns, window=12)
+            self.assertEqual(result['corr'].shape, (37, 4, 4))
+            self.assertEqual(result['dates'][0], returns.index[11])
+            for k, end in enumerate(result['dates']):
+                expected = returns.loc[:end].iloc[-12:].corr().values
+                np.testing.assert_allclose(result['corr'][k], expected, atol=1e-12)
+
+    def test_upper_triangle_and_ewma(self):
+        """Test the upper-triangle layout and the EWMA estimate against CovarianceEstimator"""
+        full = dynamic_correlation(self.returns, window=12)
+        upper = dynamic_correlation(self.returns, window=12, upper=True)
+        self.assertEqual(upper['corr'].shape, (37, 6))
+        self.assertEqual(upper['pairs'][2], ('SPY', 'GLD'))
+        np.testing.assert_allclose(upper['corr'][:, 2], full['corr'][:, 0, 3])
+
+        ewma = dynamic_correlation(self.returns, window=12, method='ewma', decay=0.9)
+        cov = CovarianceEstimator.from_returns(self.returns, method='ewma', decay=0.9).covariance().values
+        vol = np.sqrt(np.diag(cov))
+        np.testing.assert_allclose(ewma['corr'][-1], cov / np.outer(vol, vol), atol=1e-12)
+        with self.assertRaises(ValueError):
+            dynamic_correlation(self.returns, method='dcc')
+
+
+class TestCorrelationMonitor(unittest.TestCase):
+    """Test cases for the streaming correlation regime monitor"""
+
+    def setUp(self):
+        """Set up daily returns that become highly correlated after day 250"""
+        rng = np.random.default_rng(6)
+        values = rng.normal(0, 0.01, (320, 5))
+        values[250:] += 1.5 * rng.normal(0, 0.02, (70, 1))
+        self.returns = pd.DataFrame(values, index=pd.date_range('2022-01-03', periods=320, freq='B'),
+                                    columns=['SPY', 'EFA', 'AGG', 'GLD', 'VNQ'])
+
+    def test_ewma_matches_batch_and_summary(self):
+        """Test the streaming EWMA estimate and its summary against batch computations"""
+        monitor = CorrelationMonitor(self.returns.columns, method='ewma', decay=0.94)
+        summary = monitor.update_many(self.returns)
+        batch = dynamic_correlation(self.returns, window=1, method='ewma', decay=0.94)['corr'][-1]
+        np.testing.assert_allclose(monitor.correlation().values, batch, atol=1e-12)
+
+        self.assertEqual(len(summary), 320)
+        n = len(batch)
+        self.assertAlmostEqual(summary['avg_corr'].iloc[-1], (batch.sum() - n) / (n * (n - 1)))
+        self.assertAlmostEqual(summary['top_eigen_share'].iloc[-1], np.linalg.eigvalsh(batch)[-1] / n, places=8)
+
+    def test_dcc_alerts_on_correlation_spike(self):
+        """Test the DCC monitor is quiet in the calm regime and alerts soon after the spike"""
+        summary = CorrelationMonitor(self.returns.columns).update_many(self.returns)
+        alerts = summary.index[summary['alert']]
+        self.assertGreater(len(alerts), 0)
+        self.assertTrue(self.returns.index[250] <= alerts[0] <= self.returns.index[260])
+        self.assertLess(summary['avg_corr'].iloc[200], 0.2)
+        self.assertGreater(summary['avg_corr'].iloc[-1], 0.5)
+
+    def test_checkpoint_restore(self):
+        """Test a monitor restored from a checkpoint continues exactly like an uninterrupted one"""
+        full = CorrelationMonitor(self.returns.columns)
+        expected = full.update_many(self.returns)
+        first = CorrelationMonitor(self.returns.columns)
+        first.update_many(self.returns.iloc[:150])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'monitor.json')
+            first.save(path)
+            restored = CorrelationMonitor.load(path)
+        rest = restored.update_many(self.returns)
+
+        self.assertEqual(len(rest), 170)
+        pd.testing.assert_frame_equal(rest, expected.iloc[150:])
+        np.testing.assert_allclose(restored.correlation().values, full.correlation().values)
+        with self.assertRaises(ValueError):
+            CorrelationMonitor(self.returns.columns, dcc_a=0.2, dcc_b=0.9)
+
+
+if __name__ == '__main__':
+    unittest.main()
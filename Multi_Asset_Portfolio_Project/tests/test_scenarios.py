@@ -0,0 +1,124 @@
+import unittest
+import pandas as pd
+import numpy as np
+import sys
+import os
+
+# Add src to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from scenarios import ScenarioSet, FactorStressModel, stress_scenarios, scenario_table
+from risk_analytics import stress_test_portfolio
+
+
+class TestScenarioSet(unittest.TestCase):
+    """Test cases for the vectorized stress scenario engine"""
+
+    def setUp(self):
+        """Set up monthly returns and a few portfolios"""
+        rng = np.random.default_rng(8)
+        self.assets = ['SPY', 'EFA', 'AGG', 'TIP', 'HYG', 'GLD']
+        idx = pd.date_range('2019-01-31', periods=48, freq='ME')
+        self.returns = pd.DataFrame(rng.normal(0.005, 0.05, (48, 6)), index=idx, columns=self.assets)
+        self.weights = pd.DataFrame(rng.dirichlet(np.ones(6), 4), columns=self.assets,
+                                    index=['a', 'b', 'c', 'd'])
+
+    def _buy_and_hold(self, path, w):
+        wealth = np.r_[1.0, (np.cumprod(1 + path, axis=0) * w).sum(axis=1)]
+        period = wealth[1:] / wealth[:-1] - 1
+        drawdown = (wealth / np.maximum.accumulate(wealth) - 1).min()
+        vol = np.std(period, ddof=1) * np.sqrt(12) if len(period) > 1 else np.nan
+        return [wealth[-1] - 1, drawdown, vol, period.min()]
+
+    def test_matches_per_scenario_loop(self):
+        """Test batched results equal a scenario-by-scenario, portfolio-by-portfolio loop"""
+        scenarios = ScenarioSet(self.assets)
+        scenarios.add_rolling_windows(self.returns, 12, step=6)
+        scenarios.add_historical('covid_x1.5', self.returns, '2020-02-01', '2020-05-31', multiplier=1.5)
+        scenarios.add('equity_crash', shock={'SPY': -0.3, 'EFA': -0.25}, periods=2)
+        result = scenarios.evaluate(self.weights)
+
+        self.assertEqual(result['values'].shape, (len(scenarios), 4, 4))
+        self.assertEqual(result['scenarios'][0], 'window_2019-12-31')
+        paths, lengths = scenarios.tensor()
+        for s in range(len(scenarios)):
+            for p, w in enumerate(self.weights.values):
+                expected = self._buy_and_hold(paths[s, :lengths[s]], w)
+                np.testing.assert_allclose(result['values'][s, p], expected, equal_nan=True, atol=1e-12)
+
+        table = scenario_table(result, 'c')
+        self.assertEqual(list(table.columns), ['total_return', 'max_drawdown', 'volatility', 'worst_period'])
+        self.assertAlmostEqual(table.loc['equity_crash', 'total_return'],
+                               (1 - 0.3) ** 2 * self.weights.loc['c', 'SPY']
+                               + (1 - 0.25) ** 2 * self.weights.loc['c', 'EFA']
+                               + self.weights.loc['c'].drop(['SPY', 'EFA']).sum() - 1)
+
+    def test_stress_test_portfolio_applies_weights_and_rate_shock(self):
+        """Test stress_test_portfolio uses the portfolio weights and really applies the bond shock"""
+        weights = {'SPY': 0.4, 'AGG': 0.6}
+        results = stress_test_portfolio(self.returns, weights=weights)
+        last = self.returns.iloc[-1]
+        self.assertAlmostEqual(results['Rate_Shock']['total_return'],
+                               0.4 * last['SPY'] + 0.6 * (last['AGG'] - 0.02))
+
+        covid = self.returns.loc['2020-02-01':'2020-04-01', ['SPY', 'AGG']]
+        wealth = ((1 + covid).cumprod() * [0.4, 0.6]).sum(axis=1)
+        self.assertAlmostEqual(results['COVID_Crash']['total_return'], wealth.iloc[-1] - 1)
+        self.assertTrue(np.isnan(results['2008_Crisis']['total_return']))
+        worst = self.returns[['SPY', 'AGG']].dot([0.4, 0.6])
+        self.assertEqual(results['Custom_Worst']['worst_month'], worst.idxmin())
+
+        equal = stress_test_portfolio(self.returns)
+        self.assertAlmostEqual(equal['Custom_Worst']['return'], self.returns.mean(axis=1).min())
+        self.assertEqual(list(stress_scenarios(self.returns, {'Custom_Worst': None}).names), [])
+
+
+class TestFactorStressModel(unittest.TestCase):
+    """Test cases for factor-propagated stress testing"""
+
+    def setUp(self):
+        """Set up assets driven by correlated equity, rates and credit factors"""
+        rng = np.random.default_rng(9)
+        idx = pd.date_range('2012-01-31', periods=150, freq='ME')
+        corr = [[1.0, 0.4, -0.5], [0.4, 1.0, -0.2], [-0.5, -0.2, 1.0]]
+        self.factors = pd.DataFrame(rng.multivariate_normal(np.zeros(3), corr, 150) * 0.02, index=idx,
+                                    columns=['EQUITY', 'RATES', 'CREDIT'])
+        self.true_betas = rng.normal(0, 1, (5, 3))
+        self.returns = pd.DataFrame(self.factors.values @ self.true_betas.T + rng.normal(0, 0.002, (150, 5)),
+                                    index=idx, columns=['SPY', 'EFA', 'AGG', 'HYG', 'GLD'])
+        self.returns.iloc[4, 2] = np.nan
+        self.model = FactorStressModel.from_returns(self.returns, self.factors)
+
+    def test_conditional_expectation(self):
+        """Test unshocked factors move by Sigma_US Sigma_SS^-1 s and fully specified shocks are kept"""
+        shocks = {'equity_crash': {'EQUITY': -0.3}, 'stagflation': {'EQUITY': -0.2, 'RATES': 0.02},
+                  'full': {'EQUITY': -0.1, 'RATES': 0.01, 'CREDIT': 0.03}}
+        moves = self.model.propagate(shocks)
+        cov = self.factors.drop(self.factors.index[4]).cov().values
+
+        self.assertEqual(list(moves.index), ['equity_crash', 'stagflation', 'full'])
+        np.testing.assert_allclose(moves.loc['equity_crash', ['RATES', 'CREDIT']], cov[1:, 0] / cov[0, 0] * -0.3)
+        expected = cov[2, :2] @ np.linalg.solve(cov[:2, :2], [-0.2, 0.02])
+        self.assertAlmostEqual(moves.loc['stagflation', 'CREDIT'], expected)
+        np.testing.assert_allclose(moves.loc['full'], [-0.1, 0.01, 0.03])
+        with self.assertRaises(ValueError):
+            self.model.propagate({'bad': {'VOLATILITY': 0.5}})
+
+    def test_asset_and_portfolio_pnl(self):
+        """Test estimated betas, and that batched portfolio P&L equals weighting the asset P&L"""
+        np.testing.assert_allclose(self.model.betas.values, self.true_betas, atol=0.05)
+        rng = np.random.default_rng(10)
+        shocks = pd.DataFrame(rng.normal(0, 0.05, (2000, 3)), columns=['EQUITY', 'RATES', 'CREDIT'])
+        shocks = shocks.mask(rng.random((2000, 3)) < 0.4)
+        weights = pd.DataFrame(rng.dirichlet(np.ones(5), 3), columns=self.returns.columns, index=['x', 'y', 'z'])
+
+        pnl = self.model.portfolio_pnl(shocks, weights)
+        assets = self.model.asset_pnl(shocks)
+        self.assertEqual(pnl.shape, (2000, 3))
+        np.testing.assert_allclose(pnl.values, assets.values @ weights.values.T)
+        single = self.model.portfolio_pnl(shocks, weights.loc['y'])
+        np.testing.assert_allclose(single.values, pnl['y'].values)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,6 +10,7 @@ import sys
 import os
 import json
 import tempfile
+import threading
 import pandas as pd
 
 # Add the src directory to the path
@@ -17,10 +18,14 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'Multi_Asset_Portfolio_P
 
 # Import our modules
 try:
-    from data_collection import collect_market_data
-    from optimization import optimize_portfolio
-    from risk_analytics import calculate_var, stress_test
-    from performance import calculate_risk_metrics
+    from data_collection import collect_market_data, AnnualizedMetricsAccumulator
+    from data_providers import get_provider
+    from covariance import CovarianceEstimator
+    from price_store import PriceStore
+    from memoize import ResultCache
+    from optimization import optimize_portfolio, optimize_portfolio_grid
+    from constraint_surface import ConstraintSurface
+    from risk_analytics import calculate_var
     from excel_export import create_excel_dashboard
     print("✅ All modules imported successfully")
 except ImportError as e:
@@ -30,6 +35,104 @@ except ImportError as e:
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+# Local price cache so each request only downloads the bars added since the last one
+PRICE_STORE_DIR = os.path.join(os.path.dirname(__file__), 'Multi_Asset_Portfolio_Project', 'data', 'price_store')
+OFFLINE_MODE = os.environ.get('PORTFOLIO_OFFLINE', '0') == '1'
+DATA_FREQUENCY = os.environ.get('PORTFOLIO_FREQUENCY', 'M')
+INGEST_WORKERS = int(os.environ.get('PORTFOLIO_INGEST_WORKERS', '8'))
+price_store = PriceStore(PRICE_STORE_DIR)
+
+# Optimization and risk results keyed by a hash of their inputs, dropped whenever the price store changes
+RESULT_CACHE_DIR = os.path.join(os.path.dirname(__file__), 'Multi_Asset_Portfolio_Project', 'data', 'result_cache')
+RESULT_CACHE_ENTRIES = int(os.environ.get('PORTFOLIO_CACHE_ENTRIES', '256'))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get('PORTFOLIO_CACHE_MAX_BYTES', str(256 * 2**20)))
+result_cache = ResultCache(max_entries=RESULT_CACHE_ENTRIES, directory=RESULT_CACHE_DIR,
+                           max_disk_bytes=RESULT_CACHE_MAX_BYTES, store=price_store)
+
+# Price source: yfinance by default, or a directory of CSV/Parquet files / seeded synthetic prices for air-gapped runs
+DATA_PROVIDER = os.environ.get('PORTFOLIO_DATA_PROVIDER', 'yfinance')
+if DATA_PROVIDER == 'file':
+    data_provider = get_provider('file', directory=os.environ['PORTFOLIO_DATA_DIR'])
+elif DATA_PROVIDER == 'http':
+    data_provider = get_provider('http', url_template=os.environ['PORTFOLIO_DATA_URL'])
+else:
+    data_provider = get_provider(DATA_PROVIDER)
+
+# Running annualized metrics, persisted so a restart resumes without rescanning the history
+METRICS_STATE_PATH = os.path.join(os.path.dirname(__file__), 'Multi_Asset_Portfolio_Project', 'data', 'metrics_state.json')
+if os.path.exists(METRICS_STATE_PATH):
+    metrics_state = AnnualizedMetricsAccumulator.load(METRICS_STATE_PATH)
+else:
+    metrics_state = AnnualizedMetricsAccumulator()
+metrics_lock = threading.Lock()
+
+# Streaming covariance estimate, updated with new periods only and persisted next to the metrics so that
+# expected returns and covariance always cover the same window (both restart when the window start moves)
+COVARIANCE_METHOD = os.environ.get('PORTFOLIO_COVARIANCE', 'sample')
+COVARIANCE_STATE_PATH = os.path.join(os.path.dirname(__file__), 'Multi_Asset_Portfolio_Project', 'data', 'covariance_state.json')
+if os.path.exists(COVARIANCE_STATE_PATH):
+    cov_state = CovarianceEstimator.load(COVARIANCE_STATE_PATH)
+else:
+    cov_state = None
+
+# Precomputed constraint surface: solved over the slider grid in a background thread whenever the inputs
+# change, then requests are answered by nearest-node lookup plus a warm-started polish (direct solve until ready)
+SURFACE_MODE = os.environ.get('PORTFOLIO_SURFACE', '0') == '1'
+SURFACE_TOLERANCE = float(os.environ.get('PORTFOLIO_SURFACE_TOLERANCE', '1e-7'))
+SURFACE_PATH = os.path.join(os.path.dirname(__file__), 'Multi_Asset_Portfolio_Project', 'data', 'constraint_surface.npz')
+constraint_surface = None
+surface_thread = None
+surface_lock = threading.Lock()
+
+def load_market_inputs():
+    """Refresh market data and return (returns, expected returns, annualized covariance)."""
+    global cov_state
+    with metrics_lock:
+        prices, returns, metrics, corr = collect_market_data(
+            store=price_store, offline=OFFLINE_MODE, provider=data_provider, metrics_state=metrics_state,
+            ingest_workers=INGEST_WORKERS, frequency=DATA_FREQUENCY
+        )
+        if (cov_state is None or cov_state.assets != list(returns.columns) or cov_state.method != COVARIANCE_METHOD
+                or cov_state.periods_per_year != metrics_state.periods_per_year):
+            cov_state = CovarianceEstimator.from_returns(returns, method=COVARIANCE_METHOD)
+        else:
+            cov_state.update_many(returns)
+        metrics_state.save(METRICS_STATE_PATH)
+        cov_state.save(COVARIANCE_STATE_PATH)
+        cov_matrix = cov_state.covariance()  # Annualized
+    if SURFACE_MODE:
+        get_constraint_surface(metrics['annualized_return'], cov_matrix)  # Starts the rebuild after a refresh
+    return returns, metrics['annualized_return'], cov_matrix
+
+def get_constraint_surface(expected_returns, cov_matrix):
+    """Surface for the current inputs (loaded from disk if saved), or None while it is rebuilt in the background."""
+    global constraint_surface, surface_thread
+    with surface_lock:
+        if constraint_surface is None and os.path.exists(SURFACE_PATH):
+            constraint_surface = ConstraintSurface.load(SURFACE_PATH)
+        if constraint_surface is not None and constraint_surface.matches(expected_returns, cov_matrix):
+            return constraint_surface
+        # A build for older inputs is left to finish; the next call sees the mismatch and starts another
+        if surface_thread is None or not surface_thread.is_alive():
+            print("🧮 Precomputing constraint surface in the background...")
+            surface_thread = threading.Thread(target=build_constraint_surface, daemon=True,
+                                              args=(expected_returns, cov_matrix, f'store-revision-{price_store.revision}'))
+            surface_thread.start()
+        return None
+
+def build_constraint_surface(expected_returns, cov_matrix, tag):
+    """Solve the surface grid, save it and publish it to the request handlers."""
+    global constraint_surface
+    try:
+        surface = ConstraintSurface.build(expected_returns, cov_matrix, tag=tag)
+        surface.save(SURFACE_PATH)
+    except Exception as e:
+        print(f"❌ Constraint surface build failed: {e}")
+        return
+    with surface_lock:
+        constraint_surface = surface
+    print("✅ Constraint surface ready")
+
 @app.route('/run_optimization', methods=['POST'])
 def run_optimization():
     """Run portfolio optimization with given parameters."""
@@ -43,32 +146,48 @@ def run_optimization():
         
         print(f"🔄 Running optimization with parameters: {params}")
         
-        # Collect market data
-        prices, returns, metrics, corr = collect_market_data()
-        
-        # Calculate expected returns and covariance
-        expected_returns = metrics['annualized_return']
-        cov_matrix = returns.cov() * 12  # Annualize covariance
+        # Collect market data, expected returns and covariance
+        returns, expected_returns, cov_matrix = load_market_inputs()
         
         # Run optimization
-        result = optimize_portfolio(
-            expected_returns=expected_returns,
-            cov_matrix=cov_matrix,
-            risk_free_rate=risk_free_rate,
-            min_alt=min_alt,
-            max_single=max_single,
-            min_esg=min_esg
-        )
+        try:
+            surface = get_constraint_surface(expected_returns, cov_matrix) if SURFACE_MODE else None
+            if surface is not None:
+                result = surface.query(
+                    risk_free_rate=risk_free_rate,
+                    min_alt=min_alt,
+                    max_single=max_single,
+                    min_esg=min_esg,
+                    tolerance=SURFACE_TOLERANCE
+                )
+            else:
+                # Surface mode off, or the surface for these inputs is still being built
+                result = result_cache.call(
+                    optimize_portfolio,
+                    expected_returns=expected_returns,
+                    cov_matrix=cov_matrix,
+                    risk_free_rate=risk_free_rate,
+                    min_alt=min_alt,
+                    max_single=max_single,
+                    min_esg=min_esg,
+                    solver='qp'
+                )
+        except ValueError as e:
+            # Parameters with no optimal portfolio (e.g. no asset beats the risk-free rate)
+            print(f"⚠️ Optimization has no solution: {e}")
+            return jsonify({'error': str(e)}), 422
+        if not result['success']:
+            print(f"⚠️ Solver did not converge ({result['diagnostics']['status']}); returning equal weights")
         
         # Calculate additional risk metrics
         portfolio_weights = list(result['weights'].values())
         portfolio_returns = returns.dot(portfolio_weights)
         
-        risk_metrics = {
-            'VaR_95': calculate_var(portfolio_returns, 0.95),
-            'VaR_99': calculate_var(portfolio_returns, 0.99),
-            'Max_Drawdown': calculate_risk_metrics(portfolio_returns)['max_drawdown']
-        }
+        wealth = (1 + portfolio_returns).cumprod()
+        risk_metrics = dict(
+            result_cache.call(calculate_var, portfolio_returns, [0.95, 0.99]),
+            Max_Drawdown=float((wealth / wealth.cummax() - 1).min())
+        )
         
         # Prepare response
         response = {
@@ -77,7 +196,8 @@ def run_optimization():
             'volatility': result['volatility'],
             'avg_esg': result['avg_esg'],
             'weights': result['weights'],
-            'risk_metrics': risk_metrics
+            'risk_metrics': risk_metrics,
+            'converged': result['success']
         }
         
         print(f"✅ Optimization completed successfully")
@@ -87,6 +207,36 @@ def run_optimization():
         print(f"❌ Optimization error: {e}")
         return jsonify({'error': str(e)}), 500
 
+# Frontend parameter names -> optimize_portfolio_grid parameters
+SENSITIVITY_PARAMETERS = {
+    'riskFreeRate': 'risk_free_rate',
+    'minAlternatives': 'min_alt',
+    'maxSingle': 'max_single',
+    'minEsg': 'min_esg'
+}
+
+@app.route('/run_sensitivity', methods=['POST'])
+def run_sensitivity():
+    """Solve a grid of slider settings in one call, e.g. {"grid": {"minEsg": [6.5, 7.0, 7.5]}}."""
+    try:
+        params = request.json
+        grid = {SENSITIVITY_PARAMETERS[k]: v for k, v in params.get('grid', {}).items()}
+        fixed = {SENSITIVITY_PARAMETERS[k]: v for k, v in params.items() if k in SENSITIVITY_PARAMETERS}
+        
+        print(f"🔄 Running sensitivity grid: {params}")
+        
+        returns, expected_returns, cov_matrix = load_market_inputs()
+        table = result_cache.call(optimize_portfolio_grid, expected_returns, cov_matrix, grid, **fixed)
+        
+        print(f"✅ Sensitivity grid completed ({len(table)} settings)")
+        return jsonify({'results': json.loads(table.to_json(orient='records'))})
+        
+    except KeyError as e:
+        return jsonify({'error': f'Unknown grid parameter {e}'}), 400
+    except Exception as e:
+        print(f"❌ Sensitivity error: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/export_excel', methods=['POST'])
 def export_excel():
     """Export portfolio data to Excel."""
@@ -126,7 +276,8 @@ def export_excel():
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
-    return jsonify({'status': 'healthy', 'message': 'Portfolio optimization backend is running'})
+    return jsonify({'status': 'healthy', 'message': 'Portfolio optimization backend is running',
+                    'result_cache': result_cache.stats()})
 
 if __name__ == '__main__':
     print("🚀 Starting Portfolio Optimization Backend Server...")